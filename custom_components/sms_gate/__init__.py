@@ -1,30 +1,121 @@
 """
 Integracja SMS Gate dla Home Assistant (Local Server).
 
-- async_setup: rejestruje hass.data[DOMAIN].
-- async_setup_entry: tworzy aiohttp session, API (Basic Auth), coordinator; ładuje
-  platformy notify i sensor; rejestruje serwis sms_gate.send_sms (jedna rejestracja).
-- _async_send_sms: wspólna logika dla serwisu i notify; wybór bramki po entity_id
-  lub device_id, inaczej pierwszy wpis; resolve_recipients_and_message + api.send_sms.
-- async_unload_entry: unload platform, zamknięcie sesji, usunięcie serwisu gdy brak wpisów.
+- async_setup: rejestruje hass.data[DOMAIN] i widok eksportu metryk.
+- async_setup_entry: pobiera współdzielony transport HTTP (pula keep-alive,
+  zwalniany także przy nieudanym setupie), tworzy API (Basic Auth, cache ścieżek
+  z entry.data), coordinator; ładuje platformy notify i sensor; uruchamia kolejkę
+  wychodzących SMS (outbox) z buforem zbiorczych SMS (digest) i przydziałem kart
+  SIM; opcjonalnie rejestruje webhook (push); opcjonalnie uruchamia archiwum
+  wiadomości (SQLite); rejestruje serwisy sms_gate.send_sms, sms_gate.send_sms_bulk,
+  sms_gate.get_messages i sms_gate.query_archive (jedna rejestracja). Z zapisanym
+  stanem sprzed restartu encje startują od razu, a odświeżenie, start kolejki
+  i webhook idą w tle (_async_connect).
+- _async_select_entry: wybór bramki po entity_id lub device_id (tablica routingu
+  aktualizowana zdarzeniami rejestrów), inaczej najlepsza bramka z puli (opcja
+  "pool"), inaczej pierwszy wpis.
+- async_enqueue_message: wspólna część serwisu i notify – dodanie do kolejki
+  (treść po polityce segmentów; wysyłka w tle, failover w puli) lub do bufora
+  digest.
+- _async_send_sms: serwis send_sms; resolve_recipients_and_message
+  + async_enqueue_message (wraca od razu z id wiadomości); z wait_for_delivery czeka
+  (z limitem czasu) na stan końcowy.
+- _async_send_sms_bulk: wiele spersonalizowanych wiadomości w jednym wywołaniu;
+  wszystkie pozycje przez kolejkę wpisu (limity, failover, tłumienie powtórzeń),
+  wynik per pozycja.
+- _async_get_messages: ostatnie wiadomości z danych coordinatora (odpowiedź serwisu).
+- _async_query_archive: zapytanie do archiwum (odbiorcy, stan, zakres czasu).
+- async_unload_entry: unload platform, przerwanie _async_connect w toku,
+  opróżnienie buforów digest do kolejki,
+  zatrzymanie kolejki i archiwum, usunięcie webhooka, zwolnienie transportu
+  (zamknięcie sesji przy ostatnim wpisie), usunięcie serwisów gdy brak wpisów.
+- async_remove_entry: usunięcie pliku kolejki, zapisanego stanu, archiwum i buforów
+  digest.
 """
 
 from __future__ import annotations
 
+import asyncio
+from contextlib import suppress
+from functools import partial
 import logging
 from typing import Any
 
-import aiohttp
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_HOST, CONF_PASSWORD, CONF_PORT, CONF_USERNAME
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_PORT,
+    CONF_USERNAME,
+    CONF_WEBHOOK_ID,
+)
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt as dt_util
 import voluptuous as vol
 
 from .api import SMSGateAPI
-from .const import DEFAULT_PORT, DOMAIN
-from .coordinator import SMSGateDataUpdateCoordinator
+from .archive import SMSGateArchive, async_remove_archive
+from .const import (
+    ARCHIVE_QUERY_LIMIT,
+    CONF_ARCHIVE,
+    CONF_CAPABILITIES,
+    CONF_DEDUP_SUFFIX,
+    CONF_DEDUP_WINDOW,
+    CONF_DIGEST_WINDOW,
+    CONF_MAX_SEGMENTS,
+    CONF_POOL,
+    CONF_RATE_LIMIT,
+    CONF_RECIPIENT_RATE_LIMIT,
+    CONF_RETRY_BACKOFF,
+    CONF_SCAN_INTERVAL_MAX,
+    CONF_SCAN_INTERVAL_MIN,
+    CONF_SEND_RETRIES,
+    CONF_WEBHOOK,
+    DATA_ROUTER,
+    DEFAULT_DEDUP_WINDOW,
+    DEFAULT_DELIVERY_TIMEOUT,
+    DEFAULT_DIGEST_WINDOW,
+    DEFAULT_MAX_SEGMENTS,
+    DEFAULT_PORT,
+    DEFAULT_PRIORITY,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RECIPIENT_RATE_LIMIT,
+    DEFAULT_RETRY_BACKOFF,
+    DEFAULT_SCAN_INTERVAL_MAX,
+    DEFAULT_SCAN_INTERVAL_MIN,
+    DEFAULT_SEND_RETRIES,
+    DOMAIN,
+    MESSAGES_LIMIT_DEFAULT,
+    PRIORITY_MAX,
+    PRIORITY_MIN,
+    SIM_COUNT_MAX,
+)
+from .coordinator import SMSGateDataUpdateCoordinator, async_remove_snapshot
+from .dedup import MessageDeduplicator
+from .digest import SMSGateDigest, async_remove_digest
+from .metrics import SMSGateMetricsView
+from .outbox import SMSGateOutbox, async_remove_outbox
+from .pool import async_failover, async_select_gateway
+from .push import async_setup_push, async_unload_push
+from .recipients import RecipientIndex
+from .retry import RetryPolicy
+from .routing import SMSGateRouter, async_register_entry, async_unregister_entry
+from .segments import SegmentPolicy, segment_info
+from .sim import SimScheduler
+from .template_cache import SMSGateTemplateCache
+from .transport import (
+    SMSGateTransport,
+    async_acquire_transport,
+    async_release_transport,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -40,9 +131,80 @@ SERVICE_SEND_SMS_SCHEMA = vol.Schema(
         vol.Required("recipients"): vol.Any(cv.string, [cv.string]),
         vol.Optional("template"): cv.string,
         vol.Optional("data"): dict,
+        # Priorytet w kolejce (wyższy = wcześniej), przekazywany też do bramki
+        vol.Optional("priority", default=DEFAULT_PRIORITY): vol.All(
+            vol.Coerce(int), vol.Range(min=PRIORITY_MIN, max=PRIORITY_MAX)
+        ),
         # Opcjonalnie: encja notify lub urządzenie – wybór bramki przy wielu konfiguracjach
         vol.Optional("entity_id"): vol.Any(cv.entity_id, [cv.entity_id]),
         vol.Optional("device_id"): cv.string,
+        # Karta SIM telefonu (1..4) – bez podania wybiera harmonogram kart (opcja sim_count)
+        vol.Optional("sim_number"): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=SIM_COUNT_MAX)
+        ),
+        # Zbiorczy SMS (digest): true/false wymusza, bez podania – wg priorytetu
+        vol.Optional("digest"): cv.boolean,
+        # Czekanie na stan końcowy (Delivered / Failed) – wynik w odpowiedzi serwisu
+        vol.Optional("wait_for_delivery", default=False): cv.boolean,
+        vol.Optional("delivery_timeout", default=DEFAULT_DELIVERY_TIMEOUT): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=3600)
+        ),
+    }
+)
+
+SERVICE_SEND_SMS_BULK = "send_sms_bulk"
+SERVICE_SEND_SMS_BULK_SCHEMA = vol.Schema(
+    {
+        # Wspólna treść/szablon; pozycje mogą nadpisać message i podać własne data
+        vol.Optional("message", default=""): cv.string,
+        vol.Optional("template"): cv.string,
+        vol.Required("items"): vol.All(
+            cv.ensure_list,
+            [
+                vol.Schema(
+                    {
+                        vol.Required("recipients"): vol.Any(cv.string, [cv.string]),
+                        vol.Optional("message"): cv.string,
+                        vol.Optional("data"): dict,
+                    }
+                )
+            ],
+            vol.Length(min=1),
+        ),
+        vol.Optional("priority", default=DEFAULT_PRIORITY): vol.All(
+            vol.Coerce(int), vol.Range(min=PRIORITY_MIN, max=PRIORITY_MAX)
+        ),
+        vol.Optional("entity_id"): vol.Any(cv.entity_id, [cv.entity_id]),
+        vol.Optional("device_id"): cv.string,
+    }
+)
+
+SERVICE_GET_MESSAGES = "get_messages"
+SERVICE_GET_MESSAGES_SCHEMA = vol.Schema(
+    {
+        # Filtr stanu (np. Failed) i limit liczby zwracanych wiadomości
+        vol.Optional("state"): cv.string,
+        vol.Optional("limit", default=MESSAGES_LIMIT_DEFAULT): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MESSAGES_LIMIT_DEFAULT)
+        ),
+        vol.Optional("entity_id"): vol.Any(cv.entity_id, [cv.entity_id]),
+        vol.Optional("device_id"): cv.string,
+    }
+)
+
+SERVICE_QUERY_ARCHIVE = "query_archive"
+SERVICE_QUERY_ARCHIVE_SCHEMA = vol.Schema(
+    {
+        # Odbiorcy (nazwy z opcji lub numery), stan i zakres czasu [since, until)
+        vol.Optional("recipients"): vol.Any(cv.string, [cv.string]),
+        vol.Optional("state"): cv.string,
+        vol.Optional("since"): cv.datetime,
+        vol.Optional("until"): cv.datetime,
+        vol.Optional("limit", default=ARCHIVE_QUERY_LIMIT): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=ARCHIVE_QUERY_LIMIT)
+        ),
+        vol.Optional("entity_id"): vol.Any(cv.entity_id, [cv.entity_id]),
+        vol.Optional("device_id"): cv.string,
     }
 )
 
@@ -52,36 +214,142 @@ def _base_url(host: str, port: int) -> str:
 
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
-    """Rejestracja config flow."""
+    """Rejestracja config flow i eksportu metryk (/api/sms_gate/metrics)."""
     hass.data.setdefault(DOMAIN, {})
+    hass.http.register_view(SMSGateMetricsView())
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Konfiguracja integracji z entry."""
     _LOGGER.info("SMS Gate: setup entry entry_id=%s", entry.entry_id)
+    transport = await async_acquire_transport(hass)
+    try:
+        return await _async_setup_entry(hass, entry, transport)
+    except BaseException:
+        # Nieudany setup nie przechodzi przez unload – zwolnienie transportu tutaj
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+        await async_release_transport(hass)
+        raise
+
+
+async def _async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, transport: SMSGateTransport
+) -> bool:
+    """Właściwa konfiguracja wpisu na pobranym transporcie HTTP."""
     host = entry.data[CONF_HOST]
     port = entry.data.get(CONF_PORT, DEFAULT_PORT)
     username = entry.data[CONF_USERNAME]
     password = entry.data[CONF_PASSWORD]
     base_url = _base_url(host, port)
 
-    session = aiohttp.ClientSession()
-    api = SMSGateAPI(base_url, session, username, password)
-    coordinator = SMSGateDataUpdateCoordinator(hass, api)
+    api = SMSGateAPI(
+        base_url,
+        transport.session,
+        username,
+        password,
+        capabilities=entry.data.get(CONF_CAPABILITIES),
+        retry_policy=RetryPolicy(
+            retries=entry.options.get(CONF_SEND_RETRIES, DEFAULT_SEND_RETRIES),
+            base_delay=entry.options.get(CONF_RETRY_BACKOFF, DEFAULT_RETRY_BACKOFF),
+        ),
+    )
 
-    await coordinator.async_config_entry_first_refresh()
+    @callback
+    def _async_save_capabilities(capabilities: dict[str, str]) -> None:
+        """Zapisuje wykryte ścieżki API w entry.data (przetrwają restart)."""
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, CONF_CAPABILITIES: capabilities}
+        )
+
+    api.set_capabilities_listener(_async_save_capabilities)
+    coordinator = SMSGateDataUpdateCoordinator(
+        hass,
+        api,
+        min_interval=entry.options.get(CONF_SCAN_INTERVAL_MIN, DEFAULT_SCAN_INTERVAL_MIN),
+        max_interval=entry.options.get(CONF_SCAN_INTERVAL_MAX, DEFAULT_SCAN_INTERVAL_MAX),
+    )
+
+    # Szybki start: z zapisanym stanem encje startują od razu, a pierwsze odświeżenie
+    # (i rejestracja webhooka) biegnie w tle – uśpiony telefon nie wstrzymuje startu HA
+    restored = await coordinator.async_load_snapshot(entry.entry_id)
+    if not restored:
+        await coordinator.async_config_entry_first_refresh()
+
+    pool = bool(entry.options.get(CONF_POOL, False))
+    sims = SimScheduler.from_options(entry.options)
+    outbox = SMSGateOutbox(
+        hass,
+        entry.entry_id,
+        api,
+        rate_limit=entry.options.get(CONF_RATE_LIMIT, DEFAULT_RATE_LIMIT),
+        recipient_rate_limit=entry.options.get(
+            CONF_RECIPIENT_RATE_LIMIT, DEFAULT_RECIPIENT_RATE_LIMIT
+        ),
+        failover=partial(async_failover, hass, entry.entry_id) if pool else None,
+        on_sent=coordinator.async_note_activity,
+        dedup=MessageDeduplicator(
+            entry.options.get(CONF_DEDUP_WINDOW, DEFAULT_DEDUP_WINDOW)
+        ),
+        dedup_suffix=entry.options.get(CONF_DEDUP_SUFFIX, True),
+        max_segments=entry.options.get(CONF_MAX_SEGMENTS, DEFAULT_MAX_SEGMENTS),
+        sims=sims,
+    )
+    await outbox.async_load()
 
     hass.data[DOMAIN][entry.entry_id] = {
         "api": api,
+        "archive": None,
         "coordinator": coordinator,
-        "session": session,
+        "outbox": outbox,
+        "pool": pool,
+        "recipient_index": RecipientIndex(entry.options.get(CONF_RECIPIENTS)),
+        "segment_policy": SegmentPolicy.from_options(entry.options),
+        "sims": sims,
+        "template_cache": SMSGateTemplateCache(hass),
+        "transport": transport,
+        "webhook_id": None,
+        "connect_task": None,
     }
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    entry_data["digest"] = SMSGateDigest(
+        hass,
+        entry.entry_id,
+        outbox,
+        lambda text: entry_data["segment_policy"].prepare(text),
+        entry.options.get(CONF_DIGEST_WINDOW, DEFAULT_DIGEST_WINDOW),
+    )
+    await entry_data["digest"].async_load()
+    if entry.options.get(CONF_WEBHOOK, False) and not restored:
+        hass.data[DOMAIN][entry.entry_id]["webhook_id"] = await async_setup_push(
+            hass, entry, api, coordinator
+        )
+    if entry.options.get(CONF_ARCHIVE, False):
+        archive = SMSGateArchive(hass, entry.entry_id, api, coordinator)
+        await archive.async_start()
+        hass.data[DOMAIN][entry.entry_id]["archive"] = archive
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    async_register_entry(hass, entry.entry_id)
+    if restored:
+        entry_data["connect_task"] = entry.async_create_background_task(
+            hass, _async_connect(hass, entry), f"{DOMAIN} connect {entry.entry_id}"
+        )
+    else:
+        outbox.async_start()
+
+    async def async_send_sms_handler(call: ServiceCall) -> ServiceResponse:
+        return await _async_send_sms(hass, call)
+
+    async def async_send_sms_bulk_handler(call: ServiceCall) -> ServiceResponse:
+        return await _async_send_sms_bulk(hass, call)
+
+    @callback
+    def async_get_messages_handler(call: ServiceCall) -> ServiceResponse:
+        return _async_get_messages(hass, call)
 
-    async def async_send_sms_handler(call: ServiceCall) -> None:
-        await _async_send_sms(hass, call)
+    async def async_query_archive_handler(call: ServiceCall) -> ServiceResponse:
+        return await _async_query_archive(hass, call)
 
     if not hass.services.has_service(DOMAIN, SERVICE_SEND_SMS):
         hass.services.async_register(
@@ -89,49 +357,129 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             SERVICE_SEND_SMS,
             async_send_sms_handler,
             schema=SERVICE_SEND_SMS_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+    if not hass.services.has_service(DOMAIN, SERVICE_SEND_SMS_BULK):
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_SEND_SMS_BULK,
+            async_send_sms_bulk_handler,
+            schema=SERVICE_SEND_SMS_BULK_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+    if not hass.services.has_service(DOMAIN, SERVICE_GET_MESSAGES):
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_GET_MESSAGES,
+            async_get_messages_handler,
+            schema=SERVICE_GET_MESSAGES_SCHEMA,
+            supports_response=SupportsResponse.ONLY,
+        )
+    if not hass.services.has_service(DOMAIN, SERVICE_QUERY_ARCHIVE):
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_QUERY_ARCHIVE,
+            async_query_archive_handler,
+            schema=SERVICE_QUERY_ARCHIVE_SCHEMA,
+            supports_response=SupportsResponse.ONLY,
         )
 
     return True
 
 
-async def _async_send_sms(hass: HomeAssistant, call: ServiceCall) -> None:
-    """Wspólna logika wysyłania SMS (serwis + notify). Wybór bramki: entity_id/device_id lub pierwszy wpis."""
-    from .notify import resolve_recipients_and_message
+async def _async_connect(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """
+    Pierwsze połączenie po szybkim starcie: odświeżenie na żywo, start kolejki
+    (wiadomości zlecone wcześniej czekają w niej do tej chwili), potem webhook –
+    jego rejestracja nie opóźnia wysyłki.
+    """
+    data = hass.data[DOMAIN][entry.entry_id]
+    await data["coordinator"].async_refresh()
+    # Wpis mógł zostać odładowany w trakcie (dane usunięte z hass.data)
+    if hass.data[DOMAIN].get(entry.entry_id) is not data:
+        return
+    data["outbox"].async_start()
+    if not entry.options.get(CONF_WEBHOOK, False):
+        return
+    try:
+        data["webhook_id"] = await async_setup_push(
+            hass, entry, data["api"], data["coordinator"]
+        )
+    except asyncio.CancelledError:
+        # Unload w trakcie rejestracji – sprzątanie częściowo zarejestrowanego webhooka
+        if webhook_id := entry.data.get(CONF_WEBHOOK_ID):
+            await async_unload_push(hass, data["api"], webhook_id)
+        raise
+
 
-    entries = hass.config_entries.async_entries(DOMAIN)
-    if not entries:
+def _async_select_entry(
+    hass: HomeAssistant, call: ServiceCall
+) -> tuple[ConfigEntry, dict[str, Any]] | None:
+    """Wybór bramki: entity_id/device_id, pula lub pierwszy wpis. Zwraca (entry, dane wpisu)."""
+    loaded: dict[str, dict[str, Any]] = hass.data.get(DOMAIN, {})
+    router: SMSGateRouter | None = hass.data.get(DATA_ROUTER)
+    if not loaded or router is None:
         _LOGGER.error("Brak skonfigurowanej integracji SMS Gate")
-        return
+        return None
 
-    # Wybór wpisu: entity_id (encja notify) → device_id → pierwszy wpis
+    # Wybór wpisu: entity_id (encja notify) → device_id → pula → pierwszy wpis
     entry_id = None
     entity_ids = call.data.get("entity_id")
     if entity_ids:
         entity_ids = [entity_ids] if isinstance(entity_ids, str) else entity_ids
-        reg = hass.helpers.entity_registry.async_get()
-        for eid in entity_ids:
-            if not eid:
-                continue
-            ent = reg.async_get(eid)
-            if ent and ent.config_entry_id and ent.config_entry_id in (e.entry_id for e in entries):
-                entry_id = ent.config_entry_id
-                break
+        entry_id = next(
+            (e for e in map(router.entry_for_entity, entity_ids) if e is not None), None
+        )
     if not entry_id and call.data.get("device_id"):
-        dev_reg = hass.helpers.device_registry.async_get()
-        dev = dev_reg.async_get(call.data["device_id"])
-        if dev and dev.config_entries:
-            for eid in dev.config_entries:
-                if any(c.domain == DOMAIN for c in entries if c.entry_id == eid):
-                    entry_id = eid
-                    break
+        entry_id = router.entry_for_device(call.data["device_id"])
     if not entry_id:
-        entry_id = entries[0].entry_id
-    entry = next((e for e in entries if e.entry_id == entry_id), entries[0])
-    data = hass.data[DOMAIN].get(entry_id)
-    if not data:
+        entry_id = async_select_gateway(hass) or next(iter(loaded))
+    data = loaded.get(entry_id)
+    entry = hass.config_entries.async_get_entry(entry_id)
+    if not data or entry is None:
         _LOGGER.error("Brak konfiguracji SMS Gate dla entry %s", entry_id)
-        return
-    api: SMSGateAPI = data["api"]
+        return None
+    return entry, data
+
+
+@callback
+def async_enqueue_message(
+    data: dict[str, Any],
+    phone_numbers: list[str],
+    text: str,
+    *,
+    priority: int = DEFAULT_PRIORITY,
+    sim_number: int | None = None,
+    digest: bool | None = None,
+) -> list[str] | None:
+    """
+    Wspólna część serwisu i notify: bufor digest albo kolejka wpisu (treść po
+    polityce segmentów). Zwraca id wiadomości w kolejce (pusta lista, gdy polityka
+    odrzuciła treść) lub None, gdy wiadomość trafiła do bufora digest.
+    """
+    digest_buffer: SMSGateDigest = data["digest"]
+    if digest_buffer.accepts(priority, digest):
+        digest_buffer.async_add(phone_numbers, text)
+        return None
+    outbox: SMSGateOutbox = data["outbox"]
+    return [
+        outbox.async_enqueue(phone_numbers, part, priority=priority, sim_number=sim_number)
+        for part in data["segment_policy"].prepare(text)
+    ]
+
+
+async def _async_send_sms(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """
+    Serwis send_sms: rozwiązanie odbiorców i dodanie do kolejki (async_enqueue_message).
+    Zwraca id wiadomości; z wait_for_delivery czeka na ich stan końcowy.
+    """
+    from .notify import resolve_recipients_and_message
+
+    selected = _async_select_entry(hass, call)
+    if selected is None:
+        return {"message_ids": []}
+    entry, data = selected
+    coordinator: SMSGateDataUpdateCoordinator = data["coordinator"]
     message = call.data.get("message", "")
     recipients = call.data.get("recipients")
     if isinstance(recipients, str):
@@ -139,14 +487,150 @@ async def _async_send_sms(hass: HomeAssistant, call: ServiceCall) -> None:
     template_name = call.data.get("template")
     template_data = call.data.get("data") or {}
     phone_numbers, final_text = await resolve_recipients_and_message(
-        hass, entry, message, recipients or [], template_name, template_data
+        hass,
+        entry,
+        message,
+        recipients or [],
+        template_name,
+        template_data,
+        data["template_cache"],
+        data["recipient_index"],
     )
     if not phone_numbers:
         _LOGGER.warning("Brak odbiorców do wysłania SMS")
-        return
-    success, result = await api.async_send_sms(phone_numbers, final_text, priority=100)
-    if not success:
-        _LOGGER.error("Wysłanie SMS nie powiodło się: %s", result)
+        return {"message_ids": []}
+    message_ids = async_enqueue_message(
+        data,
+        phone_numbers,
+        final_text,
+        priority=call.data.get("priority", DEFAULT_PRIORITY),
+        sim_number=call.data.get("sim_number"),
+        digest=call.data.get("digest"),
+    )
+    if message_ids is None:
+        return {"message_ids": [], "digest": True}
+    if not call.data.get("wait_for_delivery"):
+        return {"message_ids": message_ids}
+
+    # id w kolejce = id wiadomości w SMS Gate – śledzenie od razu, przed wysyłką
+    futures = {i: coordinator.async_wait_for_final(i) for i in message_ids}
+    await asyncio.wait(
+        futures.values(), timeout=call.data.get("delivery_timeout", DEFAULT_DELIVERY_TIMEOUT)
+    )
+    # Po limicie czasu porzucone oczekiwania nie zostają w coordinatorze
+    for future in futures.values():
+        if not future.done():
+            future.cancel()
+    states = {
+        i: f.result() if f.done() and not f.cancelled() else "timeout"
+        for i, f in futures.items()
+    }
+    return {
+        "message_ids": message_ids,
+        "states": states,
+        "delivered": bool(states)
+        and all(s.lower() == "delivered" for s in states.values()),
+    }
+
+
+async def _async_send_sms_bulk(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """
+    Wysyłka wielu spersonalizowanych wiadomości: renderowanie wszystkich pozycji
+    (wspólny cache szablonów), potem dodanie do kolejki wpisu – z limitami bramki
+    i odbiorców, failoverem w puli i tłumieniem powtórzeń. Wynik per pozycja (id
+    w kolejce = id wiadomości w SMS Gate).
+    """
+    from .notify import resolve_recipients_and_message
+
+    selected = _async_select_entry(hass, call)
+    if selected is None:
+        return {"results": [], "sent": 0, "failed": 0}
+    entry, data = selected
+    outbox: SMSGateOutbox = data["outbox"]
+    template_name = call.data.get("template")
+    priority = call.data.get("priority", DEFAULT_PRIORITY)
+
+    segment_policy: SegmentPolicy = data["segment_policy"]
+    results: list[dict[str, Any]] = []
+    for item in call.data["items"]:
+        recipients = item["recipients"]
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        phone_numbers, final_text = await resolve_recipients_and_message(
+            hass,
+            entry,
+            item.get("message", call.data["message"]),
+            recipients,
+            template_name,
+            item.get("data") or {},
+            data["template_cache"],
+            data["recipient_index"],
+        )
+        result: dict[str, Any] = {
+            "recipients": phone_numbers,
+            "success": False,
+            "message_id": None,
+            "segments": 0,
+        }
+        results.append(result)
+        parts = segment_policy.prepare(final_text) if phone_numbers else []
+        if not phone_numbers:
+            result["error"] = "no recipients"
+            continue
+        if not parts:
+            result["error"] = "too many segments"
+            continue
+        message_ids = [
+            outbox.async_enqueue(phone_numbers, part, priority=priority) for part in parts
+        ]
+        result["success"] = True
+        result["message_id"] = message_ids[0]
+        result["segments"] = sum(segment_info(part).segments for part in parts)
+    ok = sum(1 for r in results if r["success"])
+    if ok < len(results):
+        _LOGGER.warning("SMS Gate: bulk – do kolejki dodano %s z %s", ok, len(results))
+    return {"results": results, "sent": ok, "failed": len(results) - ok}
+
+
+@callback
+def _async_get_messages(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Ostatnie wiadomości z coordinatora (bez żądania do telefonu), opcjonalnie po stanie."""
+    selected = _async_select_entry(hass, call)
+    if selected is None:
+        return {"available": False, "messages": []}
+    _, data = selected
+    snapshot = data["coordinator"].data or {}
+    messages = snapshot.get("messages") or []
+    if state := call.data.get("state"):
+        messages = [m for m in messages if (m.get("state") or "").lower() == state.lower()]
+    return {
+        "available": bool(snapshot.get("available")),
+        "messages": messages[: call.data.get("limit", MESSAGES_LIMIT_DEFAULT)],
+    }
+
+
+async def _async_query_archive(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Zapytanie do archiwum wiadomości bramki (bez żądań do telefonu)."""
+    selected = _async_select_entry(hass, call)
+    if selected is None:
+        return {"count": 0, "states": {}, "messages": []}
+    entry, data = selected
+    archive: SMSGateArchive | None = data.get("archive")
+    if archive is None:
+        _LOGGER.warning("SMS Gate: archiwum wyłączone w opcjach (%s)", entry.title)
+        return {"count": 0, "states": {}, "messages": []}
+    recipients = call.data.get("recipients")
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    since = call.data.get("since")
+    until = call.data.get("until")
+    return await archive.async_query(
+        phones=data["recipient_index"].resolve(recipients) if recipients else None,
+        state=call.data.get("state"),
+        since=dt_util.as_local(since) if since else None,
+        until=dt_util.as_local(until) if until else None,
+        limit=call.data.get("limit", ARCHIVE_QUERY_LIMIT),
+    )
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -154,13 +638,43 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     _LOGGER.info("SMS Gate: unload entry entry_id=%s", entry.entry_id)
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
+    data = hass.data[DOMAIN].get(entry.entry_id)
+    if data and (task := data.get("connect_task")) is not None and not task.done():
+        # Połączenie po szybkim starcie w toku – przerwane przed zamknięciem sesji
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
     data = hass.data[DOMAIN].pop(entry.entry_id, None)
+    async_unregister_entry(hass, entry.entry_id)
     if data:
-        session: aiohttp.ClientSession = data.get("session")
-        if session and not session.closed:
-            await session.close()
+        if data.get("webhook_id"):
+            await async_unload_push(hass, data["api"], data["webhook_id"])
+        # Niewysłane bufory digest trafiają do (trwałej) kolejki przed jej zatrzymaniem
+        data["digest"].async_flush_all()
+        await data["outbox"].async_stop()
+        if data.get("archive"):
+            await data["archive"].async_stop()
+        await async_release_transport(hass)
 
-    if not hass.data[DOMAIN] and hass.services.has_service(DOMAIN, SERVICE_SEND_SMS):
-        hass.services.async_remove(DOMAIN, SERVICE_SEND_SMS)
+    if not hass.data[DOMAIN]:
+        for service in (
+            SERVICE_SEND_SMS,
+            SERVICE_SEND_SMS_BULK,
+            SERVICE_GET_MESSAGES,
+            SERVICE_QUERY_ARCHIVE,
+        ):
+            if hass.services.has_service(DOMAIN, service):
+                hass.services.async_remove(DOMAIN, service)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """
+    Usunięcie wpisu: kasuje zapisaną kolejkę wiadomości, stan coordinatora, archiwum
+    i bufory digest.
+    """
+    await async_remove_outbox(hass, entry.entry_id)
+    await async_remove_snapshot(hass, entry.entry_id)
+    await async_remove_archive(hass, entry.entry_id)
+    await async_remove_digest(hass, entry.entry_id)
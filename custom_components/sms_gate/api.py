@@ -5,17 +5,58 @@ Komunikacja z aplikacją SMS Gateway for Android w trybie Local:
 - GET /health (lub /health/ready) – weryfikacja połączenia,
 - POST /messages (fallback /message przy 404) – wysyłanie SMS,
 - GET /messages – lista wiadomości (id, state, recipients),
-- GET /messages/{id} – pojedyncza wiadomość.
+- GET /messages/{id} – pojedyncza wiadomość,
+- POST /webhooks, DELETE /webhooks/{id} – subskrypcja zdarzeń (push).
+
+Ścieżka, która odpowiedziała (np. /health/ready, /message na starszych wersjach
+aplikacji), jest zapamiętywana per bramka (capabilities) – w stanie ustalonym jedna
+operacja to jedno żądanie. Cache jest unieważniany przy 404 na zapamiętanej ścieżce
+lub po CAPABILITY_MAX_FAILURES kolejnych błędach.
+
+Po udanej wysyłce liczone są segmenty (GSM-7 / UCS-2) – segment_stats.
+
+Wysyłka niesie id wiadomości generowane po stronie klienta (klucz idempotencji),
+więc ponowienie po zerwanym połączeniu nie duplikuje SMS; błędy przejściowe są
+ponawiane z wykładniczym backoffem w ramach budżetu bramki (RetryPolicy).
+Przy otwartym wyłączniku (breaker) wysyłka jest odrzucana od razu (CIRCUIT_OPEN).
+Każde żądanie jest mierzone (metrics: histogram czasu, statusy, timeouty, bajty).
 """
 
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Callable
 import logging
+import time
 from typing import Any
+import uuid
 
 import aiohttp
 
-from .const import PATH_HEALTH, PATH_HEALTH_READY, PATH_MESSAGE_LEGACY, PATH_MESSAGES
+from .const import (
+    CAPABILITY_HEALTH,
+    CAPABILITY_MAX_FAILURES,
+    CAPABILITY_SEND,
+    PATH_HEALTH,
+    PATH_HEALTH_READY,
+    PATH_MESSAGE_LEGACY,
+    PATH_MESSAGES,
+    PATH_WEBHOOKS,
+    RETRY_STATUSES,
+    SEND_LATENCY_ALPHA,
+)
+from .breaker import CIRCUIT_OPEN, STATE_HALF_OPEN, CircuitBreaker
+from .metrics import (
+    OP_HEALTH,
+    OP_MESSAGE,
+    OP_MESSAGES,
+    OP_SEND,
+    OP_WEBHOOK,
+    RequestTracker,
+    SMSGateMetrics,
+)
+from .retry import RetryPolicy
+from .segments import ENCODING_UCS2, SegmentInfo, segment_info
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,35 +78,135 @@ class SMSGateAPI:
         session: aiohttp.ClientSession,
         username: str,
         password: str,
+        capabilities: dict[str, str] | None = None,
+        retry_policy: RetryPolicy | None = None,
     ) -> None:
-        """Inicjalizacja klienta."""
+        """
+        Inicjalizacja klienta. capabilities: zapamiętane ścieżki (np. z entry.data);
+        retry_policy: ponawianie wysyłki (domyślnie bez ponowień).
+        """
         self._base_url = base_url.rstrip("/")
         self._session = session
         self._auth = aiohttp.BasicAuth(username, password)
+        self._capabilities: dict[str, str] = dict(capabilities or {})
+        self._capability_failures: dict[str, int] = {}
+        self._capabilities_listener: Callable[[dict[str, str]], None] | None = None
+        # Średnia (EWMA) czasu udanej wysyłki w s – wybór bramki w puli
+        self.send_latency: float | None = None
+        # Rozliczenie segmentów wysłanych wiadomości (koszt u operatora)
+        self.segment_stats: dict[str, int] = {"messages": 0, "segments": 0, "ucs2_messages": 0}
+        self._retry = retry_policy or RetryPolicy(retries=0)
+        # Ponowienia wysyłki i duplikaty odrzucone przez telefon (409)
+        self.retry_stats: dict[str, int] = {"retries": 0, "duplicates": 0}
+        # Wyłącznik: wysyłki i odświeżenia coordinatora przy niedostępnym telefonie
+        self.breaker = CircuitBreaker()
+        # Czas, statusy, błędy i bajty żądań per operacja
+        self.metrics = SMSGateMetrics()
 
     def _url(self, path: str) -> str:
         return f"{self._base_url}{path}"
 
+    def _request(
+        self, operation: str, method: Callable[..., Any], path: str, **kwargs: Any
+    ) -> RequestTracker:
+        """Żądanie z pomiarem (metrics): czas, status, błędy, bajty (przez TraceConfig)."""
+        tracker = self.metrics.tracker(operation)
+        try:
+            return tracker.bind(
+                method(self._url(path), auth=self._auth, trace_request_ctx=tracker, **kwargs)
+            )
+        except Exception as e:
+            tracker.finish(e)
+            raise
+
+    @property
+    def capabilities(self) -> dict[str, str]:
+        """Zapamiętane ścieżki API (capability -> ścieżka)."""
+        return dict(self._capabilities)
+
+    def set_capabilities_listener(
+        self, listener: Callable[[dict[str, str]], None] | None
+    ) -> None:
+        """Callback wywoływany po każdej zmianie cache (np. zapis do config entry)."""
+        self._capabilities_listener = listener
+
+    def _notify_capabilities(self) -> None:
+        if self._capabilities_listener is not None:
+            self._capabilities_listener(self.capabilities)
+
+    def _ordered_paths(self, capability: str, candidates: tuple[str, ...]) -> tuple[str, ...]:
+        """Zapamiętana ścieżka na początku; pozostałe tylko jako fallback po 404."""
+        cached = self._capabilities.get(capability)
+        if cached not in candidates:
+            return candidates
+        return (cached, *(p for p in candidates if p != cached))
+
+    def _remember_path(self, capability: str, path: str) -> None:
+        self._capability_failures.pop(capability, None)
+        if self._capabilities.get(capability) == path:
+            return
+        _LOGGER.debug("Capability %s: %s", capability, path)
+        self._capabilities[capability] = path
+        self._notify_capabilities()
+
+    def _forget_path(self, capability: str) -> None:
+        self._capability_failures.pop(capability, None)
+        if self._capabilities.pop(capability, None) is not None:
+            _LOGGER.debug("Capability %s: cache unieważniony", capability)
+            self._notify_capabilities()
+
+    def _path_failed(self, capability: str) -> None:
+        """Błąd na zapamiętanej ścieżce; po CAPABILITY_MAX_FAILURES unieważnia cache."""
+        if capability not in self._capabilities:
+            return
+        failures = self._capability_failures.get(capability, 0) + 1
+        self._capability_failures[capability] = failures
+        if failures >= CAPABILITY_MAX_FAILURES:
+            self._forget_path(capability)
+
+    def _record_send_latency(self, elapsed: float) -> None:
+        if self.send_latency is None:
+            self.send_latency = elapsed
+        else:
+            self.send_latency += SEND_LATENCY_ALPHA * (elapsed - self.send_latency)
+
+    def _record_segments(self, info: SegmentInfo) -> None:
+        self.segment_stats["messages"] += 1
+        self.segment_stats["segments"] += info.segments
+        if info.encoding == ENCODING_UCS2:
+            self.segment_stats["ucs2_messages"] += 1
+
     async def async_get_health(self) -> dict[str, Any] | None:
         """
         Sprawdza dostępność bramki (GET /health).
         Przy 404 próbuje /health/ready. Zwraca dict z odpowiedzi lub None przy błędzie.
         """
-        for path in (PATH_HEALTH, PATH_HEALTH_READY):
+        cached = self._capabilities.get(CAPABILITY_HEALTH)
+        for path in self._ordered_paths(CAPABILITY_HEALTH, (PATH_HEALTH, PATH_HEALTH_READY)):
             try:
-                async with self._session.get(
-                    self._url(path),
-                    auth=self._auth,
+                async with self._request(
+                    OP_HEALTH,
+                    self._session.get,
+                    path,
                     timeout=aiohttp.ClientTimeout(total=10),
                 ) as resp:
                     if resp.status == 200:
+                        self._remember_path(CAPABILITY_HEALTH, path)
                         return await resp.json() if resp.content_length else {}
                     if resp.status == 404:
+                        if path == cached:
+                            self._forget_path(CAPABILITY_HEALTH)
+                        self.metrics.fallback(OP_HEALTH)
                         continue
                     _LOGGER.warning("Health %s: status %s", path, resp.status)
+                    self._path_failed(CAPABILITY_HEALTH)
                     return None
             except aiohttp.ClientError as e:
                 _LOGGER.debug("Health %s failed: %s", path, e)
+                if path == cached:
+                    # Znana ścieżka nie odpowiada – bramka niedostępna, nie sondujemy dalej
+                    self._path_failed(CAPABILITY_HEALTH)
+                    return None
                 continue
         return None
 
@@ -78,12 +219,17 @@ class SMSGateAPI:
         priority: int = 100,
         ttl: int = 3600,
         skip_validation: bool = True,
+        message_id: str | None = None,
     ) -> tuple[bool, str | None]:
         """
         Wysyła SMS (POST /messages, przy 404 fallback na /message).
+        message_id to klucz idempotencji (pole "id"): ponowienie z tym samym id nie
+        tworzy drugiego SMS, a 409 (id już istnieje) oznacza, że wcześniejsza próba
+        dotarła do telefonu. Błędy przejściowe są ponawiane wg retry_policy.
         Zwraca (success, message_id lub komunikat błędu).
         """
         payload: dict[str, Any] = {
+            "id": message_id or uuid.uuid4().hex,
             "phoneNumbers": phone_numbers,
             "textMessage": {"text": text},
         }
@@ -96,28 +242,87 @@ class SMSGateAPI:
         if skip_validation:
             params["skipPhoneValidation"] = "true"
 
-        for path in (PATH_MESSAGES, PATH_MESSAGE_LEGACY):
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                return False, CIRCUIT_OPEN
+            probe = self.breaker.state == STATE_HALF_OPEN
+            try:
+                success, result, transient = await self._async_post_message(payload, params)
+            except BaseException:
+                # Anulowanie lub nieoczekiwany błąd – wzięta próba half_open nie może
+                # blokować bramki (cudzej próby nie zwalniamy)
+                if probe:
+                    self.breaker.release()
+                raise
+            # Odpowiedź inna niż błąd przejściowy (np. 400) – telefon działa
+            if success or not transient:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            if success:
+                self._retry.budget.on_success()
+                return True, result
+            attempt += 1
+            if not transient or not self._retry.should_retry(attempt):
+                return False, result
+            delay = self._retry.delay(attempt)
+            self.retry_stats["retries"] += 1
+            _LOGGER.debug(
+                "Send SMS %s: ponowienie %s za %.2f s (%s)", payload["id"], attempt, delay, result
+            )
+            await asyncio.sleep(delay)
+
+    async def _async_post_message(
+        self, payload: dict[str, Any], params: dict[str, Any]
+    ) -> tuple[bool, str | None, bool]:
+        """Jedna próba wysyłki. Zwraca (success, message_id lub błąd, błąd przejściowy)."""
+        cached = self._capabilities.get(CAPABILITY_SEND)
+        started = time.monotonic()
+        for path in self._ordered_paths(CAPABILITY_SEND, (PATH_MESSAGES, PATH_MESSAGE_LEGACY)):
             try:
-                async with self._session.post(
-                    self._url(path),
-                    auth=self._auth,
+                async with self._request(
+                    OP_SEND,
+                    self._session.post,
+                    path,
                     json=payload,
                     params=params or None,
                     timeout=aiohttp.ClientTimeout(total=30),
                 ) as resp:
-                    if resp.status == 202:
+                    if resp.status in (202, 409):
+                        self._remember_path(CAPABILITY_SEND, path)
                         location = resp.headers.get("Location")
-                        msg_id = location.split("/")[-1] if location else None
-                        return True, msg_id
+                        msg_id = location.split("/")[-1] if location else payload["id"]
+                        if resp.status == 409:
+                            # Wiadomość o tym id już jest w telefonie – bez duplikatu
+                            self.retry_stats["duplicates"] += 1
+                            _LOGGER.debug("Send SMS %s: już przyjęta (409)", payload["id"])
+                        else:
+                            self._record_send_latency(time.monotonic() - started)
+                        info = segment_info(payload["textMessage"]["text"])
+                        self._record_segments(info)
+                        _LOGGER.debug(
+                            "Send SMS %s: %s segment(s) %s", msg_id, info.segments, info.encoding
+                        )
+                        return True, msg_id, False
                     if resp.status == 404:
+                        if path == cached:
+                            self._forget_path(CAPABILITY_SEND)
+                        self.metrics.fallback(OP_SEND)
                         continue
                     body = await resp.text()
                     _LOGGER.warning("Send SMS %s: %s %s", path, resp.status, body[:200])
-                    return False, f"HTTP {resp.status}: {body[:100]}"
-            except aiohttp.ClientError as e:
+                    self._path_failed(CAPABILITY_SEND)
+                    return (
+                        False,
+                        f"HTTP {resp.status}: {body[:100]}",
+                        resp.status in RETRY_STATUSES,
+                    )
+            except (aiohttp.ClientError, TimeoutError) as e:
                 _LOGGER.debug("Send SMS %s failed: %s", path, e)
-                return False, str(e)
-        return False, "Not found (404) for /messages and /message"
+                self._path_failed(CAPABILITY_SEND)
+                return False, str(e) or type(e).__name__, True
+        return False, "Not found (404) for /messages and /message", False
 
     async def async_get_messages(
         self,
@@ -128,33 +333,49 @@ class SMSGateAPI:
     ) -> list[dict[str, Any]]:
         """
         Pobiera listę wiadomości (GET /messages).
-        Zwraca listę dict (id, deviceId, recipients, state).
+        Zwraca listę dict (id, deviceId, recipients, state); przy błędzie pustą listę.
+        """
+        page = await self.async_get_messages_page(state=state, limit=limit, offset=offset)
+        return page or []
+
+    async def async_get_messages_page(
+        self,
+        *,
+        state: str | None = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> list[dict[str, Any]] | None:
+        """
+        Jak async_get_messages, ale None przy błędzie (status, sieć, timeout, JSON) –
+        odróżnia błąd od pustej strony (archiwum: koniec historii).
         """
         params: dict[str, str | int] = {"limit": limit, "offset": offset}
         if state:
             params["state"] = state
         try:
-            async with self._session.get(
-                self._url(PATH_MESSAGES),
-                auth=self._auth,
+            async with self._request(
+                OP_MESSAGES,
+                self._session.get,
+                PATH_MESSAGES,
                 params=params,
                 timeout=aiohttp.ClientTimeout(total=15),
             ) as resp:
                 if resp.status != 200:
                     _LOGGER.warning("Get messages: status %s", resp.status)
-                    return []
+                    return None
                 data = await resp.json()
-                return data if isinstance(data, list) else []
-        except (aiohttp.ClientError, ValueError) as e:
+                return data if isinstance(data, list) else None
+        except (aiohttp.ClientError, TimeoutError, ValueError) as e:
             _LOGGER.debug("Get messages failed: %s", e)
-            return []
+            return None
 
     async def async_get_message(self, message_id: str) -> dict[str, Any] | None:
         """Pobiera pojedynczą wiadomość (GET /messages/{id})."""
         try:
-            async with self._session.get(
-                self._url(f"{PATH_MESSAGES}/{message_id}"),
-                auth=self._auth,
+            async with self._request(
+                OP_MESSAGE,
+                self._session.get,
+                f"{PATH_MESSAGES}/{message_id}",
                 timeout=aiohttp.ClientTimeout(total=10),
             ) as resp:
                 if resp.status != 200:
@@ -162,3 +383,36 @@ class SMSGateAPI:
                 return await resp.json()
         except (aiohttp.ClientError, ValueError):
             return None
+
+    async def async_register_webhook(self, webhook_id: str, url: str, event: str) -> bool:
+        """Rejestruje webhook dla zdarzenia (POST /webhooks). Zwraca True przy sukcesie."""
+        try:
+            async with self._request(
+                OP_WEBHOOK,
+                self._session.post,
+                PATH_WEBHOOKS,
+                json={"id": webhook_id, "url": url, "event": event},
+                timeout=aiohttp.ClientTimeout(total=10),
+            ) as resp:
+                if resp.status in (200, 201):
+                    return True
+                body = await resp.text()
+                _LOGGER.warning("Register webhook %s: %s %s", event, resp.status, body[:200])
+                return False
+        except aiohttp.ClientError as e:
+            _LOGGER.debug("Register webhook %s failed: %s", event, e)
+            return False
+
+    async def async_delete_webhook(self, webhook_id: str) -> bool:
+        """Usuwa webhook (DELETE /webhooks/{id})."""
+        try:
+            async with self._request(
+                OP_WEBHOOK,
+                self._session.delete,
+                f"{PATH_WEBHOOKS}/{webhook_id}",
+                timeout=aiohttp.ClientTimeout(total=10),
+            ) as resp:
+                return resp.status in (200, 204, 404)
+        except aiohttp.ClientError as e:
+            _LOGGER.debug("Delete webhook %s failed: %s", webhook_id, e)
+            return False
@@ -0,0 +1,364 @@
+"""
+Archiwum wiadomości bramki w lokalnej bazie SQLite (opcja "archive").
+
+- Plik .storage/sms_gate.archive.<entry_id>.db: tabela messages (id, stan, czas,
+  pełne dane JSON) z indeksami po stanie i czasie oraz message_recipients (numer →
+  wiadomość) z indeksem po numerze.
+- async_sync: pobiera GET /messages stronami (limit/offset) od najnowszych, aż do
+  strony z już znanym id (maks. ARCHIVE_MAX_PAGES stron na synchronizację; pierwsze
+  pobranie historii jest kontynuowane w kolejnych) – potem zwykle jedno żądanie.
+  Uruchamiana w tle po starcie i co ARCHIVE_SYNC_INTERVAL (bez nakładania się),
+  pomijana przy otwartym wyłączniku bramki; async_stop przerywa trwającą.
+- Zmiany stanów z coordinatora (polling / webhook) są dopisywane na bieżąco.
+- async_query: zapytania z archiwum zamiast z telefonu (np. liczba SMS do numeru
+  w tym miesiącu, nieudane w ostatnim tygodniu).
+
+Wszystkie operacje na bazie wykonywane są w executorze (poza pętlą zdarzeń).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from contextlib import suppress
+from datetime import datetime, timedelta
+import json
+import logging
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .api import SMSGateAPI
+from .const import (
+    ARCHIVE_MAX_PAGES,
+    ARCHIVE_PAGE_SIZE,
+    ARCHIVE_QUERY_LIMIT,
+    ARCHIVE_RETENTION_DAYS,
+    ARCHIVE_SYNC_INTERVAL,
+    DOMAIN,
+)
+from .coordinator import SMSGateDataUpdateCoordinator, message_time
+
+_LOGGER = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    state TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_created ON messages (created);
+CREATE INDEX IF NOT EXISTS idx_messages_state ON messages (state, created);
+CREATE TABLE IF NOT EXISTS message_recipients (
+    message_id TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    PRIMARY KEY (message_id, phone)
+);
+CREATE INDEX IF NOT EXISTS idx_recipients_phone ON message_recipients (phone);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Klucz meta: offset, od którego kontynuować pobieranie historii (-1 = historia pobrana)
+_META_BACKFILL = "backfill_offset"
+
+
+def archive_path(hass: HomeAssistant, entry_id: str) -> str:
+    """Ścieżka pliku archiwum wpisu."""
+    return hass.config.path(".storage", f"{DOMAIN}.archive.{entry_id}.db")
+
+
+async def async_remove_archive(hass: HomeAssistant, entry_id: str) -> None:
+    """Usuwa plik archiwum (przy usunięciu wpisu)."""
+    await hass.async_add_executor_job(Path(archive_path(hass, entry_id)).unlink, True)
+
+
+def _phones(msg: dict[str, Any]) -> list[str]:
+    phones = (
+        r.get("phoneNumber") if isinstance(r, dict) else r for r in msg.get("recipients") or []
+    )
+    return [str(p) for p in phones if p]
+
+
+class SMSGateArchive:
+    """Archiwum wiadomości jednej bramki."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        api: SMSGateAPI,
+        coordinator: SMSGateDataUpdateCoordinator,
+        path: str | None = None,
+    ) -> None:
+        self._hass = hass
+        self._entry_id = entry_id
+        self._api = api
+        self._coordinator = coordinator
+        self._path = path or archive_path(hass, entry_id)
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._unsubs: list[Callable[[], None]] = []
+        # Synchronizacja w tle (po starcie / z interwału) – przerywana w async_stop
+        self._sync_task: asyncio.Task[int] | None = None
+        # Wiadomości z ostatniego snapshotu coordinatora (do wykrycia zmian po tożsamości)
+        self._last: list[dict[str, Any]] = []
+        self.last_sync: float | None = None
+        self.synced = 0
+
+    # --- operacje na bazie (executor) ---
+
+    def _open(self) -> None:
+        db = sqlite3.connect(self._path, check_same_thread=False)
+        db.executescript(_SCHEMA)
+        self._db = db
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _execute(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            if self._db is None:
+                return None
+            with self._db:
+                return func(self._db)
+
+    def _store(self, messages: list[dict[str, Any]]) -> None:
+        now = time.time()
+
+        def store(db: sqlite3.Connection) -> None:
+            db.executemany(
+                "INSERT INTO messages (id, state, created, updated, payload)"
+                " VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET"
+                " state = excluded.state, updated = excluded.updated,"
+                " payload = excluded.payload",
+                [
+                    (
+                        m["id"],
+                        m.get("state"),
+                        message_time(m, now),
+                        now,
+                        json.dumps(m, separators=(",", ":")),
+                    )
+                    for m in messages
+                ],
+            )
+            db.executemany(
+                "INSERT OR IGNORE INTO message_recipients (message_id, phone) VALUES (?, ?)",
+                [(m["id"], phone) for m in messages for phone in _phones(m)],
+            )
+
+        self._execute(store)
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self._execute(
+            lambda db: db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        )
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._execute(
+            lambda db: db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+        )
+
+    def _known(self, ids: list[str]) -> bool:
+        def known(db: sqlite3.Connection) -> bool:
+            marks = ",".join("?" * len(ids))
+            row = db.execute(
+                f"SELECT 1 FROM messages WHERE id IN ({marks}) LIMIT 1", ids
+            ).fetchone()
+            return row is not None
+
+        return bool(self._execute(known))
+
+    def _prune(self, before: float) -> None:
+        def prune(db: sqlite3.Connection) -> None:
+            db.execute("DELETE FROM messages WHERE created < ?", (before,))
+            db.execute(
+                "DELETE FROM message_recipients WHERE message_id NOT IN (SELECT id FROM messages)"
+            )
+
+        self._execute(prune)
+
+    def _query(
+        self,
+        phones: list[str] | None,
+        state: str | None,
+        since: float | None,
+        until: float | None,
+        limit: int,
+    ) -> dict[str, Any]:
+        where: list[str] = []
+        args: list[Any] = []
+        if phones:
+            where.append(
+                "id IN (SELECT message_id FROM message_recipients"
+                f" WHERE phone IN ({','.join('?' * len(phones))}))"
+            )
+            args.extend(phones)
+        if state:
+            where.append("state = ? COLLATE NOCASE")
+            args.append(state)
+        if since is not None:
+            where.append("created >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("created < ?")
+            args.append(until)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+
+        def query(db: sqlite3.Connection) -> dict[str, Any]:
+            states = dict(
+                db.execute(
+                    f"SELECT state, COUNT(*) FROM messages{clause} GROUP BY state", args
+                ).fetchall()
+            )
+            rows = db.execute(
+                f"SELECT payload FROM messages{clause} ORDER BY created DESC LIMIT ?",
+                [*args, limit],
+            ).fetchall()
+            return {
+                "count": sum(states.values()),
+                "states": states,
+                "messages": [json.loads(payload) for (payload,) in rows],
+            }
+
+        return self._execute(query) or {"count": 0, "states": {}, "messages": []}
+
+    def _count(self) -> int:
+        count = self._execute(lambda db: db.execute("SELECT COUNT(*) FROM messages").fetchone())
+        return count[0] if count else 0
+
+    # --- API asynchroniczne ---
+
+    async def async_start(self) -> None:
+        """Otwiera bazę, podpina się pod coordinatora i planuje synchronizację."""
+        await self._hass.async_add_executor_job(self._open)
+        self._unsubs.append(
+            self._coordinator.async_add_listener(self._async_handle_coordinator_update)
+        )
+        self._unsubs.append(
+            async_track_time_interval(self._hass, self._async_sync_interval, ARCHIVE_SYNC_INTERVAL)
+        )
+        self._async_schedule_sync()
+
+    async def async_stop(self) -> None:
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs.clear()
+        # Trwająca synchronizacja przerwana przed zamknięciem bazy (i sesji HTTP)
+        if self._sync_task is not None and not self._sync_task.done():
+            self._sync_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._sync_task
+        self._sync_task = None
+        await self._hass.async_add_executor_job(self._close)
+
+    @callback
+    def _async_schedule_sync(self) -> None:
+        """Synchronizacja w tle; pomijana, gdy poprzednia jeszcze trwa."""
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        self._sync_task = self._hass.async_create_background_task(
+            self.async_sync(), f"{DOMAIN}_archive_sync_{self._entry_id}"
+        )
+
+    @callback
+    def _async_handle_coordinator_update(self) -> None:
+        """Dopisuje nowe i zmienione wiadomości (coordinator podmienia zmienione obiekty)."""
+        messages = (self._coordinator.data or {}).get("messages") or []
+        previous = {id(m) for m in self._last}
+        changed = [m for m in messages if id(m) not in previous and m.get("id")]
+        self._last = list(messages)
+        if changed:
+            self._hass.async_add_executor_job(self._store, changed)
+
+    @callback
+    def _async_sync_interval(self, _now: datetime) -> None:
+        self._async_schedule_sync()
+
+    async def async_sync(self) -> int:
+        """
+        Dopisuje wiadomości z bramki stronami od najnowszych do pierwszej strony
+        z już zarchiwizowanym id. Dopóki historia nie jest pobrana w całości, kolejne
+        synchronizacje kontynuują od zapamiętanego offsetu. Zwraca liczbę zapisanych.
+        """
+        if self._api.breaker.retry_after() > 0:
+            return 0
+        add_job = self._hass.async_add_executor_job
+        resume = int(await add_job(self._get_meta, _META_BACKFILL) or 0)
+        offset = max(0, resume)
+        stored = 0
+        for _ in range(ARCHIVE_MAX_PAGES):
+            page = await self._api.async_get_messages_page(
+                limit=ARCHIVE_PAGE_SIZE, offset=offset
+            )
+            if page is None:
+                # Błąd strony (nie koniec historii) – offset zostaje, kolejna
+                # synchronizacja ją powtórzy
+                _LOGGER.debug("SMS Gate: archiwum – błąd strony (offset %s)", offset)
+                break
+            page = [m for m in page if isinstance(m, dict) and m.get("id")]
+            if not page:
+                if offset:
+                    resume = -1
+                break
+            known = resume < 0 and await add_job(self._known, [m["id"] for m in page])
+            await add_job(self._store, page)
+            stored += len(page)
+            offset += len(page)
+            if len(page) < ARCHIVE_PAGE_SIZE:
+                resume = -1
+                break
+            if known:
+                break
+        await add_job(self._set_meta, _META_BACKFILL, str(-1 if resume < 0 else offset))
+        await add_job(
+            self._prune, time.time() - timedelta(days=ARCHIVE_RETENTION_DAYS).total_seconds()
+        )
+        self.last_sync = time.time()
+        self.synced += stored
+        if stored:
+            _LOGGER.debug("SMS Gate: archiwum – zapisano %s wiadomości", stored)
+        return stored
+
+    async def async_query(
+        self,
+        *,
+        phones: list[str] | None = None,
+        state: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = ARCHIVE_QUERY_LIMIT,
+    ) -> dict[str, Any]:
+        """
+        Zapytanie do archiwum: count (łącznie), states (liczba per stan) i messages
+        (najnowsze, maks. limit).
+        """
+        return await self._hass.async_add_executor_job(
+            self._query,
+            phones,
+            state,
+            since.timestamp() if since else None,
+            until.timestamp() if until else None,
+            limit,
+        )
+
+    async def async_stats(self) -> dict[str, Any]:
+        """Statystyki do diagnostyki."""
+        return {
+            "messages": await self._hass.async_add_executor_job(self._count),
+            "synced": self.synced,
+            "last_sync": self.last_sync,
+        }
@@ -0,0 +1,117 @@
+"""
+Wyłącznik (circuit breaker) per bramka – szybka odmowa, gdy telefon jest offline.
+
+- closed: żądania przechodzą; BREAKER_THRESHOLD kolejnych błędów otwiera obwód.
+- open: żądania są odrzucane od razu (bez czekania na timeout); po
+  BREAKER_RESET_TIMEOUT s obwód przechodzi w half_open.
+- half_open: przepuszczana jest jedna próba – sukces zamyka obwód, błąd otwiera
+  go ponownie.
+
+Wynikami zasilają go wysyłki (SMSGateAPI) i odświeżenia coordinatora (available).
+Zmiana stanu wywołuje zarejestrowane callbacki (sensory).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+import time
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .const import BREAKER_RESET_TIMEOUT, BREAKER_THRESHOLD
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+BREAKER_STATES = [STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN]
+
+# Komunikat błędu wysyłki odrzuconej przy otwartym obwodzie
+CIRCUIT_OPEN = "circuit open"
+
+
+class CircuitBreaker:
+    """Wyłącznik jednej bramki."""
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ) -> None:
+        self._threshold = max(1, threshold)
+        self._reset_timeout = reset_timeout
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._listeners: list[CALLBACK_TYPE] = []
+
+    @property
+    def state(self) -> str:
+        """Bieżący stan (open po upływie reset_timeout raportowany jako half_open)."""
+        if self._state == STATE_OPEN and self.retry_after() == 0:
+            return STATE_HALF_OPEN
+        return self._state
+
+    @property
+    def failures(self) -> int:
+        return self._failures
+
+    def retry_after(self) -> float:
+        """Ile sekund do próby (half_open); 0, gdy żądania mogą przejść."""
+        if self._state != STATE_OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._reset_timeout - time.monotonic())
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> Callable[[], None]:
+        """Rejestruje callback wywoływany przy zmianie stanu."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    def _set_state(self, state: str) -> None:
+        if state == self._state:
+            return
+        _LOGGER.info("SMS Gate: wyłącznik %s → %s", self._state, state)
+        self._state = state
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    def allow_request(self) -> bool:
+        """
+        Czy żądanie może przejść. W half_open przepuszcza jedną próbę – do jej
+        wyniku (record_success / record_failure) kolejne są odrzucane.
+        """
+        if self._state == STATE_CLOSED:
+            return True
+        if self._state == STATE_OPEN:
+            if self.retry_after() > 0:
+                return False
+            self._set_state(STATE_HALF_OPEN)
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def release(self) -> None:
+        """Zwalnia próbę bez wyniku (np. anulowane żądanie)."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probing = False
+        self._set_state(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+        if self._state == STATE_HALF_OPEN or self._failures >= self._threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(STATE_OPEN)
@@ -2,9 +2,12 @@
 Config flow integracji SMS Gate (Local).
 
 - SMSGateConfigFlow: jeden krok (host, port, username, password), walidacja przez
-  GET /health; unique_id = host:port.
-- SMSGateOptionsFlow: jedna strona z dwoma polami tekstowymi – odbiorcy (linie
-  "nazwa: numer") i szablony (linie "nazwa: treść").
+  GET /health (na współdzielonym transporcie); unique_id = host:port.
+- SMSGateOptionsFlow: jedna strona – odbiorcy (linie "nazwa: numer"), szablony
+  (linie "nazwa: treść"), limity tempa wysyłki (SMS/min bramki i per odbiorca)
+  oraz udział bramki w puli (wybór bramki i failover), webhooki (push), granice
+  adaptacyjnego interwału odświeżania, segmenty SMS (transliteracja, limit,
+  polityka) oraz ponawianie wysyłki.
 """
 
 from __future__ import annotations
@@ -12,7 +15,6 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-import aiohttp
 import voluptuous as vol
 
 from homeassistant import config_entries
@@ -21,7 +23,50 @@ from homeassistant.const import CONF_HOST, CONF_PASSWORD, CONF_PORT, CONF_USERNA
 from homeassistant.core import HomeAssistant, callback
 
 from .api import SMSGateAPI
-from .const import CONF_RECIPIENTS, CONF_TEMPLATES, DEFAULT_PORT, DOMAIN
+from .const import (
+    CONF_ARCHIVE,
+    CONF_DEDUP_SUFFIX,
+    CONF_DEDUP_WINDOW,
+    CONF_DIGEST_WINDOW,
+    CONF_MAX_SEGMENTS,
+    CONF_POOL,
+    CONF_RATE_LIMIT,
+    CONF_RECIPIENT_RATE_LIMIT,
+    CONF_RECIPIENTS,
+    CONF_RETRY_BACKOFF,
+    CONF_SCAN_INTERVAL_MAX,
+    CONF_SCAN_INTERVAL_MIN,
+    CONF_SEGMENT_POLICY,
+    CONF_SEND_RETRIES,
+    CONF_SIM_COUNT,
+    CONF_SIM_MODE,
+    CONF_SIM_PREFIXES,
+    CONF_SIM_RATE_LIMIT,
+    CONF_TEMPLATES,
+    CONF_TRANSLITERATE,
+    CONF_WEBHOOK,
+    DEFAULT_DEDUP_WINDOW,
+    DEFAULT_DIGEST_WINDOW,
+    DEFAULT_MAX_SEGMENTS,
+    DEFAULT_PORT,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RECIPIENT_RATE_LIMIT,
+    DEFAULT_RETRY_BACKOFF,
+    DEFAULT_SCAN_INTERVAL_MAX,
+    DEFAULT_SCAN_INTERVAL_MIN,
+    DEFAULT_SEGMENT_POLICY,
+    DEFAULT_SEND_RETRIES,
+    DEFAULT_SIM_COUNT,
+    DEFAULT_SIM_MODE,
+    DEFAULT_SIM_RATE_LIMIT,
+    DOMAIN,
+    SEGMENT_POLICIES,
+    SIM_COUNT_MAX,
+    SIM_MODES,
+)
+from .recipients import RecipientIndex
+from .segments import SegmentPolicy
+from .transport import async_acquire_transport, async_release_transport
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -38,6 +83,25 @@ OPTIONS_SCHEMA = vol.Schema(
     {
         vol.Optional("recipients_text"): str,
         vol.Optional("templates_text"): str,
+        vol.Optional(CONF_RATE_LIMIT): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_RECIPIENT_RATE_LIMIT): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_POOL): bool,
+        vol.Optional(CONF_WEBHOOK): bool,
+        vol.Optional(CONF_SCAN_INTERVAL_MIN): vol.All(vol.Coerce(int), vol.Range(min=5)),
+        vol.Optional(CONF_SCAN_INTERVAL_MAX): vol.All(vol.Coerce(int), vol.Range(min=5)),
+        vol.Optional(CONF_TRANSLITERATE): bool,
+        vol.Optional(CONF_MAX_SEGMENTS): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_SEGMENT_POLICY): vol.In(SEGMENT_POLICIES),
+        vol.Optional(CONF_SEND_RETRIES): vol.All(vol.Coerce(int), vol.Range(min=0, max=10)),
+        vol.Optional(CONF_RETRY_BACKOFF): vol.All(vol.Coerce(float), vol.Range(min=0, max=10)),
+        vol.Optional(CONF_ARCHIVE): bool,
+        vol.Optional(CONF_DEDUP_WINDOW): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+        vol.Optional(CONF_DEDUP_SUFFIX): bool,
+        vol.Optional(CONF_DIGEST_WINDOW): vol.All(vol.Coerce(int), vol.Range(min=0, max=86400)),
+        vol.Optional(CONF_SIM_COUNT): vol.All(vol.Coerce(int), vol.Range(min=1, max=SIM_COUNT_MAX)),
+        vol.Optional(CONF_SIM_MODE): vol.In(SIM_MODES),
+        vol.Optional(CONF_SIM_RATE_LIMIT): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional("sim_prefixes_text"): str,
     }
 )
 
@@ -49,11 +113,11 @@ def _base_url(host: str, port: int) -> str:
 async def _validate_connection(hass: HomeAssistant, data: dict[str, Any]) -> str | None:
     """Weryfikuje połączenie (health). Zwraca None przy sukcesie, komunikat błędu w przeciwnym razie."""
     base_url = _base_url(data[CONF_HOST], data[CONF_PORT])
-    session = aiohttp.ClientSession()
+    transport = await async_acquire_transport(hass)
     try:
         api = SMSGateAPI(
             base_url,
-            session,
+            transport.session,
             data[CONF_USERNAME],
             data[CONF_PASSWORD],
         )
@@ -67,7 +131,7 @@ async def _validate_connection(hass: HomeAssistant, data: dict[str, Any]) -> str
             return "invalid_auth"
         return "cannot_connect"
     finally:
-        await session.close()
+        await async_release_transport(hass)
 
 
 class SMSGateConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -116,6 +180,14 @@ class SMSGateOptionsFlow(OptionsFlowWithReload):
         self._entry = config_entry
         _LOGGER.debug("Opcje flow init: entry_id=%s", config_entry.entry_id)
 
+    def _current_options(self) -> dict[str, Any]:
+        entries = self.hass.config_entries.async_entries(DOMAIN)
+        entry = next(
+            (e for e in entries if e.entry_id == self._entry.entry_id),
+            self._entry,
+        )
+        return dict(entry.options or {})
+
     def _current(self) -> tuple[dict[str, str], dict[str, str]]:
         # Opcje z rejestru – ten sam klucz co przy zapisie: "recipients", "templates"
         entries = self.hass.config_entries.async_entries(DOMAIN)
@@ -188,6 +260,12 @@ class SMSGateOptionsFlow(OptionsFlowWithReload):
                 content = parts[1].strip() if len(parts) > 1 else ""
                 if name:
                     new_templates[name] = content
+            # Prefiksy kart SIM: linie "karta: prefiks, prefiks" (puste pole czyści politykę)
+            sim_prefixes = {}
+            for line in (user_input.get("sim_prefixes_text") or "").strip().splitlines():
+                sim, sep, prefixes = line.partition(":")
+                if sep and sim.strip() and prefixes.strip():
+                    sim_prefixes[sim.strip()] = prefixes.strip()
             # Nie nadpisuj istniejących opcji pustymi słownikami
             final_recipients = new_recipients if new_recipients else recipients
             final_templates = new_templates if new_templates else templates
@@ -201,9 +279,36 @@ class SMSGateOptionsFlow(OptionsFlowWithReload):
                 list(final_recipients.keys()),
                 list(final_templates.keys()),
             )
+            # Pozostałe opcje (limity itd.) zachowane, nadpisane wartościami z formularza
             new_options = {
+                **self._current_options(),
                 CONF_RECIPIENTS: final_recipients,
                 CONF_TEMPLATES: final_templates,
+                CONF_RATE_LIMIT: user_input.get(CONF_RATE_LIMIT, DEFAULT_RATE_LIMIT),
+                CONF_RECIPIENT_RATE_LIMIT: user_input.get(
+                    CONF_RECIPIENT_RATE_LIMIT, DEFAULT_RECIPIENT_RATE_LIMIT
+                ),
+                CONF_POOL: user_input.get(CONF_POOL, False),
+                CONF_WEBHOOK: user_input.get(CONF_WEBHOOK, False),
+                CONF_SCAN_INTERVAL_MIN: user_input.get(
+                    CONF_SCAN_INTERVAL_MIN, DEFAULT_SCAN_INTERVAL_MIN
+                ),
+                CONF_SCAN_INTERVAL_MAX: user_input.get(
+                    CONF_SCAN_INTERVAL_MAX, DEFAULT_SCAN_INTERVAL_MAX
+                ),
+                CONF_TRANSLITERATE: user_input.get(CONF_TRANSLITERATE, False),
+                CONF_MAX_SEGMENTS: user_input.get(CONF_MAX_SEGMENTS, DEFAULT_MAX_SEGMENTS),
+                CONF_SEGMENT_POLICY: user_input.get(CONF_SEGMENT_POLICY, DEFAULT_SEGMENT_POLICY),
+                CONF_SEND_RETRIES: user_input.get(CONF_SEND_RETRIES, DEFAULT_SEND_RETRIES),
+                CONF_RETRY_BACKOFF: user_input.get(CONF_RETRY_BACKOFF, DEFAULT_RETRY_BACKOFF),
+                CONF_ARCHIVE: user_input.get(CONF_ARCHIVE, False),
+                CONF_DEDUP_WINDOW: user_input.get(CONF_DEDUP_WINDOW, DEFAULT_DEDUP_WINDOW),
+                CONF_DEDUP_SUFFIX: user_input.get(CONF_DEDUP_SUFFIX, True),
+                CONF_DIGEST_WINDOW: user_input.get(CONF_DIGEST_WINDOW, DEFAULT_DIGEST_WINDOW),
+                CONF_SIM_COUNT: user_input.get(CONF_SIM_COUNT, DEFAULT_SIM_COUNT),
+                CONF_SIM_MODE: user_input.get(CONF_SIM_MODE, DEFAULT_SIM_MODE),
+                CONF_SIM_RATE_LIMIT: user_input.get(CONF_SIM_RATE_LIMIT, DEFAULT_SIM_RATE_LIMIT),
+                CONF_SIM_PREFIXES: sim_prefixes,
             }
             # Aktualizuj wpis z rejestru (ten sam obiekt, z którego potem czytamy)
             entries = self.hass.config_entries.async_entries(DOMAIN)
@@ -215,6 +320,13 @@ class SMSGateOptionsFlow(OptionsFlowWithReload):
                 "Opcje: entry_to_update entry_id=%s",
                 entry_to_update.entry_id,
             )
+            # Nowe szablony i odbiorcy – cache szablonów i indeks odbiorców są nieaktualne
+            entry_data = self.hass.data.get(DOMAIN, {}).get(entry_to_update.entry_id)
+            if entry_data:
+                if entry_data.get("template_cache"):
+                    entry_data["template_cache"].invalidate()
+                entry_data["recipient_index"] = RecipientIndex(final_recipients)
+                entry_data["segment_policy"] = SegmentPolicy.from_options(new_options)
             result = self.hass.config_entries.async_update_entry(entry_to_update, options=new_options)
             _LOGGER.debug(
                 "Opcje: async_update_entry wywołane result=%s",
@@ -234,9 +346,33 @@ class SMSGateOptionsFlow(OptionsFlowWithReload):
             (recipients_default[:80] + "…") if len(recipients_default) > 80 else recipients_default or "(puste)",
             (templates_default[:80] + "…") if len(templates_default) > 80 else templates_default or "(puste)",
         )
+        options = self._current_options()
         suggested = {
             "recipients_text": recipients_default,
             "templates_text": templates_default,
+            CONF_RATE_LIMIT: options.get(CONF_RATE_LIMIT, DEFAULT_RATE_LIMIT),
+            CONF_RECIPIENT_RATE_LIMIT: options.get(
+                CONF_RECIPIENT_RATE_LIMIT, DEFAULT_RECIPIENT_RATE_LIMIT
+            ),
+            CONF_POOL: options.get(CONF_POOL, False),
+            CONF_WEBHOOK: options.get(CONF_WEBHOOK, False),
+            CONF_SCAN_INTERVAL_MIN: options.get(CONF_SCAN_INTERVAL_MIN, DEFAULT_SCAN_INTERVAL_MIN),
+            CONF_SCAN_INTERVAL_MAX: options.get(CONF_SCAN_INTERVAL_MAX, DEFAULT_SCAN_INTERVAL_MAX),
+            CONF_TRANSLITERATE: options.get(CONF_TRANSLITERATE, False),
+            CONF_MAX_SEGMENTS: options.get(CONF_MAX_SEGMENTS, DEFAULT_MAX_SEGMENTS),
+            CONF_SEGMENT_POLICY: options.get(CONF_SEGMENT_POLICY, DEFAULT_SEGMENT_POLICY),
+            CONF_SEND_RETRIES: options.get(CONF_SEND_RETRIES, DEFAULT_SEND_RETRIES),
+            CONF_RETRY_BACKOFF: options.get(CONF_RETRY_BACKOFF, DEFAULT_RETRY_BACKOFF),
+            CONF_ARCHIVE: options.get(CONF_ARCHIVE, False),
+            CONF_DEDUP_WINDOW: options.get(CONF_DEDUP_WINDOW, DEFAULT_DEDUP_WINDOW),
+            CONF_DEDUP_SUFFIX: options.get(CONF_DEDUP_SUFFIX, True),
+            CONF_DIGEST_WINDOW: options.get(CONF_DIGEST_WINDOW, DEFAULT_DIGEST_WINDOW),
+            CONF_SIM_COUNT: options.get(CONF_SIM_COUNT, DEFAULT_SIM_COUNT),
+            CONF_SIM_MODE: options.get(CONF_SIM_MODE, DEFAULT_SIM_MODE),
+            CONF_SIM_RATE_LIMIT: options.get(CONF_SIM_RATE_LIMIT, DEFAULT_SIM_RATE_LIMIT),
+            "sim_prefixes_text": "\n".join(
+                f"{k}: {v}" for k, v in (options.get(CONF_SIM_PREFIXES) or {}).items()
+            ),
         }
         return self.async_show_form(
             step_id="init",
@@ -17,14 +17,179 @@ DEFAULT_PORT = 8080
 CONF_RECIPIENTS = "recipients"
 CONF_TEMPLATES = "templates"
 
+# Options: limity tempa wysyłki (SMS na minutę; 0 = bez limitu)
+CONF_RATE_LIMIT = "rate_limit"
+CONF_RECIPIENT_RATE_LIMIT = "recipient_rate_limit"
+DEFAULT_RATE_LIMIT = 0
+DEFAULT_RECIPIENT_RATE_LIMIT = 0
+
+# Options: bramka w puli (wybór najlepszej bramki i failover między bramkami)
+CONF_POOL = "pool"
+# Wygładzanie średniej czasu wysyłki (EWMA) używanej przy wyborze bramki
+SEND_LATENCY_ALPHA = 0.3
+
+# Options: segmenty SMS – transliteracja do GSM-7, limit segmentów (0 = bez limitu)
+# i polityka przy przekroczeniu (obcięcie, podział na kilka SMS, odrzucenie)
+CONF_TRANSLITERATE = "transliterate"
+CONF_MAX_SEGMENTS = "max_segments"
+CONF_SEGMENT_POLICY = "segment_policy"
+DEFAULT_MAX_SEGMENTS = 0
+SEGMENT_POLICY_TRUNCATE = "truncate"
+SEGMENT_POLICY_SPLIT = "split"
+SEGMENT_POLICY_REJECT = "reject"
+SEGMENT_POLICIES = [SEGMENT_POLICY_TRUNCATE, SEGMENT_POLICY_SPLIT, SEGMENT_POLICY_REJECT]
+DEFAULT_SEGMENT_POLICY = SEGMENT_POLICY_SPLIT
+
+# Options: ponawianie wysyłki przy błędach przejściowych – liczba ponowień (0 = wyłączone)
+# i bazowe opóźnienie backoffu (s), podwajane przy każdej próbie (z losowym rozrzutem)
+CONF_SEND_RETRIES = "send_retries"
+CONF_RETRY_BACKOFF = "retry_backoff"
+DEFAULT_SEND_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.5
+RETRY_MAX_DELAY = 8.0
+# Budżet ponowień per bramka: maks. tokenów i przyrost za każdą udaną wysyłkę
+RETRY_BUDGET_MAX = 10.0
+RETRY_BUDGET_RATIO = 0.2
+# Statusy HTTP traktowane jako przejściowe
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Wyłącznik (circuit breaker): otwarcie po tylu kolejnych błędach, próba po czasie (s)
+BREAKER_THRESHOLD = 3
+BREAKER_RESET_TIMEOUT = 30
+
+# Metryki żądań: granice przedziałów histogramu czasu odpowiedzi (s) i adres eksportu
+METRICS_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_URL = f"/api/{DOMAIN}/metrics"
+
+# Priorytet wiadomości (zakres API SMS Gate: -128..127; >= 100 omija limity aplikacji)
+DEFAULT_PRIORITY = 100
+PRIORITY_MIN = -128
+PRIORITY_MAX = 127
+
 # Ścieżki API (Local Server)
 PATH_MESSAGES = "/messages"
 PATH_MESSAGE_LEGACY = "/message"
 PATH_HEALTH = "/health"
 PATH_HEALTH_READY = "/health/ready"
+PATH_WEBHOOKS = "/webhooks"
+
+# Webhooki (push) z aplikacji: zdarzenie -> stan wiadomości
+CONF_WEBHOOK = "webhook"
+WEBHOOK_EVENT_STATES = {
+    "sms:sent": "Sent",
+    "sms:delivered": "Delivered",
+    "sms:failed": "Failed",
+}
+
+# Cache wariantów ścieżek API (zapisywany w entry.data): capability -> ścieżka
+CONF_CAPABILITIES = "capabilities"
+CAPABILITY_HEALTH = "health"
+CAPABILITY_SEND = "send"
+# Po tylu kolejnych błędach na zapamiętanej ścieżce cache jest unieważniany
+CAPABILITY_MAX_FAILURES = 3
+
+# Ostatni stan coordinatora (Store: .storage/sms_gate.snapshot.<entry_id>) – szybki
+# start encji bez czekania na telefon; zapis z opóźnieniem (s) po zmianie danych
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 10
+
+# Kolejka wychodzących SMS (Store: .storage/sms_gate.outbox.<entry_id>)
+OUTBOX_STORAGE_VERSION = 1
+OUTBOX_SAVE_DELAY = 1
+# Liczba jednoczesnych wysyłek na bramkę
+OUTBOX_CONCURRENCY = 2
+# Ponowienia wysyłki z kolejki: liczba prób i odstęp (s)
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 30
 
 # Interwał odświeżania coordinatora
 UPDATE_INTERVAL = timedelta(seconds=60)
 
+# Options: granice adaptacyjnego interwału odświeżania (s)
+CONF_SCAN_INTERVAL_MIN = "scan_interval_min"
+CONF_SCAN_INTERVAL_MAX = "scan_interval_max"
+DEFAULT_SCAN_INTERVAL_MIN = 10
+DEFAULT_SCAN_INTERVAL_MAX = 300
+# Łączny limit czasu jednego odświeżenia coordinatora (s) – health i lista równolegle
+REFRESH_TIMEOUT = 15
+
+# Po wysłaniu SMS coordinator odświeża często przez ten czas (s)
+ACTIVITY_WINDOW = 120
+
+# Przy aktywnych webhookach polling służy tylko do uzgadniania stanu
+WEBHOOK_RECONCILE_INTERVAL = timedelta(minutes=15)
+
 # Limit wiadomości pobieranych w jednym żądaniu
 MESSAGES_LIMIT_DEFAULT = 20
+# Maks. liczba śledzonych (niefinalnych) wiadomości w indeksie coordinatora
+MESSAGES_TRACK_LIMIT = 50
+# Stany końcowe wiadomości (małe litery) – nie są ponownie odpytywane
+MESSAGE_FINAL_STATES = frozenset({"delivered", "failed"})
+# Stany, w których telefon jeszcze przetwarza wiadomość – krótki interwał odświeżania
+MESSAGE_BUSY_STATES = frozenset({"pending", "processed"})
+# Niefinalne wiadomości starsze niż MESSAGE_STALE_AGE s (np. "Sent" bez raportu
+# doręczenia) nie są odpytywane pojedynczo ani nie skracają interwału
+MESSAGE_STALE_AGE = 3600
+
+# Śledzenie dostarczenia wysłanych wiadomości: maks. liczba śledzonych id, czas
+# śledzenia (s), zdarzenie HA przy zmianie stanu, domyślny limit czekania serwisu (s)
+DELIVERY_TRACK_LIMIT = 100
+DELIVERY_TRACK_TIMEOUT = 3600
+EVENT_MESSAGE_STATE = f"{DOMAIN}_message_state"
+DEFAULT_DELIVERY_TIMEOUT = 120
+
+# Options: tłumienie powtórzeń – okno (s; 0 = wyłączone) i dopisek "(xN)" do oryginału
+# czekającego w kolejce; maks. liczba pamiętanych wiadomości (LRU)
+CONF_DEDUP_WINDOW = "dedup_window"
+CONF_DEDUP_SUFFIX = "dedup_suffix"
+DEFAULT_DEDUP_WINDOW = 0
+DEDUP_CAPACITY = 256
+
+# Options: zbiorcze SMS (digest) – okno zbierania (s; 0 = wyłączone). Do bufora trafiają
+# wiadomości z data.digest: true lub o priorytecie poniżej progu; zbiorczy SMS ma
+# priorytet DIGEST_PRIORITY i jest wysyłany wcześniej po przekroczeniu limitu segmentów
+CONF_DIGEST_WINDOW = "digest_window"
+DEFAULT_DIGEST_WINDOW = 0
+DIGEST_PRIORITY_THRESHOLD = 1
+DIGEST_PRIORITY = 0
+DIGEST_MAX_SEGMENTS = 3
+# Bufory digest w Store (.storage/sms_gate.digest.<entry_id>) – przetrwają restart HA
+DIGEST_STORAGE_VERSION = 1
+DIGEST_SAVE_DELAY = 1
+
+# Options: karty SIM bramki – liczba kart (1 = karta domyślna telefonu, bez simNumber),
+# wybór karty (round_robin / lru), limit na kartę (SMS na minutę, 0 = bez limitu)
+# i prefiksy numerów przypisane do kart (karta w tej samej sieci co odbiorca)
+CONF_SIM_COUNT = "sim_count"
+CONF_SIM_MODE = "sim_mode"
+CONF_SIM_RATE_LIMIT = "sim_rate_limit"
+CONF_SIM_PREFIXES = "sim_prefixes"
+DEFAULT_SIM_COUNT = 1
+SIM_COUNT_MAX = 4
+SIM_MODE_ROUND_ROBIN = "round_robin"
+SIM_MODE_LRU = "lru"
+SIM_MODES = [SIM_MODE_ROUND_ROBIN, SIM_MODE_LRU]
+DEFAULT_SIM_MODE = SIM_MODE_ROUND_ROBIN
+DEFAULT_SIM_RATE_LIMIT = 0
+
+# Options: archiwum wiadomości (SQLite: .storage/sms_gate.archive.<entry_id>.db).
+# Synchronizacja stronami GET /messages (rozmiar strony, maks. stron na raz) do
+# pierwszego znanego id, co ARCHIVE_SYNC_INTERVAL; retencja (dni); limit wyników zapytania
+CONF_ARCHIVE = "archive"
+ARCHIVE_PAGE_SIZE = 50
+ARCHIVE_MAX_PAGES = 20
+ARCHIVE_SYNC_INTERVAL = timedelta(hours=1)
+ARCHIVE_RETENTION_DAYS = 365
+ARCHIVE_QUERY_LIMIT = 100
+
+# Współdzielony transport HTTP (klucz w hass.data poza hass.data[DOMAIN])
+DATA_TRANSPORT = f"{DOMAIN}_transport"
+
+# Tablica routingu serwisów: entity_id / device_id -> entry_id (klucz w hass.data)
+DATA_ROUTER = f"{DOMAIN}_router"
+
+# Pula połączeń: limit łączny, limit na host (telefon), keep-alive (s), cache DNS (s)
+POOL_LIMIT = 32
+POOL_LIMIT_PER_HOST = 4
+POOL_KEEPALIVE_TIMEOUT = 30
+POOL_DNS_CACHE_TTL = 300
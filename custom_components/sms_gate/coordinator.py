@@ -1,58 +1,479 @@
 """
 Coordinator odświeżający status i listę wiadomości SMS Gate.
 
-Co UPDATE_INTERVAL sekund pobiera health (available) oraz GET /messages (limit 20).
+Co UPDATE_INTERVAL sekund pobiera równolegle health (available) oraz GET /messages
+(limit 20) ze wspólnym limitem czasu REFRESH_TIMEOUT; przy błędzie jednego z żądań
+wynik drugiego jest nadal wykorzystywany.
 Wynik w coordinator.data: {"available": bool, "messages": list[dict]}.
 Używane przez sensory: status, ostatnie wiadomości, liczba oczekujących.
+
+Wiadomości trzymane są w indeksie po id; każda odpowiedź jest scalana jako różnica
+(nowe / zmienione / końcowe). Wiadomości niefinalne spoza pobranej strony są
+odpytywane pojedynczo (GET /messages/{id}). Gdy nic się nie zmieniło, encje nie są
+aktualizowane (always_update=False) – brak zbędnych zapisów recordera.
+
+Wiadomości niefinalne starsze niż MESSAGE_STALE_AGE (np. "Sent" bez raportu
+doręczenia) nie są już odpytywane pojedynczo, chyba że są śledzone.
+
+Interwał jest adaptacyjny: krótki (scan_interval_min), gdy są świeże wiadomości
+w stanie Pending/Processed, śledzone wysłane wiadomości lub niedawno wysłano SMS;
+w bezczynności i przy kolejnych błędach health rośnie wykładniczo do
+scan_interval_max.
+
+Przy aktywnych webhookach zdarzenia sms:sent/delivered/failed od razu aktualizują
+stan wiadomości (async_handle_push_event), a polling zwalnia do
+WEBHOOK_RECONCILE_INTERVAL (uzgadnianie stanu).
+
+Śledzenie dostarczenia: id wysłanych wiadomości (async_note_activity, async_watch)
+są odpytywane razem z niefinalnymi do stanu końcowego (najwyżej
+DELIVERY_TRACK_TIMEOUT s); każda zmiana stanu wywołuje zdarzenie
+sms_gate_message_state, a async_wait_for_final zwraca future rozwiązywany stanem
+końcowym (serwis send_sms z wait_for_delivery). Przy failoverze w puli
+async_move_waiters przekazuje śledzenie i oczekujących coordinatorowi bramki docelowej.
+
+Ostatnie dane (available, wiadomości) są zapisywane w Store po każdej zmianie;
+po restarcie HA async_load_snapshot odtwarza je przed pierwszym odświeżeniem, więc
+encje startują od razu, a odświeżenie na żywo biegnie w tle.
+
+Wynik odświeżenia (available) zasila wyłącznik bramki (api.breaker); przy otwartym
+wyłączniku odświeżenie nie wysyła żądań, a bramka jest raportowana jako niedostępna.
 """
 
 from __future__ import annotations
 
+import asyncio
+from collections import Counter
+from datetime import timedelta
 import logging
+import time
+from collections.abc import Awaitable
 from typing import Any
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
 
 from .api import SMSGateAPI
-from .const import MESSAGES_LIMIT_DEFAULT, UPDATE_INTERVAL
+from .breaker import STATE_HALF_OPEN, CircuitBreaker
+from .const import (
+    ACTIVITY_WINDOW,
+    DEFAULT_SCAN_INTERVAL_MAX,
+    DEFAULT_SCAN_INTERVAL_MIN,
+    DELIVERY_TRACK_LIMIT,
+    DELIVERY_TRACK_TIMEOUT,
+    DOMAIN,
+    EVENT_MESSAGE_STATE,
+    MESSAGE_BUSY_STATES,
+    MESSAGE_FINAL_STATES,
+    MESSAGE_STALE_AGE,
+    MESSAGES_LIMIT_DEFAULT,
+    MESSAGES_TRACK_LIMIT,
+    REFRESH_TIMEOUT,
+    SNAPSHOT_SAVE_DELAY,
+    SNAPSHOT_STORAGE_VERSION,
+    UPDATE_INTERVAL,
+    WEBHOOK_EVENT_STATES,
+    WEBHOOK_RECONCILE_INTERVAL,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def _snapshot_key(entry_id: str) -> str:
+    return f"{DOMAIN}.snapshot.{entry_id}"
+
+
+async def async_remove_snapshot(hass: HomeAssistant, entry_id: str) -> None:
+    """Usuwa zapisany stan coordinatora (przy usunięciu wpisu integracji)."""
+    await Store(hass, SNAPSHOT_STORAGE_VERSION, _snapshot_key(entry_id)).async_remove()
+
+
+def _is_final(msg: dict[str, Any]) -> bool:
+    return (msg.get("state") or "").lower() in MESSAGE_FINAL_STATES
+
+
+def _is_busy(msg: dict[str, Any]) -> bool:
+    return (msg.get("state") or "").lower() in MESSAGE_BUSY_STATES
+
+
+def message_time(msg: dict[str, Any], default: float) -> float:
+    """Czas utworzenia wiadomości: najwcześniejszy znacznik z "states" lub default."""
+    times = []
+    for value in (msg.get("states") or {}).values():
+        if isinstance(value, str) and (parsed := dt_util.parse_datetime(value)):
+            times.append(parsed.timestamp())
+    return min(times, default=default)
+
+
+async def _gather_within(aws: list[Awaitable[Any]], timeout: float) -> list[Any]:
+    """
+    Uruchamia żądania równolegle z łącznym limitem czasu. Zwraca wyniki w kolejności;
+    None dla żądań zakończonych błędem lub przerwanych po upływie czasu.
+    """
+    if not aws:
+        return []
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=max(0.0, timeout))
+    finally:
+        # Po limicie czasu lub przy anulowaniu samego odświeżenia (unload) żądania
+        # są przerywane i dokańczane przed wyjściem
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+    results: list[Any] = []
+    for task in tasks:
+        if task in pending:
+            results.append(None)
+        elif (exc := task.exception()) is not None:
+            _LOGGER.debug("SMS Gate: żądanie nie powiodło się: %s", exc)
+            results.append(None)
+        else:
+            results.append(task.result())
+    return results
+
+
 class SMSGateDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
     """
     Odświeża dane z bramki: health (available) oraz lista ostatnich wiadomości.
     coordinator.data = {"available": bool, "messages": list[dict]}
     """
 
-    def __init__(self, hass: HomeAssistant, api: SMSGateAPI) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: SMSGateAPI,
+        *,
+        min_interval: int = DEFAULT_SCAN_INTERVAL_MIN,
+        max_interval: int = DEFAULT_SCAN_INTERVAL_MAX,
+    ) -> None:
         super().__init__(
             hass,
             _LOGGER,
             name="SMS Gate",
             update_interval=UPDATE_INTERVAL,
+            always_update=False,
         )
         self._api = api
+        # Indeks wiadomości po id; _order – id od najnowszej
+        self._index: dict[str, dict[str, Any]] = {}
+        self._order: list[str] = []
+        # Czas utworzenia wiadomości (lub pierwszego zobaczenia) – wiek niefinalnych
+        self._created: dict[str, float] = {}
+        # Podsumowanie ostatniego scalenia (diagnostyka)
+        self.last_diff: dict[str, int] = {}
+        self._min_interval = min_interval
+        self._max_interval = max(min_interval, max_interval)
+        self._push_active = False
+        self.health_failures = 0
+        self._active_until = 0.0
+        # Śledzone wysłane wiadomości: id -> (ostatni stan lub None, koniec śledzenia)
+        self._tracked: dict[str, tuple[str | None, float]] = {}
+        self._waiters: dict[str, list[asyncio.Future[str]]] = {}
+        self._store: Store[dict[str, Any]] | None = None
         self.data = {"available": False, "messages": []}
 
-    async def _async_update_data(self) -> dict[str, Any]:
-        """Pobiera health i listę wiadomości; przy błędzie health ustawia available=False."""
-        available = False
-        messages: list[dict[str, Any]] = []
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Wyłącznik bramki (wspólny z klientem API)."""
+        return self._api.breaker
 
-        try:
-            health = await self._api.async_get_health()
-            available = health is not None
-        except Exception as e:
-            _LOGGER.debug("Health check failed: %s", e)
+    def _merge(self, msg: dict[str, Any]) -> str | None:
+        """Scala wiadomość z indeksem. Zwraca "new", "changed" lub None (bez zmian)."""
+        msg_id = msg.get("id")
+        if not msg_id:
+            return None
+        old = self._index.get(msg_id)
+        if old == msg:
+            return None
+        self._index[msg_id] = msg
+        if msg_id in self._tracked:
+            self._async_track_state(msg_id, msg)
+        if old is None:
+            self._order.insert(0, msg_id)
+            self._created[msg_id] = message_time(msg, time.time())
+            return "new"
+        return "changed"
 
+    @callback
+    def async_watch(self, message_id: str) -> None:
+        """Zaczyna śledzić wiadomość do stanu końcowego (zdarzenia przy zmianach)."""
+        if message_id in self._tracked:
+            return
+        self._tracked[message_id] = (None, time.monotonic() + DELIVERY_TRACK_TIMEOUT)
+        while len(self._tracked) > DELIVERY_TRACK_LIMIT:
+            self._async_untrack(next(iter(self._tracked)))
+
+    @callback
+    def async_wait_for_final(self, message_id: str) -> asyncio.Future[str]:
+        """Future rozwiązywany stanem końcowym wiadomości (Delivered / Failed)."""
+        msg = self._index.get(message_id)
+        future: asyncio.Future[str] = self.hass.loop.create_future()
+        if msg is not None and _is_final(msg):
+            future.set_result(msg["state"])
+            return future
+        self.async_watch(message_id)
+        self._waiters.setdefault(message_id, []).append(future)
+        future.add_done_callback(self._async_drop_waiter)
+        return future
+
+    @callback
+    def _async_drop_waiter(self, future: asyncio.Future[str]) -> None:
+        """Anulowany future (np. koniec delivery_timeout) znika z oczekujących."""
+        if not future.cancelled():
+            return
+        for message_id, waiters in list(self._waiters.items()):
+            if future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[message_id]
+                return
+
+    @callback
+    def async_move_waiters(
+        self, message_id: str, other: SMSGateDataUpdateCoordinator
+    ) -> None:
+        """Przekazuje śledzenie i oczekujących na stan wiadomości innej bramce (failover)."""
+        if self._tracked.pop(message_id, None) is None:
+            return
+        other.async_watch(message_id)
+        for future in self._waiters.pop(message_id, ()):
+            future.remove_done_callback(self._async_drop_waiter)
+            future.add_done_callback(other._async_drop_waiter)
+            other._waiters.setdefault(message_id, []).append(future)
+
+    @callback
+    def _async_untrack(self, message_id: str, state: str | None = None) -> None:
+        self._tracked.pop(message_id, None)
+        for future in self._waiters.pop(message_id, ()):
+            if not future.done():
+                if state is None:
+                    future.cancel()
+                else:
+                    future.set_result(state)
+
+    @callback
+    def _async_track_state(self, message_id: str, msg: dict[str, Any]) -> None:
+        """Zdarzenie przy zmianie stanu śledzonej wiadomości; stan końcowy kończy śledzenie."""
+        state = msg.get("state")
+        previous, _ = self._tracked[message_id]
+        if state == previous:
+            return
+        self._tracked[message_id] = (state, self._tracked[message_id][1])
+        self.hass.bus.async_fire(
+            EVENT_MESSAGE_STATE,
+            {
+                "message_id": message_id,
+                "state": state,
+                "previous_state": previous,
+                "recipients": [
+                    r.get("phoneNumber") if isinstance(r, dict) else str(r)
+                    for r in msg.get("recipients") or []
+                ],
+            },
+        )
+        if _is_final(msg):
+            self._async_untrack(message_id, state)
+
+    def _prune(self) -> None:
+        """Zostawia najnowsze wiadomości oraz (do limitu) niefinalne, nadal śledzone."""
+        keep: list[str] = []
+        for pos, msg_id in enumerate(self._order):
+            if pos < MESSAGES_LIMIT_DEFAULT or (
+                pos < MESSAGES_TRACK_LIMIT and not _is_final(self._index[msg_id])
+            ):
+                keep.append(msg_id)
+            else:
+                del self._index[msg_id]
+                self._created.pop(msg_id, None)
+        self._order = keep
+
+    def _is_fresh(self, msg_id: str, now: float) -> bool:
+        """Czy wiadomość jest młodsza niż MESSAGE_STALE_AGE (now – czas ścienny)."""
+        return now - self._created.get(msg_id, now) < MESSAGE_STALE_AGE
+
+    async def async_load_snapshot(self, entry_id: str) -> bool:
+        """
+        Odtwarza dane zapisane przed restartem (bez żądań do telefonu) i włącza zapis
+        kolejnych zmian. Zwraca True, gdy zapisany stan istniał.
+        """
+        self._store = Store(self.hass, SNAPSHOT_STORAGE_VERSION, _snapshot_key(entry_id))
+        stored = await self._store.async_load()
+        if not isinstance(stored, dict):
+            return False
+        messages = [m for m in stored.get("messages") or [] if isinstance(m, dict) and m.get("id")]
+        self._index = {m["id"]: m for m in messages}
+        self._order = [m["id"] for m in messages]
+        now = time.time()
+        self._created = {m["id"]: message_time(m, now) for m in messages}
+        self.data = self._snapshot(bool(stored.get("available")))
+        _LOGGER.debug(
+            "SMS Gate: odtworzono stan sprzed restartu (%s wiadomości)", len(self._order)
+        )
+        return True
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Aktualizuje encje i planuje zapis danych (tylko przy zmianie danych)."""
+        super().async_update_listeners()
+        if self._store is not None:
+            self._store.async_delay_save(lambda: self.data, SNAPSHOT_SAVE_DELAY)
+
+    def _snapshot(self, available: bool) -> dict[str, Any]:
+        return {
+            "available": available,
+            "messages": [self._index[i] for i in self._order[:MESSAGES_LIMIT_DEFAULT]],
+        }
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        """
+        Pobiera równolegle health i listę wiadomości (wspólny limit czasu).
+        Przy błędzie listy indeks zachowuje poprzednie wiadomości.
+        """
+        breaker = self.breaker
+        if not breaker.allow_request():
+            # Wyłącznik otwarty – bez żądań do telefonu do czasu próby (half_open)
+            self.update_interval = self._next_interval(False)
+            return self._snapshot(False)
+        # Próbę half_open zwalnia tylko odświeżenie, które ją wzięło – inaczej
+        # zwolniłoby próbę równoległej wysyłki
+        probe = breaker.state == STATE_HALF_OPEN
         try:
-            messages = await self._api.async_get_messages(limit=MESSAGES_LIMIT_DEFAULT)
-        except Exception as e:
-            _LOGGER.debug("Get messages failed: %s", e)
-            # Zachowaj poprzednią listę przy błędzie, jeśli mamy
-            if self.data and isinstance(self.data.get("messages"), list):
-                messages = self.data["messages"]
-
-        return {"available": available, "messages": messages}
+            return await self._async_refresh_gateway()
+        finally:
+            if probe:
+                breaker.release()
+
+    async def _async_refresh_gateway(self) -> dict[str, Any]:
+        deadline = time.monotonic() + REFRESH_TIMEOUT
+        health, page = await _gather_within(
+            [
+                self._api.async_get_health(),
+                self._api.async_get_messages(limit=MESSAGES_LIMIT_DEFAULT),
+            ],
+            REFRESH_TIMEOUT,
+        )
+        page = page if isinstance(page, list) else []
+        # Odpowiedź z listą wiadomości też oznacza, że bramka działa
+        available = health is not None or bool(page)
+
+        diff: Counter[str] = Counter()
+        seen: set[str] = set()
+        # Od najstarszej, żeby najnowsza trafiła na początek indeksu
+        for msg in reversed(page):
+            if not isinstance(msg, dict):
+                continue
+            seen.add(msg.get("id"))
+            if kind := self._merge(msg):
+                diff[kind] += 1
+                if _is_final(msg):
+                    diff["final"] += 1
+
+        now = time.monotonic()
+        for msg_id in [i for i, (_, until) in self._tracked.items() if until < now]:
+            self._async_untrack(msg_id)
+        # Niefinalne spoza strony – tylko śledzone i świeże (stare "Sent" bez raportu nie)
+        wall = time.time()
+        stale = [
+            i
+            for i in self._order
+            if i not in seen
+            and not _is_final(self._index[i])
+            and (i in self._tracked or self._is_fresh(i, wall))
+        ]
+        # Śledzone, jeszcze niewidziane w indeksie – odpytywane pojedynczo
+        stale += [i for i in self._tracked if i not in seen and i not in self._index]
+        if available and stale:
+            for msg in await _gather_within(
+                [self._api.async_get_message(i) for i in stale],
+                deadline - time.monotonic(),
+            ):
+                if isinstance(msg, dict) and (kind := self._merge(msg)):
+                    diff[kind] += 1
+                    if _is_final(msg):
+                        diff["final"] += 1
+
+        if available:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        self._prune()
+        self.last_diff = dict(diff)
+        if diff:
+            _LOGGER.debug("SMS Gate: zmiany wiadomości %s", self.last_diff)
+        self.update_interval = self._next_interval(available)
+        return self._snapshot(available)
+
+    def _next_interval(self, available: bool) -> timedelta:
+        """Interwał do kolejnego odświeżenia na podstawie aktywności i stanu bramki."""
+        if self._push_active:
+            return WEBHOOK_RECONCILE_INTERVAL
+        current = (self.update_interval or UPDATE_INTERVAL).total_seconds()
+        if not available:
+            self.health_failures += 1
+            seconds = max(current, self._min_interval) * 2
+        else:
+            self.health_failures = 0
+            wall = time.time()
+            busy = (
+                time.monotonic() < self._active_until
+                or bool(self._tracked)
+                or any(
+                    _is_busy(self._index[i]) and self._is_fresh(i, wall) for i in self._order
+                )
+            )
+            seconds = self._min_interval if busy else current * 2
+        return timedelta(seconds=min(self._max_interval, max(self._min_interval, seconds)))
+
+    @callback
+    def async_note_activity(self, message_id: str | None = None) -> None:
+        """Wysłano SMS – odświeżaj często przez ACTIVITY_WINDOW, pierwsze odświeżenie od razu."""
+        self._active_until = time.monotonic() + ACTIVITY_WINDOW
+        if message_id:
+            self.async_watch(message_id)
+        if self._push_active:
+            return
+        self.update_interval = timedelta(seconds=self._min_interval)
+        self.hass.async_create_task(self.async_request_refresh())
+
+    @callback
+    def async_set_push_active(self, active: bool) -> None:
+        """Włącza/wyłącza tryb push: polling tylko jako wolne uzgadnianie stanu."""
+        self._push_active = active
+        self.update_interval = WEBHOOK_RECONCILE_INTERVAL if active else UPDATE_INTERVAL
+
+    @callback
+    def async_handle_push_event(self, event: str, payload: dict[str, Any]) -> bool:
+        """
+        Aktualizuje stan wiadomości ze zdarzenia webhooka (sms:sent/delivered/failed).
+        Zwraca True, gdy zdarzenie zostało rozpoznane.
+        """
+        state = WEBHOOK_EVENT_STATES.get(event)
+        message_id = payload.get("messageId")
+        if state is None or not message_id:
+            return False
+        phone = payload.get("phoneNumber")
+        old = self._index.get(message_id)
+        if old is None:
+            msg: dict[str, Any] = {
+                "id": message_id,
+                "recipients": [{"phoneNumber": phone}] if phone else [],
+            }
+        else:
+            msg = dict(old)
+        msg["state"] = state
+        if phone and isinstance(msg.get("recipients"), list):
+            msg["recipients"] = [
+                {**r, "state": state}
+                if isinstance(r, dict) and r.get("phoneNumber") == phone
+                else r
+                for r in msg["recipients"]
+            ]
+        self._merge(msg)
+        self._prune()
+        # Zdarzenie z telefonu = bramka dostępna
+        self.breaker.record_success()
+        self.async_set_updated_data(self._snapshot(True))
+        return True
@@ -0,0 +1,64 @@
+"""
+Tłumienie powtórzeń: ta sama treść do tych samych odbiorców w oknie czasowym.
+
+- Klucz: skrót zbioru numerów (bez kolejności) i treści po wyrenderowaniu szablonu.
+- Pierwsza wiadomość idzie normalnie; powtórzenia w ciągu okna (liczonego od
+  pierwszej) nie tworzą nowych SMS, tylko zwiększają licznik. Gdy oryginał jeszcze
+  czeka w kolejce, kolejka może dopisać do niego "(xN)".
+- Pamięć ograniczona (LRU, DEDUP_CAPACITY kluczy); liczba stłumionych powtórzeń
+  w suppressed (sensor, metryki, diagnostyka).
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+import hashlib
+
+from .const import DEDUP_CAPACITY
+
+
+@dataclass(slots=True)
+class DuplicateEntry:
+    """Pierwsza wiadomość w oknie: id w kolejce, treść i liczba wystąpień."""
+
+    item_id: str
+    text: str
+    first: float
+    count: int = 1
+
+
+class MessageDeduplicator:
+    """Okno tłumienia powtórzeń jednej bramki (window w s; 0 = wyłączone)."""
+
+    def __init__(self, window: float, capacity: int = DEDUP_CAPACITY) -> None:
+        self.window = max(0.0, window)
+        self._capacity = max(1, capacity)
+        self._entries: OrderedDict[str, DuplicateEntry] = OrderedDict()
+        self.suppressed = 0
+
+    @staticmethod
+    def key(phone_numbers: Iterable[str], text: str) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update("\x1f".join(sorted(set(phone_numbers))).encode())
+        digest.update(b"\x1e")
+        digest.update(text.encode())
+        return digest.hexdigest()
+
+    def check(self, key: str, now: float) -> DuplicateEntry | None:
+        """Zwraca wpis, gdy to powtórzenie w oknie (licznik zwiększony), inaczej None."""
+        entry = self._entries.get(key)
+        if entry is None or now - entry.first >= self.window:
+            return None
+        self._entries.move_to_end(key)
+        entry.count += 1
+        self.suppressed += 1
+        return entry
+
+    def remember(self, key: str, item_id: str, text: str, now: float) -> None:
+        """Zapamiętuje pierwszą wiadomość nowego okna (najstarsze klucze są usuwane)."""
+        self._entries[key] = DuplicateEntry(item_id, text, now)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
@@ -0,0 +1,85 @@
+"""
+Diagnostyka integracji SMS Gate (Ustawienia → Urządzenia → Pobierz diagnostykę).
+
+Zawiera dane wpisu (bez hasła i id webhooka), stan coordinatora (z ostatnimi
+wiadomościami bez numerów odbiorców), wykryte ścieżki API (capabilities),
+statystyki puli połączeń HTTP, cache szablonów (trafienia/chybienia), liczniki
+wysłanych segmentów SMS i ponowień wysyłki, metryki żądań, stan wyłącznika bramki,
+statystyki archiwum wiadomości, liczbę stłumionych powtórzeń, stan buforów
+zbiorczych SMS (digest) oraz liczniki kart SIM.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import REDACTED, async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME, CONF_WEBHOOK_ID
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+# webhook_id to jedyny sekret webhooka (bez podpisu żądań)
+TO_REDACT = {CONF_PASSWORD, CONF_USERNAME, CONF_WEBHOOK_ID}
+# Numery odbiorców w wiadomościach z bramki
+MESSAGE_TO_REDACT = {"phoneNumber", "phoneNumbers"}
+
+
+def _redact_messages(messages: list[dict[str, Any]] | None) -> list[dict[str, Any]]:
+    """Wiadomości bez numerów telefonów (odbiorcy jako napisy – zastąpieni w całości)."""
+    redacted = []
+    for msg in messages or []:
+        msg = async_redact_data(msg, MESSAGE_TO_REDACT)
+        if isinstance(msg, dict) and isinstance(msg.get("recipients"), list):
+            msg["recipients"] = [
+                r if isinstance(r, dict) else REDACTED for r in msg["recipients"]
+            ]
+        redacted.append(msg)
+    return redacted
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Diagnostyka dla config entry."""
+    data = hass.data[DOMAIN].get(entry.entry_id) or {}
+    api = data.get("api")
+    coordinator = data.get("coordinator")
+    transport = data.get("transport")
+    template_cache = data.get("template_cache")
+    archive = data.get("archive")
+    outbox = data.get("outbox")
+    digest = data.get("digest")
+    sims = data.get("sims")
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "coordinator": {
+            "available": (coordinator.data or {}).get("available") if coordinator else None,
+            "last_update_success": coordinator.last_update_success if coordinator else None,
+            "last_diff": coordinator.last_diff if coordinator else None,
+            "update_interval": (
+                coordinator.update_interval.total_seconds()
+                if coordinator and coordinator.update_interval
+                else None
+            ),
+            "health_failures": coordinator.health_failures if coordinator else None,
+            # Pełna lista ostatnich wiadomości (atrybut sensora nie trafia do recordera)
+            "messages": (
+                _redact_messages((coordinator.data or {}).get("messages")) if coordinator else None
+            ),
+        },
+        "capabilities": api.capabilities if api else None,
+        "connection_pool": transport.stats() if transport else None,
+        "template_cache": template_cache.stats() if template_cache else None,
+        "segments": dict(api.segment_stats) if api else None,
+        "retries": dict(api.retry_stats) if api else None,
+        "metrics": api.metrics.as_dict() if api else None,
+        "breaker": (
+            {"state": api.breaker.state, "failures": api.breaker.failures} if api else None
+        ),
+        "archive": await archive.async_stats() if archive else None,
+        "duplicates_suppressed": outbox.suppressed if outbox else None,
+        "digest": digest.stats() if digest else None,
+        "sims": sims.stats() if sims else None,
+    }
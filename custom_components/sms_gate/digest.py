@@ -0,0 +1,168 @@
+"""
+Zbiorcze SMS (digest) dla rutynowych powiadomień (opcja digest_window).
+
+- Wiadomości z data.digest: true lub o priorytecie poniżej DIGEST_PRIORITY_THRESHOLD
+  nie idą od razu do kolejki, tylko do bufora odbiorcy (osobnego dla każdego numeru).
+- Bufor odbiorcy jest wysyłany jako jeden SMS (linie "HH:MM treść") po upływie okna
+  liczonego od pierwszej wiadomości w buforze albo wcześniej, gdy kolejna linia
+  przekroczyłaby DIGEST_MAX_SEGMENTS segmentów.
+- Wiadomości o wysokim priorytecie (alarmy) i z data.digest: false omijają bufor.
+- Bufory są zapisywane w Store (.storage/sms_gate.digest.<entry_id>) – po restarcie
+  HA async_load odtwarza je i wznawia odliczanie okna od pierwszej wiadomości.
+- Przy unloadzie wpisu bufory są od razu przekazywane do kolejki (trwałej).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime
+from functools import partial
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DIGEST_MAX_SEGMENTS,
+    DIGEST_PRIORITY,
+    DIGEST_PRIORITY_THRESHOLD,
+    DIGEST_SAVE_DELAY,
+    DIGEST_STORAGE_VERSION,
+    DOMAIN,
+)
+from .outbox import SMSGateOutbox
+from .segments import segment_info
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _store_key(entry_id: str) -> str:
+    return f"{DOMAIN}.digest.{entry_id}"
+
+
+async def async_remove_digest(hass: HomeAssistant, entry_id: str) -> None:
+    """Usuwa plik buforów (przy usunięciu wpisu integracji)."""
+    await Store(hass, DIGEST_STORAGE_VERSION, _store_key(entry_id)).async_remove()
+
+
+class SMSGateDigest:
+    """Bufory zbiorczych SMS jednej bramki (window w s; 0 = wyłączone)."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        outbox: SMSGateOutbox,
+        prepare: Callable[[str], list[str]],
+        window: float,
+    ) -> None:
+        self._hass = hass
+        self._store: Store[dict[str, dict[str, Any]]] = Store(
+            hass, DIGEST_STORAGE_VERSION, _store_key(entry_id)
+        )
+        self._outbox = outbox
+        # Przygotowanie treści przed kolejką (polityka segmentów wpisu)
+        self._prepare = prepare
+        self.window = max(0.0, window)
+        self._buffers: dict[str, list[str]] = {}
+        # Początek okna bufora (time.time() pierwszej wiadomości) – do wznowienia po restarcie
+        self._started: dict[str, float] = {}
+        self._timers: dict[str, CALLBACK_TYPE] = {}
+        self.merged = 0
+        self.flushed = 0
+
+    @property
+    def buffered(self) -> int:
+        """Liczba linii czekających w buforach."""
+        return sum(len(lines) for lines in self._buffers.values())
+
+    async def async_load(self) -> None:
+        """Odtwarza bufory sprzed restartu; okno liczone dalej od pierwszej wiadomości."""
+        stored = await self._store.async_load()
+        now = time.time()
+        for number, buffer in (stored or {}).items():
+            if not isinstance(buffer, dict) or not (lines := buffer.get("lines")):
+                continue
+            started = float(buffer.get("started") or now)
+            self._buffers[number] = list(lines)
+            self._started[number] = started
+            self._timers[number] = async_call_later(
+                self._hass,
+                max(0.0, started + self.window - now),
+                partial(self._async_flush_timer, number),
+            )
+        if self._buffers:
+            _LOGGER.info("SMS Gate: wczytano %s linii digest sprzed restartu", self.buffered)
+
+    @callback
+    def _async_changed(self) -> None:
+        self._store.async_delay_save(
+            lambda: {
+                number: {"lines": list(lines), "started": self._started.get(number)}
+                for number, lines in self._buffers.items()
+            },
+            DIGEST_SAVE_DELAY,
+        )
+
+    def accepts(self, priority: int, digest: bool | None = None) -> bool:
+        """Czy wiadomość trafia do bufora (digest z data ma pierwszeństwo przed priorytetem)."""
+        if not self.window:
+            return False
+        if digest is not None:
+            return digest
+        return priority < DIGEST_PRIORITY_THRESHOLD
+
+    @callback
+    def async_add(self, phone_numbers: list[str], text: str, now: float | None = None) -> None:
+        """Dopisuje wiadomość do bufora każdego odbiorcy."""
+        if now is None:
+            now = time.time()
+        stamp = dt_util.as_local(dt_util.utc_from_timestamp(now))
+        line = f"{stamp:%H:%M} {text}"
+        for number in phone_numbers:
+            lines = self._buffers.get(number)
+            if lines and segment_info("\n".join([*lines, line])).segments > DIGEST_MAX_SEGMENTS:
+                # Budżet segmentów wyczerpany – bieżący bufor idzie od razu
+                self._async_flush(number)
+                lines = None
+            if not lines:
+                lines = self._buffers[number] = []
+                self._started[number] = now
+                self._timers[number] = async_call_later(
+                    self._hass, self.window, partial(self._async_flush_timer, number)
+                )
+            lines.append(line)
+            self.merged += 1
+        self._async_changed()
+
+    @callback
+    def _async_flush_timer(self, number: str, _now: datetime) -> None:
+        self._timers.pop(number, None)
+        self._async_flush(number)
+
+    @callback
+    def _async_flush(self, number: str) -> None:
+        if (cancel := self._timers.pop(number, None)) is not None:
+            cancel()
+        self._started.pop(number, None)
+        lines = self._buffers.pop(number, None)
+        if not lines:
+            return
+        self._async_changed()
+        _LOGGER.debug("SMS Gate: digest – %s wiadomości do %s w jednym SMS", len(lines), number)
+        for part in self._prepare("\n".join(lines)):
+            self._outbox.async_enqueue([number], part, priority=DIGEST_PRIORITY)
+            self.flushed += 1
+
+    @callback
+    def async_flush_all(self) -> None:
+        """Przekazuje wszystkie bufory do kolejki (unload wpisu)."""
+        for number in list(self._buffers):
+            self._async_flush(number)
+
+    def stats(self) -> dict[str, Any]:
+        return {"buffered": self.buffered, "merged": self.merged, "flushed": self.flushed}
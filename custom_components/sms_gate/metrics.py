@@ -0,0 +1,267 @@
+"""
+Metryki żądań HTTP do bramek SMS Gate.
+
+- SMSGateMetrics: per operacja (send, health, messages, message, webhook) histogram
+  czasu odpowiedzi o stałych przedziałach, liczniki statusów HTTP, timeoutów,
+  błędów połączenia, bajtów wysłanych/odebranych i fallbacków na starsze ścieżki
+  (404 → /message, /health/ready).
+- RequestTracker: owija kontekst żądania aiohttp; mierzy czas i status, a bajty
+  dostaje z TraceConfig współdzielonego transportu (trace_request_ctx). Na ścieżce
+  wysyłki jeden mały obiekt (__slots__) na żądanie; histogram to prealokowana lista.
+- render_prometheus: eksport tekstowy (format Prometheus) wszystkich bramek.
+- SMSGateMetricsView: GET /api/sms_gate/metrics (token HA) do lokalnego scrapowania.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterable
+import time
+from types import TracebackType
+from typing import Any
+
+import aiohttp
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.helpers.http import KEY_HASS
+
+from .breaker import STATE_CLOSED
+from .const import DOMAIN, METRICS_LATENCY_BUCKETS, METRICS_URL
+
+OP_SEND = "send"
+OP_HEALTH = "health"
+OP_MESSAGES = "messages"
+OP_MESSAGE = "message"
+OP_WEBHOOK = "webhook"
+OPERATIONS = (OP_SEND, OP_HEALTH, OP_MESSAGES, OP_MESSAGE, OP_WEBHOOK)
+
+
+class OperationStats:
+    """Liczniki jednej operacji."""
+
+    __slots__ = (
+        "buckets",
+        "count",
+        "total",
+        "statuses",
+        "timeouts",
+        "errors",
+        "bytes_in",
+        "bytes_out",
+        "fallbacks",
+    )
+
+    def __init__(self) -> None:
+        # Ostatni przedział: powyżej największej granicy (+Inf)
+        self.buckets = [0] * (len(METRICS_LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.statuses: dict[int, int] = {}
+        self.timeouts = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.fallbacks = 0
+
+    def observe(self, elapsed: float) -> None:
+        self.buckets[bisect_left(METRICS_LATENCY_BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+
+    @property
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float) -> float | None:
+        """Górna granica przedziału zawierającego kwantyl q (None bez próbek / +Inf)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                break
+        return METRICS_LATENCY_BUCKETS[index] if index < len(METRICS_LATENCY_BUCKETS) else None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean * 1000, 1) if self.count else None,
+            "p50_le_s": self.quantile(0.5),
+            "p95_le_s": self.quantile(0.95),
+            "statuses": dict(self.statuses),
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "fallbacks": self.fallbacks,
+        }
+
+
+class RequestTracker:
+    """Pomiar jednego żądania (kontekst async with wokół kontekstu aiohttp)."""
+
+    __slots__ = ("_stats", "_cm", "_started", "status")
+
+    def __init__(self, stats: OperationStats) -> None:
+        self._stats = stats
+        self._cm: Any = None
+        self._started = time.monotonic()
+        self.status: int | None = None
+
+    def bind(self, cm: Any) -> RequestTracker:
+        self._cm = cm
+        return self
+
+    def add_bytes_in(self, size: int) -> None:
+        self._stats.bytes_in += size
+
+    def add_bytes_out(self, size: int) -> None:
+        self._stats.bytes_out += size
+
+    def finish(self, exc: BaseException | None) -> None:
+        stats = self._stats
+        stats.observe(time.monotonic() - self._started)
+        if self.status is not None:
+            stats.statuses[self.status] = stats.statuses.get(self.status, 0) + 1
+        if isinstance(exc, TimeoutError):
+            stats.timeouts += 1
+        elif isinstance(exc, aiohttp.ClientError):
+            stats.errors += 1
+
+    async def __aenter__(self) -> Any:
+        try:
+            resp = await self._cm.__aenter__()
+        except BaseException as e:
+            self.finish(e)
+            raise
+        self.status = resp.status
+        return resp
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> bool | None:
+        try:
+            return await self._cm.__aexit__(exc_type, exc, tb)
+        finally:
+            self.finish(exc)
+
+
+class SMSGateMetrics:
+    """Metryki jednej bramki."""
+
+    def __init__(self) -> None:
+        self.operations: dict[str, OperationStats] = {op: OperationStats() for op in OPERATIONS}
+
+    def tracker(self, operation: str) -> RequestTracker:
+        return RequestTracker(self.operations[operation])
+
+    def fallback(self, operation: str) -> None:
+        """Odnotowuje przejście na alternatywną ścieżkę (404 na pierwszej)."""
+        self.operations[operation].fallbacks += 1
+
+    @property
+    def failures(self) -> int:
+        """Łączna liczba timeoutów i błędów połączenia."""
+        return sum(s.timeouts + s.errors for s in self.operations.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        return {op: stats.as_dict() for op, stats in self.operations.items()}
+
+
+def _labels(**labels: Any) -> str:
+    return ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items())
+
+
+def render_prometheus(gateways: Iterable[tuple[str, SMSGateMetrics, dict[str, float]]]) -> str:
+    """
+    Eksport tekstowy. gateways: (id bramki, metryki, dodatkowe wartości – np.
+    queue_depth, segments_sent_total – eksportowane jako sms_gate_<nazwa>).
+    """
+    histogram: list[str] = []
+    counters: dict[str, list[str]] = {
+        "requests_total": [],
+        "request_timeouts_total": [],
+        "request_errors_total": [],
+        "received_bytes_total": [],
+        "sent_bytes_total": [],
+        "path_fallbacks_total": [],
+    }
+    gauges: dict[str, list[str]] = {}
+    for gateway, metrics, extra in gateways:
+        for op, stats in metrics.operations.items():
+            labels = _labels(gateway=gateway, operation=op)
+            cumulative = 0
+            for bound, bucket in zip((*METRICS_LATENCY_BUCKETS, "+Inf"), stats.buckets):
+                cumulative += bucket
+                histogram.append(
+                    f'sms_gate_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            histogram.append(f"sms_gate_request_duration_seconds_sum{{{labels}}} {stats.total:.6f}")
+            histogram.append(f"sms_gate_request_duration_seconds_count{{{labels}}} {stats.count}")
+            for status, count in sorted(stats.statuses.items()):
+                counters["requests_total"].append(
+                    f'sms_gate_requests_total{{{labels},status="{status}"}} {count}'
+                )
+            for name, value in (
+                ("request_timeouts_total", stats.timeouts),
+                ("request_errors_total", stats.errors),
+                ("received_bytes_total", stats.bytes_in),
+                ("sent_bytes_total", stats.bytes_out),
+                ("path_fallbacks_total", stats.fallbacks),
+            ):
+                counters[name].append(f"sms_gate_{name}{{{labels}}} {value}")
+        for name, value in extra.items():
+            gauges.setdefault(name, []).append(
+                f"sms_gate_{name}{{{_labels(gateway=gateway)}}} {value}"
+            )
+
+    lines = [
+        "# HELP sms_gate_request_duration_seconds Czas żądania HTTP do bramki.",
+        "# TYPE sms_gate_request_duration_seconds histogram",
+        *histogram,
+    ]
+    for name, samples in counters.items():
+        lines.append(f"# TYPE sms_gate_{name} counter")
+        lines.extend(samples)
+    for name, samples in gauges.items():
+        lines.append(f"# TYPE sms_gate_{name} {'counter' if name.endswith('_total') else 'gauge'}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+class SMSGateMetricsView(HomeAssistantView):
+    """Eksport metryk wszystkich bramek (format tekstowy Prometheus)."""
+
+    url = METRICS_URL
+    name = f"api:{DOMAIN}:metrics"
+    requires_auth = True
+
+    async def get(self, request: web.Request) -> web.Response:
+        hass = request.app[KEY_HASS]
+        gateways = [
+            (
+                entry_id,
+                data["api"].metrics,
+                {
+                    "queue_depth": data["outbox"].depth,
+                    "segments_sent_total": data["api"].segment_stats["segments"],
+                    "send_retries_total": data["api"].retry_stats["retries"],
+                    "duplicates_suppressed_total": data["outbox"].suppressed,
+                    "digest_buffered": data["digest"].buffered,
+                    **{
+                        f"sim{sim}_sent_total": count
+                        for sim, count in (data["sims"].sent if data["sims"] else {}).items()
+                    },
+                    "breaker_open": int(data["api"].breaker.state != STATE_CLOSED),
+                },
+            )
+            for entry_id, data in hass.data.get(DOMAIN, {}).items()
+        ]
+        return web.Response(
+            text=render_prometheus(gateways), content_type="text/plain", charset="utf-8"
+        )
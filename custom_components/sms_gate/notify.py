@@ -1,10 +1,15 @@
 """
 Platforma notify do wysyłania SMS przez SMS Gate.
 
-- resolve_recipients_and_message: mapuje nazwy odbiorców na numery (z options),
-  renderuje szablon Jinja2 z options (placeholdery: message, entity_id, data).
+- resolve_recipients_and_message: mapuje nazwy, aliasy i grupy odbiorców na
+  znormalizowane, unikalne numery (RecipientIndex z options),
+  renderuje szablon Jinja2 z options (placeholdery: message, entity_id, data);
+  skompilowane szablony brane z cache wpisu (SMSGateTemplateCache), gdy podany.
 - SMSGateNotifyEntity: encja notify; async_send_message przyjmuje data.recipients,
-  data.template, data.data i wywołuje API send_sms.
+  data.template, data.data, data.priority, data.sim_number, data.digest i dodaje
+  wiadomość do kolejki wychodzącej lub bufora digest wspólną ścieżką serwisu
+  (async_enqueue_message: polityka segmentów, digest). Gdy polityka segmentów
+  odrzuci treść, zgłasza HomeAssistantError.
 """
 
 from __future__ import annotations
@@ -15,14 +20,30 @@ from typing import Any
 from homeassistant.components.notify import NotifyEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.template import Template
-
-from .api import SMSGateAPI
-from .const import CONF_RECIPIENTS, CONF_TEMPLATES, DOMAIN
+import voluptuous as vol
+
+from . import async_enqueue_message
+from .const import (
+    CONF_RECIPIENTS,
+    CONF_TEMPLATES,
+    DEFAULT_PRIORITY,
+    DOMAIN,
+    PRIORITY_MAX,
+    PRIORITY_MIN,
+    SIM_COUNT_MAX,
+)
+from .recipients import RecipientIndex
+from .template_cache import SMSGateTemplateCache
 
 _LOGGER = logging.getLogger(__name__)
 
+# Karta SIM z data.sim_number (bez podania – harmonogram kart wpisu)
+_SIM_NUMBER = vol.All(vol.Coerce(int), vol.Range(min=1, max=SIM_COUNT_MAX))
+
 
 async def resolve_recipients_and_message(
     hass: HomeAssistant,
@@ -31,30 +52,28 @@ async def resolve_recipients_and_message(
     recipients: list[str],
     template_name: str | None,
     template_data: dict[str, Any],
+    template_cache: SMSGateTemplateCache | None = None,
+    recipient_index: RecipientIndex | None = None,
 ) -> tuple[list[str], str]:
     """
-    Rozwiązuje odbiorców (nazwy -> numery z options) i renderuje treść (szablon + message).
+    Rozwiązuje odbiorców (nazwy/grupy -> numery z options) i renderuje treść (szablon + message).
     Zwraca (lista numerów telefonów, finalna treść wiadomości).
     """
     options = entry.options or {}
-    recipients_map: dict[str, str] = options.get(CONF_RECIPIENTS) or {}
     templates_map: dict[str, str] = options.get(CONF_TEMPLATES) or {}
 
-    phone_numbers: list[str] = []
-    for r in recipients:
-        r = (r or "").strip()
-        if not r:
-            continue
-        if r in recipients_map:
-            phone_numbers.append(recipients_map[r].strip())
-        else:
-            phone_numbers.append(r)
+    if recipient_index is None:
+        recipient_index = RecipientIndex(options.get(CONF_RECIPIENTS))
+    phone_numbers = recipient_index.resolve(recipients)
 
     if template_name and template_name in templates_map:
         template_str = templates_map[template_name]
         ctx = {"message": message, **template_data}
         try:
-            tpl = Template(template_str, hass)
+            if template_cache is not None:
+                tpl = template_cache.get(template_name, template_str)
+            else:
+                tpl = Template(template_str, hass)
             final_text = tpl.async_render(ctx)
         except Exception as e:
             _LOGGER.warning("Błąd renderowania szablonu %s: %s", template_name, e)
@@ -74,9 +93,7 @@ async def async_setup_entry(
     data = hass.data[DOMAIN].get(entry.entry_id)
     if not data:
         return
-    api = data["api"]
-    coordinator = data["coordinator"]
-    entity = SMSGateNotifyEntity(entry, api)
+    entity = SMSGateNotifyEntity(entry, data)
     async_add_entities([entity])
 
 
@@ -85,10 +102,11 @@ class SMSGateNotifyEntity(NotifyEntity):
 
     _attr_has_entity_name = True
 
-    def __init__(self, entry: ConfigEntry, api: SMSGateAPI) -> None:
+    def __init__(self, entry: ConfigEntry, data: dict[str, Any]) -> None:
         super().__init__()
         self._entry = entry
-        self._api = api
+        # Dane wpisu z hass.data (outbox, digest, cache szablonów, indeks odbiorców)
+        self._data = data
         self._attr_unique_id = entry.entry_id
         self._attr_name = entry.title or "SMS Gate"
         self._attr_device_info = {
@@ -98,22 +116,49 @@ class SMSGateNotifyEntity(NotifyEntity):
         }
 
     async def async_send_message(self, message: str, **kwargs: Any) -> None:
-        """Wysyła SMS. Odbiorcy i szablon z data."""
+        """Dodaje SMS do kolejki wychodzącej (lub digest). Odbiorcy i szablon z data."""
         data = kwargs.get("data") or {}
         recipients = data.get("recipients", [])
         if isinstance(recipients, str):
             recipients = [recipients]
         template_name = data.get("template")
         template_data = data.get("data") or {}
+        try:
+            priority = int(data.get("priority", DEFAULT_PRIORITY))
+        except (TypeError, ValueError):
+            _LOGGER.warning("Nieprawidłowy priorytet %s – użyto domyślnego", data.get("priority"))
+            priority = DEFAULT_PRIORITY
+        priority = max(PRIORITY_MIN, min(PRIORITY_MAX, priority))
+        try:
+            sim_number = None if data.get("sim_number") is None else _SIM_NUMBER(data["sim_number"])
+        except vol.Invalid:
+            _LOGGER.warning("Nieprawidłowy numer karty SIM %s – pominięto", data.get("sim_number"))
+            sim_number = None
+        try:
+            digest = None if data.get("digest") is None else cv.boolean(data["digest"])
+        except vol.Invalid:
+            _LOGGER.warning("Nieprawidłowa wartość digest %s – pominięto", data.get("digest"))
+            digest = None
         phone_numbers, final_text = await resolve_recipients_and_message(
-            self.hass, self._entry, message, recipients, template_name, template_data
+            self.hass,
+            self._entry,
+            message,
+            recipients,
+            template_name,
+            template_data,
+            self._data["template_cache"],
+            self._data["recipient_index"],
         )
         if not phone_numbers:
             _LOGGER.warning("Brak odbiorców do wysłania SMS")
             return
-        success, result = await self._api.async_send_sms(
-            phone_numbers, final_text, priority=100
+        message_ids = async_enqueue_message(
+            self._data,
+            phone_numbers,
+            final_text,
+            priority=priority,
+            sim_number=sim_number,
+            digest=digest,
         )
-        if not success:
-            _LOGGER.error("Wysłanie SMS nie powiodło się: %s", result)
-            raise ValueError(result or "Send failed")
+        if message_ids == []:
+            raise HomeAssistantError("Wiadomość odrzucona przez politykę segmentów")
@@ -0,0 +1,371 @@
+"""
+Trwała kolejka wychodzących SMS (outbox) z dispatcherem w tle.
+
+- Wiadomości zapisywane w Store (.storage/sms_gate.outbox.<entry_id>) – przetrwają
+  restart Home Assistant.
+- async_enqueue: zwraca od razu po dodaniu wiadomości do kolejki (serwis i notify
+  nie czekają na telefon).
+- Dispatcher: zadanie w tle per bramka, co najwyżej OUTBOX_CONCURRENCY wysyłek
+  jednocześnie; przy błędzie wiadomość wraca do kolejki (ponowna próba po
+  OUTBOX_RETRY_DELAY s), po OUTBOX_MAX_ATTEMPTS próbach jest porzucana.
+- Kolejność: najwyższy priorytet, potem najstarsza. Tempo ograniczane kubełkami
+  tokenów (limit bramki i limit per odbiorca); wiadomość czekająca dłużej niż jej
+  ttl jest porzucana przed wysyłką.
+- id wiadomości w kolejce jest wysyłane jako id w SMS Gate (klucz idempotencji) –
+  ponowienie wiadomości, która mimo błędu dotarła do telefonu, nie tworzy duplikatu.
+- on_sent: callback po udanej wysyłce (message_id) – coordinator przyspiesza odświeżanie.
+- Failover (bramki w puli): po nieudanej wysyłce callback failover może przekazać
+  wiadomość do innej bramki (async_adopt) zamiast ponawiać ją lokalnie.
+- Otwarty wyłącznik bramki (api.breaker): wiadomości zostają w kolejce do czasu
+  próby, bez zużywania prób wysyłki.
+- Tłumienie powtórzeń (dedup): powtórzenie tej samej treści do tych samych odbiorców
+  w oknie nie trafia do kolejki – async_enqueue zwraca id oryginału, a oryginał
+  jeszcze czekający w kolejce dostaje dopisek "(xN)" (opcja suffix) – o ile nie
+  przekroczy limitu segmentów wpisu (max_segments).
+- Karty SIM (sims): przy wyborze wiadomości przydzielana jest karta (prefiks numeru,
+  round_robin / lru) z wolnym limitem karty; wiadomość czekająca na limit swojej
+  karty nie blokuje wiadomości, które mogą wyjść z innej karty.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+import time
+from typing import Any
+import uuid
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .api import SMSGateAPI
+from .breaker import CIRCUIT_OPEN
+from .const import (
+    DEFAULT_PRIORITY,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RECIPIENT_RATE_LIMIT,
+    DOMAIN,
+    OUTBOX_CONCURRENCY,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_DELAY,
+    OUTBOX_SAVE_DELAY,
+    OUTBOX_STORAGE_VERSION,
+)
+from .dedup import DuplicateEntry, MessageDeduplicator
+from .ratelimit import RecipientBuckets, TokenBucket
+from .segments import segment_info
+from .sim import SimScheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _store_key(entry_id: str) -> str:
+    return f"{DOMAIN}.outbox.{entry_id}"
+
+
+async def async_remove_outbox(hass: HomeAssistant, entry_id: str) -> None:
+    """Usuwa plik kolejki (przy usunięciu wpisu integracji)."""
+    await Store(hass, OUTBOX_STORAGE_VERSION, _store_key(entry_id)).async_remove()
+
+
+class SMSGateOutbox:
+    """
+    Kolejka wiadomości jednej bramki. Element kolejki to dict:
+    id, phone_numbers, text, priority, ttl, sim_number, created, attempts, not_before.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        api: SMSGateAPI,
+        *,
+        rate_limit: int = DEFAULT_RATE_LIMIT,
+        recipient_rate_limit: int = DEFAULT_RECIPIENT_RATE_LIMIT,
+        failover: Callable[[dict[str, Any]], bool] | None = None,
+        on_sent: Callable[[str | None], None] | None = None,
+        dedup: MessageDeduplicator | None = None,
+        dedup_suffix: bool = True,
+        max_segments: int = 0,
+        sims: SimScheduler | None = None,
+    ) -> None:
+        self._hass = hass
+        self._entry_id = entry_id
+        self._api = api
+        self._store: Store[list[dict[str, Any]]] = Store(
+            hass, OUTBOX_STORAGE_VERSION, _store_key(entry_id)
+        )
+        self._items: list[dict[str, Any]] = []
+        self._in_flight: set[str] = set()
+        self._semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+        self._wakeup = asyncio.Event()
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._task: asyncio.Task[None] | None = None
+        self._sends: set[asyncio.Task[None]] = set()
+        self._bucket = TokenBucket(rate_limit)
+        self._recipient_buckets = RecipientBuckets(recipient_rate_limit)
+        self._failover = failover
+        self._on_sent = on_sent
+        self._dedup = dedup
+        self._dedup_suffix = dedup_suffix
+        # Limit segmentów wpisu (0 = bez limitu) – dopisek "(xN)" go nie przekracza
+        self._max_segments = max(0, max_segments)
+        self._sims = sims
+        # Karty przydzielone wysyłanym wiadomościom (id -> karta), bez zapisu w kolejce
+        self._assigned: dict[str, int | None] = {}
+
+    @property
+    def depth(self) -> int:
+        """Liczba wiadomości w kolejce (łącznie z wysyłanymi)."""
+        return len(self._items)
+
+    @property
+    def suppressed(self) -> int:
+        """Liczba stłumionych powtórzeń (od uruchomienia)."""
+        return self._dedup.suppressed if self._dedup is not None else 0
+
+    def oldest_age(self) -> float | None:
+        """Wiek najstarszej wiadomości w kolejce (s) lub None przy pustej kolejce."""
+        if not self._items:
+            return None
+        return max(0.0, time.time() - min(i["created"] for i in self._items))
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> Callable[[], None]:
+        """Rejestruje callback wywoływany po każdej zmianie kolejki (sensory)."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_changed(self) -> None:
+        self._store.async_delay_save(lambda: list(self._items), OUTBOX_SAVE_DELAY)
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    async def async_load(self) -> None:
+        """Wczytuje kolejkę zapisaną przed restartem."""
+        stored = await self._store.async_load()
+        self._items = [i for i in stored or [] if isinstance(i, dict) and i.get("id")]
+        if self._items:
+            _LOGGER.info(
+                "SMS Gate: wczytano %s wiadomości z kolejki (entry_id=%s)",
+                len(self._items),
+                self._entry_id,
+            )
+
+    @callback
+    def async_enqueue(
+        self,
+        phone_numbers: list[str],
+        text: str,
+        *,
+        priority: int = DEFAULT_PRIORITY,
+        ttl: int = 3600,
+        sim_number: int | None = None,
+    ) -> str:
+        """
+        Dodaje wiadomość do kolejki i budzi dispatcher. Zwraca id elementu kolejki
+        (dla stłumionego powtórzenia – id oryginału).
+        """
+        now = time.time()
+        key = None
+        if self._dedup is not None and self._dedup.window:
+            key = self._dedup.key(phone_numbers, text)
+            if (duplicate := self._dedup.check(key, now)) is not None:
+                self._async_collapse(duplicate)
+                return duplicate.item_id
+        item = {
+            "id": uuid.uuid4().hex,
+            "phone_numbers": list(phone_numbers),
+            "text": text,
+            "priority": priority,
+            "ttl": ttl,
+            "sim_number": sim_number,
+            "created": now,
+            "attempts": 0,
+            "not_before": 0.0,
+        }
+        if key is not None:
+            self._dedup.remember(key, item["id"], text, now)
+        self._items.append(item)
+        _LOGGER.debug("SMS Gate: wiadomość %s w kolejce (głębokość %s)", item["id"], self.depth)
+        self._async_changed()
+        self._wakeup.set()
+        return item["id"]
+
+    @callback
+    def _async_collapse(self, duplicate: DuplicateEntry) -> None:
+        """Powtórzenie w oknie: dopisek "(xN)" do oryginału, o ile nie jest już wysyłany."""
+        _LOGGER.debug(
+            "SMS Gate: powtórzenie wiadomości %s stłumione (x%s)", duplicate.item_id, duplicate.count
+        )
+        if self._dedup_suffix and duplicate.item_id not in self._in_flight:
+            text = f"{duplicate.text} (x{duplicate.count})"
+            if self._max_segments and segment_info(text).segments > self._max_segments:
+                # Treść już dopasowana do limitu (polityka segmentów) – bez dopisku
+                _LOGGER.debug("SMS Gate: dopisek (xN) pominięty – przekroczyłby limit segmentów")
+            else:
+                for item in self._items:
+                    if item["id"] == duplicate.item_id:
+                        item["text"] = text
+                        break
+        self._async_changed()
+
+    @callback
+    def async_adopt(self, item: dict[str, Any]) -> None:
+        """Przejmuje wiadomość z kolejki innej bramki (failover); id i wiek bez zmian."""
+        item["attempts"] = 0
+        item["not_before"] = 0.0
+        self._items.append(item)
+        self._async_changed()
+        self._wakeup.set()
+
+    @callback
+    def async_start(self) -> None:
+        """Uruchamia dispatcher w tle."""
+        if self._task is None:
+            self._task = self._hass.async_create_background_task(
+                self._async_run(), f"{DOMAIN} outbox {self._entry_id}"
+            )
+
+    async def async_stop(self) -> None:
+        """Zatrzymuje dispatcher i zapisuje kolejkę (wysyłki w toku wracają do kolejki)."""
+        tasks = [t for t in (self._task, *self._sends) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        await self._store.async_save(list(self._items))
+
+    def _take_next(self, now: float) -> tuple[dict[str, Any] | None, float | None]:
+        """
+        Wybiera wiadomość do wysyłki i pobiera dla niej tokeny.
+        Zwraca (element, None) albo (None, czas w s do ponownego sprawdzenia / None).
+        """
+        expired = [
+            i
+            for i in self._items
+            if i["id"] not in self._in_flight and now - i["created"] > i["ttl"]
+        ]
+        for item in expired:
+            self._items.remove(item)
+            _LOGGER.warning(
+                "SMS Gate: wiadomość %s porzucona – czekała dłużej niż ttl=%ss",
+                item["id"],
+                item["ttl"],
+            )
+        if expired:
+            self._async_changed()
+
+        # Wyłącznik otwarty: wiadomości czekają w kolejce (bez zużywania prób);
+        # w puli wysyłka odrzucona od razu trafia przez failover do innej bramki
+        blocked = self._api.breaker.retry_after()
+        if blocked > 0 and self._failover is None:
+            return None, blocked
+
+        wait = float("inf")
+        for item in sorted(self._items, key=lambda i: (-i["priority"], i["created"])):
+            if item["id"] in self._in_flight:
+                continue
+            if item["not_before"] > now:
+                wait = min(wait, item["not_before"] - now)
+                continue
+            count = len(item["phone_numbers"])
+            gateway_wait = self._bucket.wait_time(count)
+            if gateway_wait > 0:
+                # Limit bramki – nic nie może wyprzedzić wiadomości o wyższym priorytecie
+                return None, min(wait, gateway_wait)
+            recipient_wait = self._recipient_buckets.wait_time(item["phone_numbers"])
+            if recipient_wait > 0:
+                wait = min(wait, recipient_wait)
+                continue
+            sim = item.get("sim_number")
+            if self._sims is not None:
+                sim, sim_wait = self._sims.select(item["phone_numbers"], count, sim)
+                if sim_wait > 0:
+                    # Limit karty – wiadomości dla innych kart mogą wyjść wcześniej
+                    wait = min(wait, sim_wait)
+                    continue
+                self._sims.consume(sim, count)
+            self._bucket.consume(count)
+            self._recipient_buckets.consume(item["phone_numbers"])
+            self._assigned[item["id"]] = sim
+            return item, None
+        return None, wait if wait != float("inf") else None
+
+    async def _async_run(self) -> None:
+        while True:
+            await self._semaphore.acquire()
+            item, wait = self._take_next(time.time())
+            if item is None:
+                self._semaphore.release()
+                self._wakeup.clear()
+                try:
+                    async with asyncio.timeout(wait):
+                        await self._wakeup.wait()
+                except TimeoutError:
+                    pass
+                continue
+            self._in_flight.add(item["id"])
+            task = self._hass.async_create_background_task(
+                self._async_dispatch(item), f"{DOMAIN} send {item['id']}"
+            )
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _async_dispatch(self, item: dict[str, Any]) -> None:
+        """Wysyła jedną wiadomość z kolejki i aktualizuje jej stan."""
+        try:
+            success, result = await self._api.async_send_sms(
+                item["phone_numbers"],
+                item["text"],
+                sim_number=self._assigned.get(item["id"], item.get("sim_number")),
+                priority=item["priority"],
+                # Czas spędzony w kolejce wlicza się do ttl
+                ttl=max(1, int(item["ttl"] - (time.time() - item["created"]))),
+                # id z kolejki = klucz idempotencji: ponowienie nie zdubluje SMS
+                message_id=item["id"],
+            )
+        except Exception as e:
+            # Błąd jednej wiadomości nie może zatrzymać kolejki
+            success, result = False, str(e)
+        finally:
+            self._in_flight.discard(item["id"])
+            self._assigned.pop(item["id"], None)
+            self._semaphore.release()
+
+        if success:
+            self._items.remove(item)
+            _LOGGER.debug("SMS Gate: wysłano %s (message_id=%s)", item["id"], result)
+            if self._on_sent is not None:
+                self._on_sent(result)
+        elif self._failover is not None and self._failover(item):
+            self._items.remove(item)
+            _LOGGER.debug("SMS Gate: %s przekazana do innej bramki: %s", item["id"], result)
+        elif result == CIRCUIT_OPEN:
+            # Telefon offline – wiadomość czeka na próbę wyłącznika, bez liczenia próby
+            item["not_before"] = time.time() + max(1.0, self._api.breaker.retry_after())
+            _LOGGER.debug("SMS Gate: %s czeka – wyłącznik otwarty", item["id"])
+        else:
+            item["attempts"] += 1
+            if item["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                self._items.remove(item)
+                _LOGGER.error(
+                    "Wysłanie SMS nie powiodło się po %s próbach: %s", item["attempts"], result
+                )
+            else:
+                item["not_before"] = time.time() + OUTBOX_RETRY_DELAY
+                _LOGGER.warning(
+                    "Wysłanie SMS nie powiodło się (próba %s/%s): %s",
+                    item["attempts"],
+                    OUTBOX_MAX_ATTEMPTS,
+                    result,
+                )
+        self._async_changed()
+        self._wakeup.set()
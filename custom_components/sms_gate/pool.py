@@ -0,0 +1,82 @@
+"""
+Pula bramek SMS Gate: wybór bramki i failover.
+
+Wpisy z włączoną opcją "pool" tworzą pulę. Wiadomość bez wskazanej bramki trafia
+do dostępnej bramki (coordinator.data["available"]) z najkrótszą kolejką wychodzącą,
+a przy remisie – z najniższym średnim czasem wysyłki. Gdy wysyłka z bramki w puli
+się nie powiedzie, wiadomość jest przekazywana do innej dostępnej bramki, której
+jeszcze nie próbowano.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _available(data: dict[str, Any]) -> bool:
+    return bool((data["coordinator"].data or {}).get("available"))
+
+
+def _score(data: dict[str, Any]) -> tuple[int, float]:
+    latency = data["api"].send_latency
+    return data["outbox"].depth, latency if latency is not None else float("inf")
+
+
+@callback
+def async_select_gateway(
+    hass: HomeAssistant,
+    exclude: Iterable[str] = (),
+    *,
+    require_available: bool = False,
+) -> str | None:
+    """
+    Zwraca entry_id najlepszej bramki z puli lub None, gdy pula jest pusta.
+    Bez require_available przy braku dostępnych bramek wybiera spośród wszystkich.
+    """
+    excluded = set(exclude)
+    members = [
+        (entry_id, data)
+        for entry_id, data in hass.data.get(DOMAIN, {}).items()
+        if data.get("pool") and entry_id not in excluded
+    ]
+    healthy = [m for m in members if _available(m[1])]
+    if healthy:
+        members = healthy
+    elif require_available:
+        return None
+    if not members:
+        return None
+    return min(members, key=lambda m: _score(m[1]))[0]
+
+
+@callback
+def async_failover(hass: HomeAssistant, entry_id: str, item: dict[str, Any]) -> bool:
+    """
+    Przekazuje nieudaną wiadomość z bramki entry_id do innej dostępnej bramki z puli.
+    Zwraca True, gdy wiadomość została przejęta (nadawca usuwa ją ze swojej kolejki).
+    Id się nie zmienia – śledzenie i wait_for_delivery przechodzą do coordinatora celu.
+    """
+    # Bramka w trakcie unloadu (dane już usunięte) – wiadomość zostaje w jej kolejce
+    # (zapis przy zatrzymaniu); przejęcie dałoby podwójną wysyłkę
+    source = hass.data[DOMAIN].get(entry_id)
+    if source is None:
+        return False
+    tried = {*item.get("tried", ()), entry_id}
+    target = async_select_gateway(hass, tried, require_available=True)
+    if target is None:
+        return False
+    _LOGGER.info("SMS Gate: failover wiadomości %s z %s do %s", item["id"], entry_id, target)
+    item["tried"] = sorted(tried)
+    hass.data[DOMAIN][target]["outbox"].async_adopt(item)
+    source["coordinator"].async_move_waiters(
+        item["id"], hass.data[DOMAIN][target]["coordinator"]
+    )
+    return True
@@ -0,0 +1,107 @@
+"""
+Odbiór zdarzeń z bramki przez webhook Home Assistant (push zamiast pollingu).
+
+- async_setup_push: rejestruje endpoint webhook HA (webhook_id w entry.data) i
+  subskrybuje w aplikacji zdarzenia sms:sent / sms:delivered / sms:failed
+  (POST /webhooks). Przy powodzeniu coordinator przechodzi w tryb push.
+- async_unload_push: wyrejestrowuje endpoint i usuwa subskrypcje z telefonu.
+
+Gdy rejestracja się nie uda (brak URL HA, telefon niedostępny), integracja działa
+dalej w trybie pollingu.
+"""
+
+from __future__ import annotations
+
+from functools import partial
+import logging
+
+from aiohttp import web
+from homeassistant.components import webhook
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_WEBHOOK_ID
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.network import NoURLAvailableError
+
+from .api import SMSGateAPI
+from .const import DOMAIN, WEBHOOK_EVENT_STATES
+from .coordinator import SMSGateDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _subscription_id(webhook_id: str, event: str) -> str:
+    """Id subskrypcji w aplikacji – osobne dla każdego zdarzenia."""
+    return f"ha-{webhook_id[:12]}-{event.split(':')[-1]}"
+
+
+async def _async_handle_webhook(
+    coordinator: SMSGateDataUpdateCoordinator,
+    hass: HomeAssistant,
+    webhook_id: str,
+    request: web.Request,
+) -> web.Response:
+    """Obsługa zdarzenia z aplikacji SMS Gate."""
+    try:
+        body = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+    if not isinstance(body, dict):
+        return web.Response(status=400)
+    event = body.get("event") or ""
+    payload = body.get("payload") if isinstance(body.get("payload"), dict) else {}
+    if not coordinator.async_handle_push_event(event, payload):
+        _LOGGER.debug("Webhook: pominięto zdarzenie %s", event)
+    return web.Response(status=200)
+
+
+async def async_setup_push(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    api: SMSGateAPI,
+    coordinator: SMSGateDataUpdateCoordinator,
+) -> str | None:
+    """Rejestruje webhook i subskrypcje. Zwraca webhook_id lub None (zostaje polling)."""
+    webhook_id = entry.data.get(CONF_WEBHOOK_ID)
+    if not webhook_id:
+        webhook_id = webhook.async_generate_id()
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, CONF_WEBHOOK_ID: webhook_id}
+        )
+    try:
+        url = webhook.async_generate_url(
+            hass, webhook_id, allow_ip=True, prefer_external=False
+        )
+    except NoURLAvailableError:
+        _LOGGER.warning("SMS Gate: brak adresu URL Home Assistant – webhooki wyłączone")
+        return None
+
+    webhook.async_register(
+        hass,
+        DOMAIN,
+        entry.title or "SMS Gate",
+        webhook_id,
+        partial(_async_handle_webhook, coordinator),
+        local_only=True,
+        allowed_methods=("POST",),
+    )
+    registered = [
+        await api.async_register_webhook(_subscription_id(webhook_id, event), url, event)
+        for event in WEBHOOK_EVENT_STATES
+    ]
+    if not all(registered):
+        _LOGGER.warning(
+            "SMS Gate: nie udało się zasubskrybować zdarzeń w aplikacji – zostaje polling"
+        )
+        await async_unload_push(hass, api, webhook_id)
+        return None
+
+    coordinator.async_set_push_active(True)
+    _LOGGER.info("SMS Gate: webhooki aktywne (%s)", url)
+    return webhook_id
+
+
+async def async_unload_push(hass: HomeAssistant, api: SMSGateAPI, webhook_id: str) -> None:
+    """Wyrejestrowuje endpoint webhook i usuwa subskrypcje w aplikacji."""
+    webhook.async_unregister(hass, webhook_id)
+    for event in WEBHOOK_EVENT_STATES:
+        await api.async_delete_webhook(_subscription_id(webhook_id, event))
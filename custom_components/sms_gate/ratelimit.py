@@ -0,0 +1,83 @@
+"""
+Ograniczanie tempa wysyłki SMS (token bucket).
+
+- TokenBucket: pojemność = limit na minutę, uzupełnianie ciągłe (limit / 60 na sekundę).
+  Limit 0 oznacza brak ograniczenia.
+- RecipientBuckets: osobny kubełek dla każdego numeru (limit per odbiorca); pełne
+  i nieużywane kubełki są usuwane, żeby słownik nie rósł bez końca.
+"""
+
+from __future__ import annotations
+
+import time
+
+
+class TokenBucket:
+    """Kubełek tokenów: jeden token = jeden SMS do jednego odbiorcy."""
+
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(max(0, per_minute))
+        self._rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def _needed(self, count: int) -> float:
+        # Wiadomość większa niż pojemność przechodzi przy pełnym kubełku (bez zagłodzenia)
+        return min(float(count), self.capacity)
+
+    def wait_time(self, count: int = 1) -> float:
+        """Ile sekund do momentu, gdy będzie count tokenów (0 = od razu)."""
+        if self.unlimited:
+            return 0.0
+        self._refill(time.monotonic())
+        missing = self._needed(count) - self._tokens
+        return missing / self._rate if missing > 0 else 0.0
+
+    def consume(self, count: int = 1) -> None:
+        """Pobiera tokeny (po sprawdzeniu wait_time)."""
+        if self.unlimited:
+            return
+        self._refill(time.monotonic())
+        self._tokens -= self._needed(count)
+
+    @property
+    def full(self) -> bool:
+        if self.unlimited:
+            return True
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity
+
+
+class RecipientBuckets:
+    """Kubełki per numer telefonu."""
+
+    def __init__(self, per_minute: int) -> None:
+        self._per_minute = per_minute
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def wait_time(self, phone_numbers: list[str]) -> float:
+        if self._per_minute <= 0:
+            return 0.0
+        return max(
+            (self._buckets[n].wait_time() for n in phone_numbers if n in self._buckets),
+            default=0.0,
+        )
+
+    def consume(self, phone_numbers: list[str]) -> None:
+        if self._per_minute <= 0:
+            return
+        for number in phone_numbers:
+            bucket = self._buckets.get(number)
+            if bucket is None:
+                bucket = self._buckets[number] = TokenBucket(self._per_minute)
+            bucket.consume()
+        if len(self._buckets) > 256:
+            self._buckets = {n: b for n, b in self._buckets.items() if not b.full}
@@ -0,0 +1,79 @@
+"""
+Indeks odbiorców SMS Gate budowany raz przy zmianie opcji.
+
+Wpisy w opcjach "nazwa: wartość", gdzie wartość to:
+- numer telefonu (np. "+48 123-456-789", "0048123456789"),
+- alias innej nazwy (np. "mama: mom"),
+- grupa – lista numerów i/lub nazw po przecinku (np. "family: mom, dad, +48...").
+
+Numery są normalizowane (bez spacji, myślników, nawiasów; "00" → "+"), a wynik
+rozwiązania jest deduplikowany z zachowaniem kolejności – ten sam numer w kilku
+grupach dostaje jeden SMS.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+
+_LOGGER = logging.getLogger(__name__)
+
+_SEPARATORS = re.compile(r"[\s\-().]")
+_GROUP_SPLIT = re.compile(r"[,;]")
+
+
+def normalize_number(value: str) -> str:
+    """Normalizuje numer do postaci E.164 (o ile podano prefiks kraju)."""
+    number = _SEPARATORS.sub("", value or "")
+    if number.startswith("00"):
+        number = "+" + number[2:]
+    return number
+
+
+class RecipientIndex:
+    """Mapowanie nazw, aliasów i grup na zdeduplikowane krotki numerów."""
+
+    def __init__(self, recipients_map: dict[str, str] | None) -> None:
+        self._raw = {
+            k.strip(): v for k, v in (recipients_map or {}).items() if isinstance(k, str)
+        }
+        self._index: dict[str, tuple[str, ...]] = {}
+        for name in self._raw:
+            self._index[name] = self._expand(name, set())
+
+    def _expand(self, name: str, visiting: set[str]) -> tuple[str, ...]:
+        if name in self._index:
+            return self._index[name]
+        if name in visiting:
+            _LOGGER.warning("Odbiorcy: cykliczna definicja grupy %s", name)
+            return ()
+        visiting.add(name)
+        numbers: list[str] = []
+        for part in _GROUP_SPLIT.split(str(self._raw[name] or "")):
+            part = part.strip()
+            if not part:
+                continue
+            if part in self._raw and part != name:
+                numbers.extend(self._expand(part, visiting))
+            else:
+                numbers.append(normalize_number(part))
+        visiting.discard(name)
+        return tuple(dict.fromkeys(n for n in numbers if n))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def resolve(self, names: list[str]) -> list[str]:
+        """Rozwiązuje nazwy/grupy/numery na listę unikalnych numerów (kolejność zachowana)."""
+        numbers: dict[str, None] = {}
+        for name in names:
+            name = (name or "").strip()
+            if not name:
+                continue
+            expanded = self._index.get(name)
+            if expanded is None:
+                expanded = (normalize_number(name),)
+            for number in expanded:
+                if number:
+                    numbers[number] = None
+        return list(numbers)
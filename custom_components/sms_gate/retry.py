@@ -0,0 +1,71 @@
+"""
+Ponawianie wysyłki przy błędach przejściowych (zerwane połączenie, timeout, 5xx).
+
+- RetryPolicy: liczba ponowień i wykładniczy backoff z losowym rozrzutem ("full
+  jitter": losowo z przedziału 0..min(max_delay, base_delay * 2^n)), żeby kilka
+  wysyłek nie uderzało w telefon jednocześnie po jego powrocie.
+- RetryBudget: budżet ponowień per bramka – każda udana wysyłka dodaje ułamek
+  tokenu, każde ponowienie zużywa cały token. Gdy telefon leży, ponowienia szybko
+  wyczerpują budżet i kolejne błędy wracają od razu (bez mnożenia żądań).
+"""
+
+from __future__ import annotations
+
+import random
+
+from .const import (
+    DEFAULT_RETRY_BACKOFF,
+    DEFAULT_SEND_RETRIES,
+    RETRY_BUDGET_MAX,
+    RETRY_BUDGET_RATIO,
+    RETRY_MAX_DELAY,
+)
+
+
+class RetryBudget:
+    """Budżet ponowień: pojemność RETRY_BUDGET_MAX, +ratio za każdy sukces."""
+
+    def __init__(
+        self, ratio: float = RETRY_BUDGET_RATIO, capacity: float = RETRY_BUDGET_MAX
+    ) -> None:
+        self._ratio = ratio
+        self._capacity = capacity
+        self._tokens = capacity
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+    def on_success(self) -> None:
+        self._tokens = min(self._capacity, self._tokens + self._ratio)
+
+    def try_spend(self) -> bool:
+        """Zużywa token na ponowienie; False, gdy budżet wyczerpany."""
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class RetryPolicy:
+    """Polityka ponowień jednej bramki (retries = 0 wyłącza ponawianie)."""
+
+    def __init__(
+        self,
+        retries: int = DEFAULT_SEND_RETRIES,
+        base_delay: float = DEFAULT_RETRY_BACKOFF,
+        max_delay: float = RETRY_MAX_DELAY,
+        budget: RetryBudget | None = None,
+    ) -> None:
+        self.retries = max(0, retries)
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+
+    def delay(self, attempt: int) -> float:
+        """Opóźnienie (s) przed ponowieniem nr attempt (od 1)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def should_retry(self, attempt: int) -> bool:
+        """Czy wykonać ponowienie nr attempt (limit prób i budżet bramki)."""
+        return attempt <= self.retries and self.budget.try_spend()
@@ -0,0 +1,127 @@
+"""
+Tablica routingu serwisów: entity_id / device_id → entry_id bramki.
+
+Wybór bramki w serwisach (entity_id, device_id) to jedno wyszukanie w słowniku
+zamiast przeglądania rejestrów encji i urządzeń przy każdym wywołaniu.
+
+- async_register_entry: przy setupie wpisu indeksuje jego encje i urządzenia
+  z rejestrów; pierwsza rejestracja tworzy tablicę w hass.data i subskrybuje
+  zdarzenia aktualizacji rejestrów (nowe, zmienione i usunięte encje / urządzenia).
+- async_unregister_entry: przy unloadzie usuwa wpis z tablicy; po ostatnim wpisie
+  wyrejestrowuje subskrypcje i usuwa tablicę.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from .const import DATA_ROUTER
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SMSGateRouter:
+    """Indeks encji i urządzeń załadowanych wpisów SMS Gate."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        self._entries: set[str] = set()
+        self._entities: dict[str, str] = {}
+        self._devices: dict[str, str] = {}
+        self._unsubs: list[CALLBACK_TYPE] = [
+            hass.bus.async_listen(
+                er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_registry_updated
+            ),
+            hass.bus.async_listen(
+                dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated
+            ),
+        ]
+
+    @property
+    def entries(self) -> set[str]:
+        return self._entries
+
+    def entry_for_entity(self, entity_id: str) -> str | None:
+        return self._entities.get(entity_id)
+
+    def entry_for_device(self, device_id: str) -> str | None:
+        return self._devices.get(device_id)
+
+    @callback
+    def async_add_entry(self, entry_id: str) -> None:
+        """Indeksuje encje i urządzenia wpisu (stan rejestrów w chwili setupu)."""
+        self._entries.add(entry_id)
+        for ent in er.async_entries_for_config_entry(er.async_get(self._hass), entry_id):
+            self._entities[ent.entity_id] = entry_id
+        for dev in dr.async_entries_for_config_entry(dr.async_get(self._hass), entry_id):
+            self._devices[dev.id] = entry_id
+
+    @callback
+    def async_remove_entry(self, entry_id: str) -> None:
+        self._entries.discard(entry_id)
+        self._entities = {k: v for k, v in self._entities.items() if v != entry_id}
+        self._devices = {k: v for k, v in self._devices.items() if v != entry_id}
+
+    @callback
+    def async_close(self) -> None:
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs.clear()
+
+    @callback
+    def _async_entity_registry_updated(
+        self, event: Event[er.EventEntityRegistryUpdatedData]
+    ) -> None:
+        data = event.data
+        if old_entity_id := data.get("old_entity_id"):
+            self._entities.pop(old_entity_id, None)
+        entity_id = data["entity_id"]
+        if data["action"] == "remove":
+            self._entities.pop(entity_id, None)
+            return
+        ent = er.async_get(self._hass).async_get(entity_id)
+        if ent is not None and ent.config_entry_id in self._entries:
+            self._entities[entity_id] = ent.config_entry_id
+        else:
+            self._entities.pop(entity_id, None)
+
+    @callback
+    def _async_device_registry_updated(
+        self, event: Event[dr.EventDeviceRegistryUpdatedData]
+    ) -> None:
+        device_id = event.data["device_id"]
+        self._devices.pop(device_id, None)
+        if event.data["action"] == "remove":
+            return
+        dev = dr.async_get(self._hass).async_get(device_id)
+        if dev is None:
+            return
+        for entry_id in dev.config_entries:
+            if entry_id in self._entries:
+                self._devices[device_id] = entry_id
+                break
+
+
+@callback
+def async_register_entry(hass: HomeAssistant, entry_id: str) -> SMSGateRouter:
+    """Dodaje wpis do tablicy routingu (tworzy ją przy pierwszym wpisie)."""
+    router: SMSGateRouter | None = hass.data.get(DATA_ROUTER)
+    if router is None:
+        router = hass.data[DATA_ROUTER] = SMSGateRouter(hass)
+    router.async_add_entry(entry_id)
+    return router
+
+
+@callback
+def async_unregister_entry(hass: HomeAssistant, entry_id: str) -> None:
+    """Usuwa wpis z tablicy; po ostatnim wpisie usuwa tablicę i subskrypcje."""
+    router: SMSGateRouter | None = hass.data.get(DATA_ROUTER)
+    if router is None:
+        return
+    router.async_remove_entry(entry_id)
+    if not router.entries:
+        hass.data.pop(DATA_ROUTER, None)
+        router.async_close()
@@ -0,0 +1,183 @@
+"""
+Kodowanie i segmenty SMS (GSM-7 / UCS-2).
+
+- segment_info: kodowanie wiadomości i liczba segmentów. GSM-7: 160 znaków w jednym
+  SMS, 153 na segment w wiadomości wieloczęściowej (znaki z tablicy rozszerzeń,
+  np. € [ ] { }, liczą się podwójnie). Jeden znak spoza GSM-7 (np. polskie "ą")
+  przełącza całą wiadomość na UCS-2: 70 znaków, 67 na segment.
+- transliterate: zamienia polskie znaki diakrytyczne i typograficzne cudzysłowy,
+  myślniki itp. na odpowiedniki GSM-7 (pozostałe znaki bez zmian).
+- SegmentPolicy: przygotowanie treści wg opcji – transliteracja i limit segmentów
+  (truncate – obcięcie, split – kilka osobnych SMS, reject – odrzucenie).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+import logging
+from typing import Any
+import unicodedata
+
+from .const import (
+    CONF_MAX_SEGMENTS,
+    CONF_SEGMENT_POLICY,
+    CONF_TRANSLITERATE,
+    DEFAULT_MAX_SEGMENTS,
+    DEFAULT_SEGMENT_POLICY,
+    SEGMENT_POLICY_REJECT,
+    SEGMENT_POLICY_SPLIT,
+    SEGMENT_POLICY_TRUNCATE,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+ENCODING_GSM7 = "GSM-7"
+ENCODING_UCS2 = "UCS-2"
+
+# Podstawowa tablica GSM 03.38 (bez znaku ESC)
+_GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Tablica rozszerzeń – znak zajmuje dwa septety (ESC + znak)
+_GSM7_EXTENDED = frozenset("^{}\\[~]|€\f")
+
+# Pojemność: (jeden SMS, segment wiadomości wieloczęściowej)
+_CAPACITY = {ENCODING_GSM7: (160, 153), ENCODING_UCS2: (70, 67)}
+
+_TRANSLITERATION = str.maketrans(
+    {
+        "ą": "a", "ć": "c", "ę": "e", "ł": "l", "ń": "n", "ó": "o", "ś": "s", "ź": "z", "ż": "z",
+        "Ą": "A", "Ć": "C", "Ę": "E", "Ł": "L", "Ń": "N", "Ó": "O", "Ś": "S", "Ź": "Z", "Ż": "Z",
+        "„": '"', "”": '"', "“": '"', "«": '"', "»": '"', "‘": "'", "’": "'", "‚": "'",
+        "–": "-", "—": "-", "…": "...", "\u00a0": " ", "\t": " ",
+    }
+)
+
+
+@dataclass(frozen=True)
+class SegmentInfo:
+    """Kodowanie, długość w jednostkach kodowania (septety / znaki UTF-16) i liczba segmentów."""
+
+    encoding: str
+    units: int
+    segments: int
+
+
+def _char_units(char: str, encoding: str) -> int:
+    if encoding == ENCODING_GSM7:
+        return 2 if char in _GSM7_EXTENDED else 1
+    return 2 if ord(char) > 0xFFFF else 1
+
+
+def _encoding(text: str) -> str:
+    if all(c in _GSM7_BASIC or c in _GSM7_EXTENDED for c in text):
+        return ENCODING_GSM7
+    return ENCODING_UCS2
+
+
+def segment_info(text: str) -> SegmentInfo:
+    """Kodowanie i liczba segmentów wiadomości (pusta treść to jeden SMS)."""
+    encoding = _encoding(text)
+    units = sum(_char_units(c, encoding) for c in text)
+    single, multi = _CAPACITY[encoding]
+    segments = 1 if units <= single else -(-units // multi)
+    return SegmentInfo(encoding, units, segments)
+
+
+def transliterate(text: str) -> str:
+    """Zamienia znaki spoza GSM-7 na najbliższe odpowiedniki (o ile istnieją)."""
+    text = text.translate(_TRANSLITERATION)
+    if _encoding(text) == ENCODING_GSM7:
+        return text
+    chars = []
+    for char in text:
+        if char not in _GSM7_BASIC and char not in _GSM7_EXTENDED:
+            # Litery z akcentem spoza GSM-7 (np. "č", "á") – litera bazowa
+            base = "".join(
+                c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c)
+            )
+            if base and all(c in _GSM7_BASIC for c in base):
+                char = base
+        chars.append(char)
+    return "".join(chars)
+
+
+def _fit(text: str, max_segments: int) -> int:
+    """Liczba początkowych znaków text mieszczących się w max_segments segmentach."""
+    encoding = _encoding(text)
+    single, multi = _CAPACITY[encoding]
+    capacity = single if max_segments == 1 else multi * max_segments
+    used = 0
+    for index, char in enumerate(text):
+        used += _char_units(char, encoding)
+        if used > capacity:
+            return index
+    return len(text)
+
+
+def _split(text: str, max_segments: int) -> list[str]:
+    """Dzieli treść na części po max_segments segmentów (w miarę możliwości na spacjach)."""
+    parts: list[str] = []
+    rest = text
+    while rest:
+        cut = _fit(rest, max_segments)
+        if cut < len(rest):
+            space = rest.rfind(" ", 0, cut)
+            if space > cut // 2:
+                cut = space
+        parts.append(rest[:cut].rstrip())
+        rest = rest[cut:].lstrip()
+    return [p for p in parts if p]
+
+
+class SegmentPolicy:
+    """Przygotowanie treści przed wysyłką: transliteracja i limit segmentów (0 = bez limitu)."""
+
+    def __init__(
+        self,
+        *,
+        transliterate: bool = False,
+        max_segments: int = 0,
+        policy: str = SEGMENT_POLICY_SPLIT,
+    ) -> None:
+        self.transliterate = transliterate
+        self.max_segments = max(0, max_segments)
+        self.policy = policy
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any]) -> SegmentPolicy:
+        """Polityka z opcji wpisu."""
+        return cls(
+            transliterate=bool(options.get(CONF_TRANSLITERATE, False)),
+            max_segments=int(options.get(CONF_MAX_SEGMENTS, DEFAULT_MAX_SEGMENTS) or 0),
+            policy=options.get(CONF_SEGMENT_POLICY, DEFAULT_SEGMENT_POLICY),
+        )
+
+    def prepare(self, text: str) -> list[str]:
+        """
+        Zwraca listę treści do wysłania: jedną, kilka (split) lub pustą, gdy
+        wiadomość przekracza limit i polityka to reject.
+        """
+        if self.transliterate:
+            text = transliterate(text)
+        if not self.max_segments:
+            return [text]
+        info = segment_info(text)
+        if info.segments <= self.max_segments:
+            return [text]
+        if self.policy == SEGMENT_POLICY_REJECT:
+            _LOGGER.warning(
+                "SMS Gate: wiadomość odrzucona – %s segmentów %s (limit %s)",
+                info.segments,
+                info.encoding,
+                self.max_segments,
+            )
+            return []
+        if self.policy == SEGMENT_POLICY_TRUNCATE:
+            _LOGGER.debug(
+                "SMS Gate: wiadomość obcięta z %s do %s segmentów", info.segments, self.max_segments
+            )
+            return [text[: _fit(text, self.max_segments)]]
+        return _split(text, self.max_segments)
@@ -1,9 +1,18 @@
 """
-Sensory SMS Gate: status połączenia, ostatnie wiadomości, liczba oczekujących.
+Sensory SMS Gate: status połączenia, ostatnie wiadomości, liczba oczekujących,
+kolejka wychodząca.
 
-- Status: available/unavailable z coordinator.data["available"].
+- Status: available/unavailable z coordinator.data["available"] (unavailable także
+  przy otwartym wyłączniku – od razu, bez czekania na odświeżenie); atrybut
+  update_interval (s) – bieżący adaptacyjny interwał odświeżania.
+- Wyłącznik: stan circuit breakera bramki (closed / open / half_open).
+- Diagnostyczne (metryki żądań, odczyt co 30 s): średni czas wysyłki, health i
+  pobierania listy od poprzedniego odczytu (ms) oraz liczba błędów i timeoutów.
 - Ostatnie wiadomości: liczba + atrybut messages (id, state, recipients) z coordinator.
 - Liczba oczekujących: liczba wiadomości w stanie Pending (w kolejce).
+- Kolejka wychodząca: liczba wiadomości w outbox i wiek najstarszej (s).
+- Wysłane segmenty: łączna liczba segmentów SMS (koszt u operatora); atrybuty
+  messages i ucs2_messages (wiadomości zakodowane w UCS-2, 70 znaków na segment).
 """
 
 from __future__ import annotations
@@ -11,14 +20,24 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-from homeassistant.components.sensor import SensorEntity, SensorEntityDescription
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .api import SMSGateAPI
+from .breaker import BREAKER_STATES, STATE_OPEN
 from .const import DOMAIN
 from .coordinator import SMSGateDataUpdateCoordinator
+from .metrics import OP_HEALTH, OP_MESSAGES, OP_SEND, SMSGateMetrics
+from .outbox import SMSGateOutbox
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -40,6 +59,70 @@ SENSOR_PENDING = SensorEntityDescription(
     name="Liczba oczekujących",
 )
 
+SENSOR_QUEUE_DEPTH = SensorEntityDescription(
+    key="queue_depth",
+    translation_key="queue_depth",
+    name="Kolejka wychodząca",
+    state_class=SensorStateClass.MEASUREMENT,
+)
+
+SENSOR_QUEUE_AGE = SensorEntityDescription(
+    key="queue_oldest_age",
+    translation_key="queue_oldest_age",
+    name="Wiek najstarszej w kolejce",
+    device_class=SensorDeviceClass.DURATION,
+    native_unit_of_measurement=UnitOfTime.SECONDS,
+    state_class=SensorStateClass.MEASUREMENT,
+)
+
+SENSOR_SEGMENTS = SensorEntityDescription(
+    key="segments_sent",
+    translation_key="segments_sent",
+    name="Wysłane segmenty",
+    state_class=SensorStateClass.TOTAL_INCREASING,
+)
+
+SENSOR_DUPLICATES = SensorEntityDescription(
+    key="suppressed_duplicates",
+    translation_key="suppressed_duplicates",
+    name="Pominięte powtórzenia",
+    state_class=SensorStateClass.TOTAL_INCREASING,
+)
+
+SENSOR_BREAKER = SensorEntityDescription(
+    key="circuit_breaker",
+    translation_key="circuit_breaker",
+    name="Wyłącznik",
+    device_class=SensorDeviceClass.ENUM,
+    options=BREAKER_STATES,
+)
+
+
+def _latency_description(key: str, name: str) -> SensorEntityDescription:
+    return SensorEntityDescription(
+        key=key,
+        translation_key=key,
+        name=name,
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        suggested_display_precision=0,
+    )
+
+
+SENSOR_SEND_LATENCY = _latency_description("send_latency", "Czas wysyłki")
+SENSOR_HEALTH_LATENCY = _latency_description("health_latency", "Czas health")
+SENSOR_MESSAGES_LATENCY = _latency_description("messages_latency", "Czas pobierania wiadomości")
+
+SENSOR_REQUEST_ERRORS = SensorEntityDescription(
+    key="request_errors",
+    translation_key="request_errors",
+    name="Błędy żądań",
+    state_class=SensorStateClass.TOTAL_INCREASING,
+    entity_category=EntityCategory.DIAGNOSTIC,
+)
+
 
 def _message_attributes(msg: dict[str, Any]) -> dict[str, Any]:
     """Uproszczone atrybuty jednej wiadomości do wyświetlenia."""
@@ -66,10 +149,20 @@ async def async_setup_entry(
     if not data:
         return
     coordinator: SMSGateDataUpdateCoordinator = data["coordinator"]
+    outbox: SMSGateOutbox = data["outbox"]
     entities = [
         SMSGateStatusSensor(entry, coordinator, SENSOR_STATUS),
         SMSGateMessagesSensor(entry, coordinator, SENSOR_MESSAGES),
         SMSGatePendingSensor(entry, coordinator, SENSOR_PENDING),
+        SMSGateQueueDepthSensor(entry, coordinator, SENSOR_QUEUE_DEPTH, outbox),
+        SMSGateQueueAgeSensor(entry, coordinator, SENSOR_QUEUE_AGE, outbox),
+        SMSGateSegmentsSensor(entry, coordinator, SENSOR_SEGMENTS, outbox, data["api"]),
+        SMSGateDuplicatesSensor(entry, coordinator, SENSOR_DUPLICATES, outbox),
+        SMSGateBreakerSensor(entry, coordinator, SENSOR_BREAKER),
+        SMSGateLatencySensor(entry, data["api"].metrics, SENSOR_SEND_LATENCY, OP_SEND),
+        SMSGateLatencySensor(entry, data["api"].metrics, SENSOR_HEALTH_LATENCY, OP_HEALTH),
+        SMSGateLatencySensor(entry, data["api"].metrics, SENSOR_MESSAGES_LATENCY, OP_MESSAGES),
+        SMSGateRequestErrorsSensor(entry, data["api"].metrics, SENSOR_REQUEST_ERRORS),
     ]
     async_add_entities(entities)
 
@@ -96,17 +189,52 @@ class SMSGateBaseSensor(CoordinatorEntity[SMSGateDataUpdateCoordinator], SensorE
         }
 
 
-class SMSGateStatusSensor(SMSGateBaseSensor):
+class SMSGateBreakerListenerSensor(SMSGateBaseSensor):
+    """Bazowy sensor odświeżany także przy zmianie stanu wyłącznika bramki."""
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.breaker.async_add_listener(self.async_write_ha_state)
+        )
+
+
+class SMSGateStatusSensor(SMSGateBreakerListenerSensor):
     """Sensor statusu połączenia (available/unavailable)."""
 
     @property
     def native_value(self) -> str:
         data = self.coordinator.data or {}
+        if self.coordinator.breaker.state == STATE_OPEN:
+            return "unavailable"
         return "available" if data.get("available") else "unavailable"
 
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        interval = self.coordinator.update_interval
+        return {
+            "update_interval": int(interval.total_seconds()) if interval else None,
+        }
+
 
 class SMSGateMessagesSensor(SMSGateBaseSensor):
-    """Sensor z listą ostatnich wiadomości (atrybut messages)."""
+    """
+    Sensor z listą ostatnich wiadomości (atrybut messages). Lista jest budowana tylko
+    przy zmianie wiadomości i nie trafia do recordera – zapisywane jest podsumowanie
+    (liczba wiadomości w każdym stanie); pełna lista: serwis sms_gate.get_messages.
+    """
+
+    _unrecorded_attributes = frozenset({"messages"})
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        coordinator: SMSGateDataUpdateCoordinator,
+        description: SensorEntityDescription,
+    ) -> None:
+        super().__init__(entry, coordinator, description)
+        self._source: list[dict[str, Any]] = []
+        self._attributes: dict[str, Any] = {"states": {}, "messages": []}
 
     @property
     def native_value(self) -> int:
@@ -118,9 +246,20 @@ class SMSGateMessagesSensor(SMSGateBaseSensor):
     def extra_state_attributes(self) -> dict[str, Any]:
         data = self.coordinator.data or {}
         messages = data.get("messages") or []
-        return {
-            "messages": [_message_attributes(m) for m in messages],
-        }
+        # Coordinator podmienia słownik zmienionej wiadomości – wystarczy porównać tożsamość
+        if len(messages) != len(self._source) or any(
+            new is not old for new, old in zip(messages, self._source)
+        ):
+            states: dict[str, int] = {}
+            for msg in messages:
+                state = msg.get("state") or "unknown"
+                states[state] = states.get(state, 0) + 1
+            self._source = messages
+            self._attributes = {
+                "states": states,
+                "messages": [_message_attributes(m) for m in messages],
+            }
+        return self._attributes
 
 
 class SMSGatePendingSensor(SMSGateBaseSensor):
@@ -131,3 +270,159 @@ class SMSGatePendingSensor(SMSGateBaseSensor):
         data = self.coordinator.data or {}
         messages = data.get("messages") or []
         return sum(1 for m in messages if (m.get("state") or "").lower() == "pending")
+
+
+class SMSGateOutboxSensor(SMSGateBaseSensor):
+    """Bazowy sensor kolejki wychodzącej; odświeżany przy zmianie kolejki i coordinatora."""
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        coordinator: SMSGateDataUpdateCoordinator,
+        description: SensorEntityDescription,
+        outbox: SMSGateOutbox,
+    ) -> None:
+        super().__init__(entry, coordinator, description)
+        self._outbox = outbox
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self._outbox.async_add_listener(self.async_write_ha_state))
+
+
+class SMSGateQueueDepthSensor(SMSGateOutboxSensor):
+    """Sensor liczby wiadomości czekających w kolejce wychodzącej."""
+
+    @property
+    def native_value(self) -> int:
+        return self._outbox.depth
+
+
+class SMSGateQueueAgeSensor(SMSGateOutboxSensor):
+    """Sensor wieku najstarszej wiadomości w kolejce wychodzącej (s)."""
+
+    @property
+    def native_value(self) -> int:
+        age = self._outbox.oldest_age()
+        return round(age) if age is not None else 0
+
+
+class SMSGateSegmentsSensor(SMSGateOutboxSensor):
+    """Sensor łącznej liczby wysłanych segmentów SMS (od uruchomienia)."""
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        coordinator: SMSGateDataUpdateCoordinator,
+        description: SensorEntityDescription,
+        outbox: SMSGateOutbox,
+        api: SMSGateAPI,
+    ) -> None:
+        super().__init__(entry, coordinator, description, outbox)
+        self._api = api
+
+    @property
+    def native_value(self) -> int:
+        return self._api.segment_stats["segments"]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        stats = self._api.segment_stats
+        return {"messages": stats["messages"], "ucs2_messages": stats["ucs2_messages"]}
+
+
+class SMSGateDuplicatesSensor(SMSGateOutboxSensor):
+    """Sensor liczby stłumionych powtórzeń wiadomości (od uruchomienia)."""
+
+    @property
+    def native_value(self) -> int:
+        return self._outbox.suppressed
+
+
+class SMSGateBreakerSensor(SMSGateBreakerListenerSensor):
+    """Sensor stanu wyłącznika bramki; atrybut failures – kolejne błędy."""
+
+    @property
+    def native_value(self) -> str:
+        return self.coordinator.breaker.state
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        breaker = self.coordinator.breaker
+        return {
+            "failures": breaker.failures,
+            "retry_after": round(breaker.retry_after()),
+        }
+
+
+class SMSGateMetricsSensor(SensorEntity):
+    """Bazowy sensor metryk żądań – odczytywany okresowo (bez coordinatora i I/O)."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = True
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        metrics: SMSGateMetrics,
+        description: SensorEntityDescription,
+    ) -> None:
+        self.entity_description = description
+        self._metrics = metrics
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, entry.entry_id)},
+            "name": entry.title or "SMS Gate",
+            "manufacturer": "SMS Gate",
+        }
+
+
+class SMSGateLatencySensor(SMSGateMetricsSensor):
+    """Średni czas operacji (ms) od poprzedniego odczytu; atrybuty z całego histogramu."""
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        metrics: SMSGateMetrics,
+        description: SensorEntityDescription,
+        operation: str,
+    ) -> None:
+        super().__init__(entry, metrics, description)
+        self._stats = metrics.operations[operation]
+        self._last_count = 0
+        self._last_total = 0.0
+
+    async def async_update(self) -> None:
+        stats = self._stats
+        count = stats.count - self._last_count
+        if count:
+            self._attr_native_value = (stats.total - self._last_total) / count * 1000
+        self._last_count, self._last_total = stats.count, stats.total
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        stats = self._stats
+        return {
+            "count": stats.count,
+            "p50_le_s": stats.quantile(0.5),
+            "p95_le_s": stats.quantile(0.95),
+            "timeouts": stats.timeouts,
+            "errors": stats.errors,
+            "fallbacks": stats.fallbacks,
+        }
+
+
+class SMSGateRequestErrorsSensor(SMSGateMetricsSensor):
+    """Łączna liczba timeoutów i błędów połączenia (od uruchomienia)."""
+
+    @property
+    def native_value(self) -> int:
+        return self._metrics.failures
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        operations = self._metrics.operations.values()
+        return {
+            "timeouts": sum(s.timeouts for s in operations),
+            "errors": sum(s.errors for s in operations),
+        }
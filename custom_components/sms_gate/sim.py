@@ -0,0 +1,141 @@
+"""
+Wybór karty SIM dla wysyłki (telefony z kilkoma kartami, opcja sim_count).
+
+- Bez wskazania karty telefon wysyła wszystko z karty domyślnej, a limit operatora
+  tej karty ogranicza przepustowość bramki – druga karta stoi bezczynnie.
+- SimScheduler: karta z polityki prefiksów (najdłuższy pasujący prefiks numeru;
+  wszyscy odbiorcy muszą wskazywać tę samą kartę), inaczej kolejna dostępna karta
+  wg trybu: round_robin (po kolei) lub lru (najdawniej używana).
+- Każda karta ma własny kubełek tokenów (limit na minutę) i licznik wysłanych SMS;
+  karta z wyczerpanym limitem jest pomijana, a wiadomość przypisana prefiksem do
+  takiej karty czeka na nią.
+- Karta podana jawnie (sim_number w serwisie / notify) ma pierwszeństwo, ale też
+  zużywa limit swojej karty.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any
+
+from .const import (
+    CONF_SIM_COUNT,
+    CONF_SIM_MODE,
+    CONF_SIM_PREFIXES,
+    CONF_SIM_RATE_LIMIT,
+    DEFAULT_SIM_COUNT,
+    DEFAULT_SIM_MODE,
+    DEFAULT_SIM_RATE_LIMIT,
+    SIM_COUNT_MAX,
+    SIM_MODE_LRU,
+)
+from .ratelimit import TokenBucket
+from .recipients import normalize_number
+
+
+def parse_prefixes(
+    prefixes: Mapping[str, Any] | None, sim_count: int
+) -> list[tuple[str, int]]:
+    """Opcja "karta: prefiks, prefiks" → lista (prefiks, karta), najdłuższe prefiksy pierwsze."""
+    parsed: dict[str, int] = {}
+    for key, value in (prefixes or {}).items():
+        try:
+            sim = int(key)
+        except (TypeError, ValueError):
+            continue
+        if not 1 <= sim <= sim_count:
+            continue
+        for prefix in str(value or "").split(","):
+            if prefix := normalize_number(prefix):
+                parsed[prefix] = sim
+    return sorted(parsed.items(), key=lambda p: -len(p[0]))
+
+
+class SimScheduler:
+    """Przydział kart SIM jednej bramki (karty numerowane od 1)."""
+
+    def __init__(
+        self,
+        sim_count: int,
+        *,
+        mode: str = DEFAULT_SIM_MODE,
+        rate_limit: int = DEFAULT_SIM_RATE_LIMIT,
+        prefixes: Mapping[str, Any] | None = None,
+    ) -> None:
+        self.sims = list(range(1, max(1, min(SIM_COUNT_MAX, sim_count)) + 1))
+        self.mode = mode
+        self._prefixes = parse_prefixes(prefixes, len(self.sims))
+        self._buckets = {sim: TokenBucket(rate_limit) for sim in self.sims}
+        # round_robin: indeks następnej karty; lru: numer kolejny ostatniego użycia
+        self._cursor = 0
+        self._sequence = 0
+        self._last_used = dict.fromkeys(self.sims, 0)
+        self.sent = dict.fromkeys(self.sims, 0)
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any]) -> SimScheduler | None:
+        """Harmonogram z opcji wpisu; None przy jednej karcie (karta domyślna telefonu)."""
+        sim_count = int(options.get(CONF_SIM_COUNT, DEFAULT_SIM_COUNT) or 1)
+        if sim_count < 2:
+            return None
+        return cls(
+            sim_count,
+            mode=options.get(CONF_SIM_MODE, DEFAULT_SIM_MODE),
+            rate_limit=int(options.get(CONF_SIM_RATE_LIMIT, DEFAULT_SIM_RATE_LIMIT) or 0),
+            prefixes=options.get(CONF_SIM_PREFIXES),
+        )
+
+    def preferred(self, phone_numbers: list[str]) -> int | None:
+        """Karta z polityki prefiksów (None, gdy brak dopasowania lub odbiorcy w różnych sieciach)."""
+        if not self._prefixes:
+            return None
+        sims = set()
+        for number in phone_numbers:
+            sim = next((s for prefix, s in self._prefixes if number.startswith(prefix)), None)
+            if sim is None:
+                return None
+            sims.add(sim)
+        return sims.pop() if len(sims) == 1 else None
+
+    def _candidates(self) -> list[int]:
+        if self.mode == SIM_MODE_LRU:
+            return sorted(self.sims, key=self._last_used.__getitem__)
+        return self.sims[self._cursor :] + self.sims[: self._cursor]
+
+    def select(
+        self, phone_numbers: list[str], count: int, sim: int | None = None
+    ) -> tuple[int | None, float]:
+        """
+        Wybiera kartę dla wiadomości do count odbiorców (sim – karta podana jawnie).
+        Zwraca (karta, 0) albo (None, czas w s do zwolnienia limitu).
+        """
+        if sim is None:
+            sim = self.preferred(phone_numbers)
+        if sim is not None:
+            bucket = self._buckets.get(sim)
+            wait = bucket.wait_time(count) if bucket is not None else 0.0
+            return (sim, 0.0) if wait <= 0 else (None, wait)
+        waits = []
+        for candidate in self._candidates():
+            wait = self._buckets[candidate].wait_time(count)
+            if wait <= 0:
+                return candidate, 0.0
+            waits.append(wait)
+        return None, min(waits)
+
+    def consume(self, sim: int, count: int) -> None:
+        """Zapisuje wysyłkę z karty (tokeny, licznik, kolejność kart)."""
+        if (bucket := self._buckets.get(sim)) is None:
+            return
+        bucket.consume(count)
+        self.sent[sim] += count
+        self._sequence += 1
+        self._last_used[sim] = self._sequence
+        self._cursor = (self.sims.index(sim) + 1) % len(self.sims)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "prefixes": len(self._prefixes),
+            "sent": {str(sim): count for sim, count in self.sent.items()},
+        }
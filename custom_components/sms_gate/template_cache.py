@@ -0,0 +1,51 @@
+"""
+Cache skompilowanych szablonów wiadomości (per config entry).
+
+Obiekt Template z HA kompiluje źródło Jinja2 przy pierwszym renderowaniu i trzyma
+wynik – ponowne użycie tego samego obiektu omija parsowanie przy każdej wysyłce.
+Klucz: (nazwa szablonu, źródło); zmiana treści w opcjach daje nowy klucz, a zapis
+opcji czyści cały cache. Liczniki trafień/chybień trafiają do diagnostyki.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.template import Template
+
+
+class SMSGateTemplateCache:
+    """Skompilowane szablony jednego wpisu."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        self._templates: dict[tuple[str, str], Template] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, source: str) -> Template:
+        """Zwraca szablon z cache lub tworzy nowy (stara wersja o tej nazwie jest usuwana)."""
+        key = (name, source)
+        tpl = self._templates.get(key)
+        if tpl is not None:
+            self.hits += 1
+            return tpl
+        self.misses += 1
+        for old in [k for k in self._templates if k[0] == name]:
+            del self._templates[old]
+        tpl = self._templates[key] = Template(source, self._hass)
+        return tpl
+
+    def invalidate(self) -> None:
+        """Czyści cache (zapis opcji)."""
+        self._templates.clear()
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._templates),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
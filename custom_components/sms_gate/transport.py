@@ -0,0 +1,116 @@
+"""
+Współdzielony transport HTTP dla klientów SMSGateAPI.
+
+- SMSGateTransport: jedna sesja aiohttp z TCPConnector (limit połączeń na host,
+  keep-alive, cache DNS) wspólna dla wszystkich bramek; TraceConfig zlicza nowe
+  i ponownie użyte połączenia (statystyki puli) oraz bajty żądań przypisane do
+  metryk bramki (trace_request_ctx = RequestTracker).
+- async_acquire_transport / async_release_transport: licznik referencji w hass.data;
+  sesja zamykana przy zwolnieniu przez ostatniego użytkownika (unload, config flow).
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+import aiohttp
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DATA_TRANSPORT,
+    POOL_DNS_CACHE_TTL,
+    POOL_KEEPALIVE_TIMEOUT,
+    POOL_LIMIT,
+    POOL_LIMIT_PER_HOST,
+)
+from .metrics import RequestTracker
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SMSGateTransport:
+    """Sesja aiohttp z pulą połączeń keep-alive współdzielona przez bramki."""
+
+    def __init__(self) -> None:
+        """Tworzy connector i sesję (wymaga działającej pętli zdarzeń)."""
+        self.users = 0
+        self.created = 0
+        self.reused = 0
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self._on_connection_create_end)
+        trace.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        trace.on_request_chunk_sent.append(self._on_request_chunk_sent)
+        trace.on_response_chunk_received.append(self._on_response_chunk_received)
+        self._connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            keepalive_timeout=POOL_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=POOL_DNS_CACHE_TTL,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=self._connector,
+            trace_configs=[trace],
+        )
+
+    async def _on_connection_create_end(self, session: Any, ctx: Any, params: Any) -> None:
+        self.created += 1
+
+    async def _on_connection_reuseconn(self, session: Any, ctx: Any, params: Any) -> None:
+        self.reused += 1
+
+    async def _on_request_chunk_sent(self, session: Any, ctx: Any, params: Any) -> None:
+        if isinstance(ctx.trace_request_ctx, RequestTracker):
+            ctx.trace_request_ctx.add_bytes_out(len(params.chunk))
+
+    async def _on_response_chunk_received(self, session: Any, ctx: Any, params: Any) -> None:
+        if isinstance(ctx.trace_request_ctx, RequestTracker):
+            ctx.trace_request_ctx.add_bytes_in(len(params.chunk))
+
+    @property
+    def closed(self) -> bool:
+        return self.session.closed
+
+    def stats(self) -> dict[str, Any]:
+        """Statystyki puli: otwarte / bezczynne / aktywne połączenia i współczynnik reuse."""
+        # Connector nie udostępnia publicznie stanu puli – odczyt defensywny
+        idle = sum(len(conns) for conns in getattr(self._connector, "_conns", {}).values())
+        active = len(getattr(self._connector, "_acquired", ()))
+        total = self.created + self.reused
+        return {
+            "open": idle + active,
+            "idle": idle,
+            "active": active,
+            "created": self.created,
+            "reused": self.reused,
+            "reuse_ratio": round(self.reused / total, 3) if total else 0.0,
+            "users": self.users,
+        }
+
+    async def async_close(self) -> None:
+        if not self.session.closed:
+            await self.session.close()
+
+
+async def async_acquire_transport(hass: HomeAssistant) -> SMSGateTransport:
+    """Zwraca współdzielony transport (tworzy przy pierwszym użyciu) i zwiększa licznik."""
+    transport: SMSGateTransport | None = hass.data.get(DATA_TRANSPORT)
+    if transport is None or transport.closed:
+        transport = SMSGateTransport()
+        hass.data[DATA_TRANSPORT] = transport
+        _LOGGER.debug("SMS Gate: utworzono współdzieloną sesję HTTP")
+    transport.users += 1
+    return transport
+
+
+async def async_release_transport(hass: HomeAssistant) -> None:
+    """Zmniejsza licznik; przy ostatnim użytkowniku zamyka sesję i connector."""
+    transport: SMSGateTransport | None = hass.data.get(DATA_TRANSPORT)
+    if transport is None:
+        return
+    transport.users -= 1
+    if transport.users > 0:
+        return
+    hass.data.pop(DATA_TRANSPORT, None)
+    _LOGGER.debug("SMS Gate: zamknięcie współdzielonej sesji HTTP %s", transport.stats())
+    await transport.async_close()
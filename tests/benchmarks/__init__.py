@@ -0,0 +1 @@
+# Benchmarki SMS Gate (fake Local Server w procesie)
@@ -0,0 +1,130 @@
+"""
+Fake Local Server SMS Gate (aiohttp, w procesie) do benchmarków i testów obciążeniowych.
+
+Obsługuje /health, /health/ready, POST /messages (/message), GET /messages,
+GET /messages/{id}. Konfigurowalne: opóźnienie odpowiedzi, odsetek błędów 500
+oraz tryb legacy (404 na /health i POST /messages – jak starsze wersje aplikacji).
+Wiadomości przechodzą Pending → Sent → Delivered przy kolejnych odczytach.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+from typing import Any
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+_STATES = ("Pending", "Sent", "Delivered")
+
+
+class FakeSMSGateServer:
+    """Serwer w procesie; base_url dostępny po async_start."""
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        legacy: bool = False,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.legacy = legacy
+        self.requests: dict[str, int] = {}
+        self.messages: dict[str, dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._server: TestServer | None = None
+
+    @property
+    def base_url(self) -> str:
+        assert self._server is not None
+        return str(self._server.make_url("")).rstrip("/")
+
+    async def async_start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/health", self._health)
+        app.router.add_get("/health/ready", self._health_ready)
+        app.router.add_post("/messages", self._send)
+        app.router.add_post("/message", self._send_legacy)
+        app.router.add_get("/messages", self._list)
+        app.router.add_get("/messages/{id}", self._get)
+        self._server = TestServer(app)
+        await self._server.start_server()
+
+    async def async_stop(self) -> None:
+        if self._server is not None:
+            await self._server.close()
+
+    async def _prelude(self, request: web.Request) -> web.Response | None:
+        key = f"{request.method} {request.match_info.route.resource.canonical}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return web.Response(status=500, text="fake error")
+        return None
+
+    async def _health(self, request: web.Request) -> web.Response:
+        if (resp := await self._prelude(request)) is not None:
+            return resp
+        if self.legacy:
+            return web.Response(status=404)
+        return web.json_response({"status": "pass"})
+
+    async def _health_ready(self, request: web.Request) -> web.Response:
+        if (resp := await self._prelude(request)) is not None:
+            return resp
+        return web.json_response({"status": "pass"})
+
+    async def _store(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        msg_id = body.get("id") or f"fake-{next(self._ids)}"
+        self.messages[msg_id] = {
+            "id": msg_id,
+            "state": _STATES[0],
+            "recipients": [
+                {"phoneNumber": n, "state": _STATES[0]} for n in body.get("phoneNumbers", [])
+            ],
+        }
+        return web.Response(status=202, headers={"Location": f"/messages/{msg_id}"})
+
+    async def _send(self, request: web.Request) -> web.Response:
+        if (resp := await self._prelude(request)) is not None:
+            return resp
+        if self.legacy:
+            return web.Response(status=404)
+        return await self._store(request)
+
+    async def _send_legacy(self, request: web.Request) -> web.Response:
+        if (resp := await self._prelude(request)) is not None:
+            return resp
+        return await self._store(request)
+
+    def _advance(self, msg: dict[str, Any]) -> dict[str, Any]:
+        idx = _STATES.index(msg["state"])
+        if idx < len(_STATES) - 1:
+            msg["state"] = _STATES[idx + 1]
+            for r in msg["recipients"]:
+                r["state"] = msg["state"]
+        return msg
+
+    async def _list(self, request: web.Request) -> web.Response:
+        if (resp := await self._prelude(request)) is not None:
+            return resp
+        limit = int(request.query.get("limit", 20))
+        offset = int(request.query.get("offset", 0))
+        newest = list(reversed(self.messages.values()))[offset : offset + limit]
+        return web.json_response([self._advance(m) for m in newest])
+
+    async def _get(self, request: web.Request) -> web.Response:
+        if (resp := await self._prelude(request)) is not None:
+            return resp
+        msg = self.messages.get(request.match_info["id"])
+        if msg is None:
+            return web.Response(status=404)
+        return web.json_response(self._advance(msg))
@@ -0,0 +1,181 @@
+"""
+Benchmarki SMSGateAPI i coordinatora na fake Local Server (w procesie).
+
+Uruchamiane tylko na żądanie:
+
+    SMS_GATE_BENCHMARK=1 python -m pytest tests/benchmarks -q
+
+Wyniki (przepustowość, p50/p99, czas odświeżenia, pamięć) trafiają do pliku JSON
+wskazanego przez SMS_GATE_BENCHMARK_OUTPUT (domyślnie benchmark-results.json).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.sms_gate.api import SMSGateAPI
+from custom_components.sms_gate.coordinator import SMSGateDataUpdateCoordinator
+from custom_components.sms_gate.transport import SMSGateTransport
+
+from .fake_server import FakeSMSGateServer
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("SMS_GATE_BENCHMARK"),
+    reason="benchmarki uruchamiane tylko z SMS_GATE_BENCHMARK=1",
+)
+
+SENDS = int(os.environ.get("SMS_GATE_BENCHMARK_SENDS", "500"))
+CONCURRENCY = int(os.environ.get("SMS_GATE_BENCHMARK_CONCURRENCY", "4"))
+
+RESULTS: dict[str, Any] = {}
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _latency_summary(samples: list[float]) -> dict[str, float]:
+    return {
+        "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+@pytest.fixture(scope="module", autouse=True)
+def write_results():
+    yield
+    path = os.environ.get("SMS_GATE_BENCHMARK_OUTPUT", "benchmark-results.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(RESULTS, f, indent=2, sort_keys=True)
+
+
+async def _burst(api: SMSGateAPI, count: int, concurrency: int) -> tuple[list[float], int]:
+    """Wysyła count SMS z ograniczoną współbieżnością; zwraca (czasy, liczba sukcesów)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    ok = 0
+
+    async def one(i: int) -> None:
+        nonlocal ok
+        async with semaphore:
+            started = time.perf_counter()
+            success, _ = await api.async_send_sms([f"+48{i:09d}"], f"bench {i}")
+            latencies.append(time.perf_counter() - started)
+            ok += success
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return latencies, ok
+
+
+async def _run_send_benchmark(name: str, server: FakeSMSGateServer) -> dict[str, Any]:
+    await server.async_start()
+    transport = SMSGateTransport()
+    try:
+        api = SMSGateAPI(server.base_url, transport.session, "user", "pass")
+        started = time.perf_counter()
+        latencies, ok = await _burst(api, SENDS, CONCURRENCY)
+        elapsed = time.perf_counter() - started
+        result = {
+            "sends": SENDS,
+            "concurrency": CONCURRENCY,
+            "success": ok,
+            "throughput_per_s": round(SENDS / elapsed, 1),
+            **_latency_summary(latencies),
+            "requests": dict(server.requests),
+            "pool": transport.stats(),
+            "metrics": api.metrics.operations["send"].as_dict(),
+        }
+    finally:
+        await transport.async_close()
+        await server.async_stop()
+    RESULTS[name] = result
+    return result
+
+
+@pytest.mark.asyncio
+async def test_send_throughput():
+    """Przepustowość i opóźnienia wysyłki na współdzielonej puli połączeń."""
+    result = await _run_send_benchmark("send", FakeSMSGateServer())
+    assert result["success"] == SENDS
+    assert result["pool"]["reused"] > 0
+
+
+@pytest.mark.asyncio
+async def test_send_throughput_with_latency_and_errors():
+    """Telefon z opóźnieniem 20 ms i 5% błędów 500."""
+    result = await _run_send_benchmark(
+        "send_latency_errors", FakeSMSGateServer(latency=0.02, error_rate=0.05)
+    )
+    assert 0 < result["success"] < SENDS
+
+
+@pytest.mark.asyncio
+async def test_legacy_fallback_costs_one_probe():
+    """Starsza aplikacja (404 na /messages): po pierwszym sondowaniu jedno żądanie na SMS."""
+    result = await _run_send_benchmark("send_legacy", FakeSMSGateServer(legacy=True))
+    assert result["success"] == SENDS
+    assert result["requests"].get("POST /message") == SENDS
+    assert result["requests"].get("POST /messages", 0) <= CONCURRENCY
+
+
+@pytest.mark.asyncio
+async def test_coordinator_refresh_time():
+    """Czas odświeżenia coordinatora (health + lista + śledzenie niefinalnych)."""
+    server = FakeSMSGateServer(latency=0.01)
+    await server.async_start()
+    transport = SMSGateTransport()
+    try:
+        api = SMSGateAPI(server.base_url, transport.session, "user", "pass")
+        await _burst(api, 50, CONCURRENCY)
+        coordinator = SMSGateDataUpdateCoordinator(MagicMock(), api)
+        samples = []
+        for _ in range(20):
+            started = time.perf_counter()
+            data = await coordinator._async_update_data()
+            samples.append(time.perf_counter() - started)
+        RESULTS["coordinator_refresh"] = {
+            "refreshes": len(samples),
+            **_latency_summary(samples),
+            "requests": dict(server.requests),
+        }
+    finally:
+        await transport.async_close()
+        await server.async_stop()
+    assert data["available"] is True
+
+
+@pytest.mark.asyncio
+async def test_memory_under_sustained_bursts():
+    """Szczytowa pamięć przy kilku kolejnych seriach wysyłek."""
+    server = FakeSMSGateServer()
+    await server.async_start()
+    transport = SMSGateTransport()
+    tracemalloc.start()
+    try:
+        api = SMSGateAPI(server.base_url, transport.session, "user", "pass")
+        for _ in range(5):
+            await _burst(api, SENDS // 5, CONCURRENCY)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        await transport.async_close()
+        await server.async_stop()
+    RESULTS["memory"] = {
+        "sends": SENDS,
+        "current_kib": round(current / 1024, 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+    assert peak > 0
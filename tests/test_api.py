@@ -2,14 +2,18 @@
 
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import aiohttp
 import pytest
 
 from custom_components.sms_gate.api import SMSGateAPI
+from custom_components.sms_gate.const import CAPABILITY_MAX_FAILURES
+from custom_components.sms_gate.retry import RetryPolicy
 
 
 @pytest.fixture
 def session():
-    return AsyncMock()
+    # get/post zwracają context manager (nie korutynę) – jak aiohttp.ClientSession
+    return MagicMock()
 
 
 @pytest.fixture
@@ -97,6 +101,20 @@ async def test_get_messages_returns_list(api, session):
     assert result[0]["state"] == "Sent"
 
 
+@pytest.mark.asyncio
+async def test_get_messages_page_returns_none_on_error(api, session):
+    """Strona wiadomości: None przy błędzie (status 500, sieć), [] tylko przy pustej liście."""
+    session.get.return_value = _resp(500)
+    assert await api.async_get_messages_page(offset=20) is None
+    assert await api.async_get_messages(offset=20) == []
+    session.get.side_effect = aiohttp.ClientError("down")
+    assert await api.async_get_messages_page(offset=20) is None
+    session.get.side_effect = None
+    session.get.return_value = _resp(200)
+    session.get.return_value.json = AsyncMock(return_value=[])
+    assert await api.async_get_messages_page(offset=20) == []
+
+
 @pytest.mark.asyncio
 async def test_get_message_returns_dict(api, session):
     """async_get_message zwraca pojedynczy dict."""
@@ -109,3 +127,155 @@ async def test_get_message_returns_dict(api, session):
     result = await api.async_get_message("m1")
     assert result["id"] == "m1"
     assert result["state"] == "Delivered"
+
+
+def _resp(status, headers=None):
+    resp = AsyncMock()
+    resp.status = status
+    resp.headers = headers or {}
+    resp.content_length = 0
+    resp.text = AsyncMock(return_value="")
+    resp.__aenter__ = AsyncMock(return_value=resp)
+    resp.__aexit__ = AsyncMock(return_value=None)
+    return resp
+
+
+@pytest.mark.asyncio
+async def test_send_sms_remembers_legacy_path(api, session):
+    """Po udanym fallbacku na /message kolejne wysyłki idą od razu na /message."""
+    listener = MagicMock()
+    api.set_capabilities_listener(listener)
+    session.post.side_effect = [_resp(404), _resp(202), _resp(202)]
+    await api.async_send_sms(["+48111"], "Hi")
+    assert api.capabilities == {"send": "/message"}
+    listener.assert_called_once_with({"send": "/message"})
+
+    await api.async_send_sms(["+48111"], "Hi again")
+    assert session.post.call_count == 3
+    assert session.post.call_args[0][0].endswith("/message")
+
+
+@pytest.mark.asyncio
+async def test_cached_path_404_reprobes(session):
+    """404 na zapamiętanej ścieżce unieważnia cache i sonduje pozostałe."""
+    api = SMSGateAPI(
+        "http://192.168.1.10:8080", session, "u", "p", capabilities={"health": "/health/ready"}
+    )
+    session.get.side_effect = [_resp(404), _resp(200)]
+    assert await api.async_get_health() == {}
+    assert session.get.call_args_list[0][0][0].endswith("/health/ready")
+    assert api.capabilities == {"health": "/health"}
+
+
+@pytest.mark.asyncio
+async def test_cached_path_invalidated_after_repeated_failures(session):
+    """Po CAPABILITY_MAX_FAILURES błędach zapamiętana ścieżka jest zapominana."""
+    api = SMSGateAPI(
+        "http://192.168.1.10:8080", session, "u", "p", capabilities={"health": "/health"}
+    )
+    session.get.side_effect = aiohttp.ClientError("down")
+    for _ in range(CAPABILITY_MAX_FAILURES):
+        assert await api.async_get_health() is None
+    assert session.get.call_count == CAPABILITY_MAX_FAILURES
+    assert api.capabilities == {}
+
+
+@pytest.mark.asyncio
+async def test_send_sms_counts_segments(api, session):
+    """Udana wysyłka liczy segmenty; polskie znaki to UCS-2."""
+    session.post.side_effect = [_resp(202), _resp(202), _resp(500)]
+    await api.async_send_sms(["+48111"], "a" * 161)
+    await api.async_send_sms(["+48111"], "zażółć")
+    await api.async_send_sms(["+48111"], "nie wysłano")
+    assert api.segment_stats == {"messages": 2, "segments": 3, "ucs2_messages": 1}
+
+
+@pytest.mark.asyncio
+async def test_send_sms_retries_transient_error_with_same_id(session):
+    """Zerwane połączenie jest ponawiane z tym samym id (klucz idempotencji)."""
+    api = SMSGateAPI(
+        "http://192.168.1.10:8080",
+        session,
+        "u",
+        "p",
+        retry_policy=RetryPolicy(retries=2, base_delay=0),
+    )
+    session.post.side_effect = [aiohttp.ClientError("reset"), _resp(503), _resp(202)]
+    success, msg_id = await api.async_send_sms(["+48111"], "Hi", message_id="abc")
+    assert (success, msg_id) == (True, "abc")
+    assert session.post.call_count == 3
+    assert {c.kwargs["json"]["id"] for c in session.post.call_args_list} == {"abc"}
+    assert api.retry_stats["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_send_sms_conflict_means_already_sent(session):
+    """409 przy ponowieniu: wiadomość już jest w telefonie – sukces bez duplikatu."""
+    api = SMSGateAPI(
+        "http://192.168.1.10:8080",
+        session,
+        "u",
+        "p",
+        retry_policy=RetryPolicy(retries=1, base_delay=0),
+    )
+    session.post.side_effect = [TimeoutError(), _resp(409)]
+    assert await api.async_send_sms(["+48111"], "Hi", message_id="abc") == (True, "abc")
+    assert api.retry_stats["duplicates"] == 1
+
+
+@pytest.mark.asyncio
+async def test_send_sms_client_error_status_not_retried(session):
+    """Błąd 400 nie jest przejściowy – bez ponowień."""
+    api = SMSGateAPI(
+        "http://192.168.1.10:8080",
+        session,
+        "u",
+        "p",
+        retry_policy=RetryPolicy(retries=3, base_delay=0),
+    )
+    session.post.side_effect = [_resp(400)]
+    success, _ = await api.async_send_sms(["+48111"], "Hi")
+    assert success is False
+    assert session.post.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_send_sms_fails_fast_when_breaker_open(api, session):
+    """Przy otwartym wyłączniku wysyłka jest odrzucana bez żądania HTTP."""
+    session.post.side_effect = aiohttp.ClientError("down")
+    for _ in range(3):
+        await api.async_send_sms(["+48111"], "Hi")
+    assert api.breaker.state == "open"
+    session.post.reset_mock()
+    assert await api.async_send_sms(["+48111"], "Hi") == (False, "circuit open")
+    session.post.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_requests_are_measured(api, session):
+    """Każde żądanie trafia do metryk operacji; fallback 404 jest liczony."""
+    session.post.side_effect = [_resp(404), _resp(202)]
+    await api.async_send_sms(["+48111"], "Hi")
+    session.get.side_effect = aiohttp.ClientError("down")
+    await api.async_get_messages()
+    send = api.metrics.operations["send"]
+    assert send.count == 2
+    assert send.statuses == {404: 1, 202: 1}
+    assert send.fallbacks == 1
+    assert api.metrics.operations["messages"].errors == 1
+
+
+@pytest.mark.asyncio
+async def test_send_sms_unexpected_error_releases_breaker_probe(api):
+    """Nieoczekiwany błąd podczas próby half_open zwalnia próbę – bramka nie jest blokowana."""
+    with patch("custom_components.sms_gate.breaker.time.monotonic", return_value=100.0):
+        for _ in range(api.breaker._threshold):
+            api.breaker.record_failure()
+    post = AsyncMock(side_effect=KeyError("id"))
+    with (
+        patch("custom_components.sms_gate.breaker.time.monotonic", return_value=10_000.0),
+        patch.object(api, "_async_post_message", post),
+    ):
+        with pytest.raises(KeyError):
+            await api.async_send_sms(["+48111"], "Hi")
+        assert api.breaker.allow_request()
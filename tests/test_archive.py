@@ -0,0 +1,152 @@
+"""Testy archiwum wiadomości SMS Gate (SQLite)."""
+
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from custom_components.sms_gate.archive import SMSGateArchive
+from custom_components.sms_gate.breaker import CircuitBreaker
+
+
+def _msg(i, state="Delivered", phone="+48111", created="2026-01-10T12:00:00+00:00"):
+    return {
+        "id": f"m{i}",
+        "state": state,
+        "recipients": [{"phoneNumber": phone, "state": state}],
+        "states": {"Pending": created},
+    }
+
+
+@pytest.fixture
+def hass():
+    hass = MagicMock()
+    hass.async_add_executor_job = lambda func, *args: asyncio.get_running_loop().run_in_executor(
+        None, func, *args
+    )
+    return hass
+
+
+@pytest.fixture
+def api():
+    api = MagicMock()
+    api.breaker = CircuitBreaker()
+    api.async_get_messages_page = AsyncMock(return_value=[])
+    return api
+
+
+@pytest.fixture
+async def archive(hass, api, tmp_path):
+    archive = SMSGateArchive(hass, "entry-1", api, MagicMock(), path=str(tmp_path / "a.db"))
+    await hass.async_add_executor_job(archive._open)
+    yield archive
+    archive._close()
+
+
+@pytest.mark.asyncio
+async def test_sync_backfills_in_steps_then_stops_at_known_id(archive, api):
+    """Historia pobierana stronami z kontynuacją; potem tylko do pierwszego znanego id."""
+    gateway = [_msg(i) for i in range(5, 0, -1)]
+    api.async_get_messages_page.side_effect = lambda limit, offset: gateway[offset : offset + limit]
+    with (
+        patch("custom_components.sms_gate.archive.ARCHIVE_PAGE_SIZE", 2),
+        patch("custom_components.sms_gate.archive.ARCHIVE_MAX_PAGES", 2),
+    ):
+        assert await archive.async_sync() == 4
+        assert await archive.async_sync() == 1
+        assert [c.kwargs["offset"] for c in api.async_get_messages_page.call_args_list] == [0, 2, 4]
+
+        gateway.insert(0, _msg(6))
+        api.async_get_messages_page.reset_mock()
+        assert await archive.async_sync() == 2
+        api.async_get_messages_page.assert_called_once_with(limit=2, offset=0)
+    assert (await archive.async_stats())["messages"] == 6
+
+
+@pytest.mark.asyncio
+async def test_sync_page_error_keeps_offset_for_next_sync(archive, api):
+    """Błąd strony (None) nie kończy backfillu; kolejna synchronizacja kontynuuje od offsetu."""
+    gateway = [_msg(i) for i in range(4, 0, -1)]
+    api.async_get_messages_page.side_effect = [gateway[0:2], None]
+    with patch("custom_components.sms_gate.archive.ARCHIVE_PAGE_SIZE", 2):
+        assert await archive.async_sync() == 2
+        api.async_get_messages_page.side_effect = (
+            lambda limit, offset: gateway[offset : offset + limit]
+        )
+        api.async_get_messages_page.reset_mock()
+        assert await archive.async_sync() == 2
+        assert api.async_get_messages_page.call_args_list[0].kwargs["offset"] == 2
+    assert archive.last_sync is not None
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_running_sync_before_close(archive, api, hass):
+    """async_stop przerywa trwającą synchronizację w tle przed zamknięciem bazy."""
+    hass.async_create_background_task = lambda coro, name: asyncio.ensure_future(coro)
+    started = asyncio.Event()
+
+    async def hang(**_):
+        started.set()
+        await asyncio.Event().wait()
+
+    api.async_get_messages_page.side_effect = hang
+    archive._async_schedule_sync()
+    task = archive._sync_task
+    await started.wait()
+    archive._async_schedule_sync()
+    assert archive._sync_task is task
+
+    await archive.async_stop()
+    assert task.cancelled()
+    assert archive._db is None
+
+
+@pytest.mark.asyncio
+async def test_sync_skipped_when_breaker_open(archive, api):
+    """Otwarty wyłącznik – bez żądań do telefonu."""
+    for _ in range(3):
+        api.breaker.record_failure()
+    assert await archive.async_sync() == 0
+    api.async_get_messages_page.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_query_filters_by_recipient_state_and_time(archive, hass):
+    """Zapytania po numerze, stanie i czasie utworzenia (z pola states)."""
+    await hass.async_add_executor_job(
+        archive._store,
+        [
+            _msg(1, "Delivered", "+48111", "2026-01-10T12:00:00+00:00"),
+            _msg(2, "Failed", "+48111", "2026-01-20T12:00:00+00:00"),
+            _msg(3, "Failed", "+48222", "2026-02-01T12:00:00+00:00"),
+        ],
+    )
+    january = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    february = datetime(2026, 2, 1, tzinfo=timezone.utc)
+
+    result = await archive.async_query(phones=["+48111"], since=january, until=february)
+    assert result["count"] == 2
+    assert result["states"] == {"Delivered": 1, "Failed": 1}
+    assert [m["id"] for m in result["messages"]] == ["m2", "m1"]
+
+    result = await archive.async_query(state="failed", limit=1)
+    assert result["count"] == 2
+    assert [m["id"] for m in result["messages"]] == ["m3"]
+
+
+@pytest.mark.asyncio
+async def test_coordinator_updates_store_only_changed_messages(archive, hass):
+    """Snapshot coordinatora: zapisywane tylko nowe i podmienione wiadomości."""
+    m1, m2 = _msg(1, "Sent"), _msg(2, "Sent")
+    archive._coordinator.data = {"messages": [m1, m2]}
+    with patch.object(archive, "_store") as store:
+        hass.async_add_executor_job = MagicMock()
+        archive._async_handle_coordinator_update()
+        hass.async_add_executor_job.assert_called_once_with(store, [m1, m2])
+
+        delivered = {**m1, "state": "Delivered"}
+        archive._coordinator.data = {"messages": [delivered, m2]}
+        hass.async_add_executor_job.reset_mock()
+        archive._async_handle_coordinator_update()
+        hass.async_add_executor_job.assert_called_once_with(store, [delivered])
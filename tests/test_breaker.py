@@ -0,0 +1,56 @@
+"""Testy wyłącznika (circuit breaker) bramki."""
+
+from unittest.mock import MagicMock, patch
+
+from custom_components.sms_gate.breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+)
+
+
+def test_opens_after_threshold_consecutive_failures():
+    """Obwód otwiera się po threshold kolejnych błędach; sukces zeruje licznik."""
+    breaker = CircuitBreaker(threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+    assert 0 < breaker.retry_after() <= 30
+
+
+def test_half_open_allows_single_probe():
+    """Po reset_timeout przechodzi jedna próba; jej wynik zamyka lub otwiera obwód."""
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30)
+    with patch("custom_components.sms_gate.breaker.time.monotonic", return_value=100.0):
+        breaker.record_failure()
+    with patch("custom_components.sms_gate.breaker.time.monotonic", return_value=131.0):
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == STATE_OPEN
+    with patch("custom_components.sms_gate.breaker.time.monotonic", return_value=162.0):
+        assert breaker.allow_request()
+        breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_listeners_notified_on_state_change():
+    """Zmiana stanu wywołuje callbacki (sensory)."""
+    breaker = CircuitBreaker(threshold=1)
+    listener = MagicMock()
+    remove = breaker.async_add_listener(listener)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert listener.call_count == 1
+    remove()
+    breaker.record_success()
+    assert listener.call_count == 1
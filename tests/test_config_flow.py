@@ -1,6 +1,6 @@
 """Testy config flow SMS Gate."""
 
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 
 import pytest
 
@@ -26,13 +26,15 @@ async def test_validate_connection_success():
         api = AsyncMock()
         api.async_get_health = AsyncMock(return_value={"status": "pass"})
         api_cls.return_value = api
-        with patch("custom_components.sms_gate.config_flow.aiohttp.ClientSession") as session_cls:
-            session = AsyncMock()
-            session.close = AsyncMock()
-            session_cls.return_value = session
-            session_cls.return_value.__aenter__ = AsyncMock(return_value=session)
-            session_cls.return_value.__aexit__ = AsyncMock(return_value=None)
+        with patch(
+            "custom_components.sms_gate.config_flow.async_acquire_transport",
+            AsyncMock(return_value=MagicMock()),
+        ), patch(
+            "custom_components.sms_gate.config_flow.async_release_transport",
+            AsyncMock(),
+        ) as release:
             err = await _validate_connection(hass, data)
+        assert release.await_count == 1
     assert err is None
 
 
@@ -45,13 +47,15 @@ async def test_validate_connection_fail():
         api = AsyncMock()
         api.async_get_health = AsyncMock(return_value=None)
         api_cls.return_value = api
-        with patch("custom_components.sms_gate.config_flow.aiohttp.ClientSession") as session_cls:
-            session = AsyncMock()
-            session.close = AsyncMock()
-            session_cls.return_value = session
-            session_cls.return_value.__aenter__ = AsyncMock(return_value=session)
-            session_cls.return_value.__aexit__ = AsyncMock(return_value=None)
+        with patch(
+            "custom_components.sms_gate.config_flow.async_acquire_transport",
+            AsyncMock(return_value=MagicMock()),
+        ), patch(
+            "custom_components.sms_gate.config_flow.async_release_transport",
+            AsyncMock(),
+        ) as release:
             err = await _validate_connection(hass, data)
+        assert release.await_count == 1
     assert err == "cannot_connect"
 
 
@@ -0,0 +1,359 @@
+"""Testy coordinatora SMS Gate."""
+
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from custom_components.sms_gate.breaker import CircuitBreaker
+from custom_components.sms_gate.const import (
+    DEFAULT_SCAN_INTERVAL_MAX,
+    DEFAULT_SCAN_INTERVAL_MIN,
+    UPDATE_INTERVAL,
+    WEBHOOK_RECONCILE_INTERVAL,
+)
+from custom_components.sms_gate.coordinator import (
+    SMSGateDataUpdateCoordinator,
+    _gather_within,
+)
+
+
+@pytest.fixture
+def api():
+    api = MagicMock()
+    api.breaker = CircuitBreaker()
+    api.async_get_health = AsyncMock(return_value={"status": "pass"})
+    api.async_get_messages = AsyncMock(return_value=[])
+    api.async_get_message = AsyncMock(return_value=None)
+    return api
+
+
+@pytest.fixture
+def coordinator(api):
+    coordinator = SMSGateDataUpdateCoordinator(MagicMock(), api)
+    coordinator.async_set_updated_data = MagicMock(
+        side_effect=lambda data: setattr(coordinator, "data", data)
+    )
+    return coordinator
+
+
+@pytest.mark.asyncio
+async def test_push_event_updates_known_message(coordinator, api):
+    """Zdarzenie sms:delivered zmienia stan znanej wiadomości i odbiorcy."""
+    api.async_get_messages.return_value = [
+        {"id": "m1", "state": "Sent", "recipients": [{"phoneNumber": "+48111", "state": "Sent"}]},
+    ]
+    await coordinator._async_update_data()
+    assert coordinator.async_handle_push_event(
+        "sms:delivered", {"messageId": "m1", "phoneNumber": "+48111"}
+    )
+    msg = coordinator.data["messages"][0]
+    assert msg["state"] == "Delivered"
+    assert msg["recipients"][0]["state"] == "Delivered"
+    assert coordinator.data["available"] is True
+
+
+def test_push_event_adds_unknown_message(coordinator):
+    """Zdarzenie dla nieznanej wiadomości dodaje ją na początek listy."""
+    assert coordinator.async_handle_push_event("sms:failed", {"messageId": "new"})
+    assert coordinator.data["messages"][0]["id"] == "new"
+    assert coordinator.data["messages"][0]["state"] == "Failed"
+
+
+def test_push_event_ignores_unknown_event(coordinator):
+    """Nieobsługiwane zdarzenia (np. sms:received) nie zmieniają danych."""
+    assert not coordinator.async_handle_push_event("sms:received", {"messageId": "x"})
+    coordinator.async_set_updated_data.assert_not_called()
+
+
+def test_push_mode_slows_polling(coordinator):
+    """Tryb push: polling tylko jako wolne uzgadnianie stanu."""
+    coordinator.async_set_push_active(True)
+    assert coordinator.update_interval == WEBHOOK_RECONCILE_INTERVAL
+    coordinator.async_set_push_active(False)
+    assert coordinator.update_interval == UPDATE_INTERVAL
+
+
+@pytest.mark.asyncio
+async def test_update_merges_diff_and_keeps_unchanged_data_equal(coordinator, api):
+    """Kolejny poll bez zmian daje identyczne dane (brak aktualizacji encji)."""
+    api.async_get_messages.return_value = [
+        {"id": "m2", "state": "Pending", "recipients": []},
+        {"id": "m1", "state": "Delivered", "recipients": []},
+    ]
+    first = await coordinator._async_update_data()
+    assert [m["id"] for m in first["messages"]] == ["m2", "m1"]
+    assert coordinator.last_diff == {"new": 2, "final": 1}
+
+    second = await coordinator._async_update_data()
+    assert second == first
+    assert coordinator.last_diff == {}
+
+
+@pytest.mark.asyncio
+async def test_update_requeries_only_non_final_outside_page(coordinator, api):
+    """Niefinalne wiadomości spoza strony są odpytywane pojedynczo, finalne – nie."""
+    api.async_get_messages.return_value = [
+        {"id": "m2", "state": "Pending", "recipients": []},
+        {"id": "m1", "state": "Delivered", "recipients": []},
+    ]
+    await coordinator._async_update_data()
+    api.async_get_messages.return_value = [{"id": "m3", "state": "Pending", "recipients": []}]
+    api.async_get_message.return_value = {"id": "m2", "state": "Sent", "recipients": []}
+    data = await coordinator._async_update_data()
+    api.async_get_message.assert_awaited_once_with("m2")
+    assert [m["id"] for m in data["messages"]] == ["m3", "m2", "m1"]
+    assert data["messages"][1]["state"] == "Sent"
+    assert coordinator.last_diff == {"new": 1, "changed": 1}
+
+
+@pytest.mark.asyncio
+async def test_interval_short_while_pending_then_backs_off(coordinator, api):
+    """Niefinalne wiadomości – min. interwał; w bezczynności interwał rośnie do maks."""
+    api.async_get_messages.return_value = [{"id": "m1", "state": "Pending", "recipients": []}]
+    await coordinator._async_update_data()
+    assert coordinator.update_interval == timedelta(seconds=DEFAULT_SCAN_INTERVAL_MIN)
+
+    api.async_get_messages.return_value = [{"id": "m1", "state": "Delivered", "recipients": []}]
+    intervals = []
+    for _ in range(6):
+        await coordinator._async_update_data()
+        intervals.append(coordinator.update_interval.total_seconds())
+    assert intervals == [20, 40, 80, 160, 300, 300]
+
+
+@pytest.mark.asyncio
+async def test_interval_backs_off_when_health_fails(coordinator, api):
+    """Kolejne błędy health wydłużają interwał wykładniczo."""
+    api.async_get_health.return_value = None
+    intervals = []
+    for _ in range(3):
+        await coordinator._async_update_data()
+        intervals.append(coordinator.update_interval.total_seconds())
+    assert intervals == [120, 240, DEFAULT_SCAN_INTERVAL_MAX]
+    assert coordinator.health_failures == 3
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_skips_requests(coordinator, api):
+    """Po kolejnych niedostępnościach wyłącznik się otwiera – odświeżenie bez żądań."""
+    api.async_get_health.return_value = None
+    for _ in range(3):
+        await coordinator._async_update_data()
+    assert coordinator.breaker.state == "open"
+    api.async_get_health.reset_mock()
+    data = await coordinator._async_update_data()
+    assert data["available"] is False
+    api.async_get_health.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_refresh_keeps_concurrent_probe(coordinator, api):
+    """Odświeżenie bez próby half_open nie zwalnia próby równoległej wysyłki."""
+    breaker = coordinator.breaker
+    started = asyncio.Event()
+
+    async def health():
+        # W trakcie odświeżenia obwód się otwiera, przechodzi w half_open, a próbę
+        # bierze równoległa wysyłka
+        with patch("custom_components.sms_gate.breaker.time.monotonic", return_value=100.0):
+            for _ in range(3):
+                breaker.record_failure()
+        with patch("custom_components.sms_gate.breaker.time.monotonic", return_value=10_000.0):
+            assert breaker.allow_request()
+        started.set()
+        await asyncio.sleep(10)
+
+    api.async_get_health = AsyncMock(side_effect=health)
+    refresh = asyncio.ensure_future(coordinator._async_update_data())
+    await started.wait()
+    refresh.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await refresh
+    assert not breaker.allow_request()
+
+
+def test_note_activity_requests_fast_refresh(coordinator):
+    """Po wysłaniu SMS interwał spada do minimum i zlecane jest odświeżenie."""
+    coordinator.async_note_activity("m1")
+    assert coordinator.update_interval == timedelta(seconds=DEFAULT_SCAN_INTERVAL_MIN)
+    assert coordinator.hass.async_create_task.called
+    coordinator.hass.async_create_task.call_args[0][0].close()
+
+
+@pytest.mark.asyncio
+async def test_update_runs_fetches_concurrently_with_deadline(coordinator, api):
+    """Health i lista idą równolegle; wolny health po limicie czasu nie blokuje listy."""
+    async def slow_health():
+        await asyncio.sleep(1)
+        return {"status": "pass"}
+
+    api.async_get_health = AsyncMock(side_effect=slow_health)
+    api.async_get_messages.return_value = [{"id": "m1", "state": "Sent", "recipients": []}]
+    with patch("custom_components.sms_gate.coordinator.REFRESH_TIMEOUT", 0.05):
+        started = asyncio.get_running_loop().time()
+        data = await coordinator._async_update_data()
+        elapsed = asyncio.get_running_loop().time() - started
+    assert elapsed < 0.5
+    assert data["messages"][0]["id"] == "m1"
+    # Lista przyszła – bramka odpowiada mimo przekroczenia czasu health
+    assert data["available"] is True
+
+
+@pytest.mark.asyncio
+async def test_cancelled_refresh_cancels_inner_requests():
+    """Anulowanie odświeżenia (unload) przerywa też równoległe żądania."""
+    started = asyncio.Event()
+    inner = []
+
+    async def request():
+        inner.append(asyncio.current_task())
+        started.set()
+        await asyncio.sleep(10)
+
+    outer = asyncio.ensure_future(_gather_within([request()], 10))
+    await started.wait()
+    outer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await outer
+    assert inner[0].cancelled()
+
+
+@pytest.mark.asyncio
+async def test_update_keeps_messages_when_list_fails(coordinator, api):
+    """Błąd listy wiadomości nie czyści poprzednich danych."""
+    api.async_get_messages.return_value = [{"id": "m1", "state": "Delivered", "recipients": []}]
+    await coordinator._async_update_data()
+    api.async_get_messages.side_effect = RuntimeError("boom")
+    data = await coordinator._async_update_data()
+    assert data["available"] is True
+    assert [m["id"] for m in data["messages"]] == ["m1"]
+
+
+@pytest.mark.asyncio
+async def test_tracked_message_fires_events_and_resolves_waiter(coordinator, api):
+    """Śledzona wiadomość: zdarzenie przy każdej zmianie stanu, future ze stanem końcowym."""
+    coordinator.hass.loop = asyncio.get_running_loop()
+    future = coordinator.async_wait_for_final("m1")
+    api.async_get_message.return_value = {
+        "id": "m1", "state": "Sent", "recipients": [{"phoneNumber": "+48111"}]
+    }
+    await coordinator._async_update_data()
+    api.async_get_message.assert_awaited_once_with("m1")
+    assert not future.done()
+    assert coordinator.update_interval == timedelta(seconds=DEFAULT_SCAN_INTERVAL_MIN)
+
+    coordinator.async_handle_push_event("sms:delivered", {"messageId": "m1"})
+    assert await future == "Delivered"
+    events = [c.args for c in coordinator.hass.bus.async_fire.call_args_list]
+    assert [e[1]["state"] for e in events] == ["Sent", "Delivered"]
+    assert events[1][1]["previous_state"] == "Sent"
+    assert events[0][1]["recipients"] == ["+48111"]
+    assert not coordinator._tracked
+
+
+@pytest.mark.asyncio
+async def test_failover_moves_waiter_to_target_coordinator(coordinator, api):
+    """Failover: to samo id śledzone przez bramkę docelową, future rozwiązuje jej stan."""
+    coordinator.hass.loop = asyncio.get_running_loop()
+    target = SMSGateDataUpdateCoordinator(coordinator.hass, api)
+    future = coordinator.async_wait_for_final("m1")
+    coordinator.async_move_waiters("m1", target)
+    assert not coordinator._tracked and not coordinator._waiters
+    assert "m1" in target._tracked
+
+    target.async_handle_push_event("sms:delivered", {"messageId": "m1"})
+    assert await future == "Delivered"
+
+    abandoned = coordinator.async_wait_for_final("m2")
+    coordinator.async_move_waiters("m2", target)
+    abandoned.cancel()
+    await asyncio.sleep(0)
+    assert not target._waiters
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_is_dropped(coordinator):
+    """Anulowany future (limit czasu serwisu) znika z oczekujących; śledzenie zostaje."""
+    coordinator.hass.loop = asyncio.get_running_loop()
+    first = coordinator.async_wait_for_final("m1")
+    second = coordinator.async_wait_for_final("m1")
+    first.cancel()
+    await asyncio.sleep(0)
+    assert coordinator._waiters == {"m1": [second]}
+    second.cancel()
+    await asyncio.sleep(0)
+    assert not coordinator._waiters
+    assert "m1" in coordinator._tracked
+
+
+def test_watch_limit_cancels_oldest_waiter(coordinator):
+    """Po przekroczeniu limitu śledzonych najstarsza wiadomość przestaje być śledzona."""
+    loop = asyncio.new_event_loop()
+    try:
+        coordinator.hass.loop = loop
+        with patch("custom_components.sms_gate.coordinator.DELIVERY_TRACK_LIMIT", 2):
+            future = coordinator.async_wait_for_final("a")
+            coordinator.async_watch("b")
+            coordinator.async_watch("c")
+        assert future.cancelled()
+        assert list(coordinator._tracked) == ["b", "c"]
+    finally:
+        loop.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_restores_data_and_saves_changes(coordinator, api):
+    """Stan sprzed restartu odtwarzany bez żądań; zmiany danych planują zapis."""
+    with patch("custom_components.sms_gate.coordinator.Store") as store_cls:
+        store = store_cls.return_value
+        store.async_load = AsyncMock(
+            return_value={
+                "available": True,
+                "messages": [{"id": "m1", "state": "Sent", "recipients": []}],
+            }
+        )
+        assert await coordinator.async_load_snapshot("entry-1")
+    assert coordinator.data["available"] is True
+    assert coordinator.data["messages"][0]["id"] == "m1"
+    api.async_get_health.assert_not_called()
+
+    coordinator.async_update_listeners()
+    save = store.async_delay_save.call_args[0][0]
+    assert save() is coordinator.data
+
+    # Wiadomość niefinalna z zapisanego stanu odpytywana przy pierwszym odświeżeniu
+    await coordinator._async_update_data()
+    api.async_get_message.assert_awaited_once_with("m1")
+
+
+@pytest.mark.asyncio
+async def test_snapshot_missing(coordinator):
+    """Brak zapisanego stanu – False (pierwsze odświeżenie na żywo przy starcie)."""
+    with patch("custom_components.sms_gate.coordinator.Store") as store_cls:
+        store_cls.return_value.async_load = AsyncMock(return_value=None)
+        assert not await coordinator.async_load_snapshot("entry-1")
+    assert coordinator.data == {"available": False, "messages": []}
+
+
+@pytest.mark.asyncio
+async def test_old_sent_message_neither_requeried_nor_keeps_interval_short(coordinator, api):
+    """Stary "Sent" bez raportu doręczenia: bez odpytywania pojedynczo, interwał rośnie."""
+    api.async_get_messages.return_value = [
+        {
+            "id": "m1",
+            "state": "Sent",
+            "recipients": [],
+            "states": {"Pending": "2020-01-01T12:00:00+00:00"},
+        },
+        {"id": "m2", "state": "Sent", "recipients": []},
+    ]
+    await coordinator._async_update_data()
+    assert coordinator.update_interval == timedelta(seconds=120)
+
+    api.async_get_messages.return_value = []
+    await coordinator._async_update_data()
+    # Świeży m2 nadal uzgadniany, m1 (sprzed lat) – nie
+    api.async_get_message.assert_awaited_once_with("m2")
+    assert coordinator.update_interval == timedelta(seconds=240)
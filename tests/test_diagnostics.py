@@ -0,0 +1,35 @@
+"""Testy diagnostyki SMS Gate."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.sms_gate.const import DOMAIN
+from custom_components.sms_gate.diagnostics import async_get_config_entry_diagnostics
+
+
+@pytest.mark.asyncio
+async def test_diagnostics_redacts_secrets_and_phone_numbers():
+    """Bez hasła, id webhooka i numerów odbiorców; stany wiadomości zostają."""
+    coordinator = MagicMock()
+    coordinator.data = {
+        "available": True,
+        "messages": [
+            {"id": "m1", "state": "Sent", "recipients": [{"phoneNumber": "+48111", "state": "Sent"}]},
+            {"id": "m2", "state": "Pending", "recipients": ["+48222"]},
+        ],
+    }
+    hass = MagicMock()
+    hass.data = {DOMAIN: {"entry-1": {"coordinator": coordinator}}}
+    entry = MagicMock()
+    entry.entry_id = "entry-1"
+    entry.data = {"host": "192.168.1.10", "password": "secret", "webhook_id": "hook"}
+
+    diag = await async_get_config_entry_diagnostics(hass, entry)
+
+    assert diag["entry"]["password"] == diag["entry"]["webhook_id"] == "**REDACTED**"
+    assert diag["entry"]["host"] == "192.168.1.10"
+    first, second = diag["coordinator"]["messages"]
+    assert first["recipients"] == [{"phoneNumber": "**REDACTED**", "state": "Sent"}]
+    assert second["recipients"] == ["**REDACTED**"]
+    assert "+48111" in str(coordinator.data)
@@ -0,0 +1,107 @@
+"""Testy zbiorczych SMS (digest)."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from custom_components.sms_gate.const import DIGEST_PRIORITY
+from custom_components.sms_gate.digest import SMSGateDigest
+
+
+@pytest.fixture
+def timers():
+    """async_call_later zastąpione listą (opóźnienie, callback, anulowanie)."""
+    timers = []
+
+    def call_later(hass, delay, action):
+        cancel = MagicMock()
+        timers.append((delay, action, cancel))
+        return cancel
+
+    with patch("custom_components.sms_gate.digest.async_call_later", call_later):
+        yield timers
+
+
+@pytest.fixture
+def store():
+    with patch("custom_components.sms_gate.digest.Store") as store_cls:
+        store = store_cls.return_value
+        store.async_load = AsyncMock(return_value=None)
+        yield store
+
+
+@pytest.fixture
+def outbox():
+    return MagicMock()
+
+
+@pytest.fixture
+def digest(timers, store, outbox):
+    return SMSGateDigest(MagicMock(), "entry-1", outbox, lambda text: [text], 600)
+
+
+def test_accepts_by_priority_and_flag(store):
+    """Rutynowe (priorytet <= 0) do bufora; data.digest ma pierwszeństwo; 0 s = wyłączone."""
+    digest = SMSGateDigest(MagicMock(), "entry-1", MagicMock(), lambda text: [text], 600)
+    assert digest.accepts(0)
+    assert not digest.accepts(100)
+    assert digest.accepts(100, True)
+    assert not digest.accepts(0, False)
+
+    disabled = SMSGateDigest(MagicMock(), "entry-1", MagicMock(), lambda text: [text], 0)
+    assert not disabled.accepts(0, True)
+
+
+def test_buffers_per_recipient_and_flushes_on_timer(digest, timers, outbox):
+    """Osobny bufor na numer; po oknie jeden SMS z liniami, z priorytetem digest."""
+    digest.async_add(["+48111", "+48222"], "Pralka skończyła", now=0)
+    digest.async_add(["+48111"], "Zmywarka skończyła", now=60)
+    assert digest.buffered == 3
+    assert [delay for delay, _, _ in timers] == [600, 600]
+    outbox.async_enqueue.assert_not_called()
+
+    timers[0][1](None)
+    outbox.async_enqueue.assert_called_once()
+    (numbers, text), kwargs = outbox.async_enqueue.call_args
+    assert numbers == ["+48111"]
+    assert text.splitlines()[0].endswith(" Pralka skończyła")
+    assert text.splitlines()[1].endswith(" Zmywarka skończyła")
+    assert kwargs == {"priority": DIGEST_PRIORITY}
+    assert digest.buffered == 1
+    assert digest.stats() == {"buffered": 1, "merged": 3, "flushed": 1}
+
+
+def test_flushes_early_when_segment_budget_exceeded(digest, timers, outbox):
+    """Linia przekraczająca limit segmentów wysyła bieżący bufor i otwiera nowy."""
+    with patch("custom_components.sms_gate.digest.DIGEST_MAX_SEGMENTS", 1):
+        digest.async_add(["+48111"], "a" * 100, now=0)
+        digest.async_add(["+48111"], "b" * 100, now=0)
+    outbox.async_enqueue.assert_called_once()
+    assert "a" * 100 in outbox.async_enqueue.call_args.args[1]
+    timers[0][2].assert_called_once()
+    assert len(timers) == 2
+    assert digest.buffered == 1
+
+
+def test_flush_all_cancels_timers(digest, timers, outbox):
+    """Unload: wszystkie bufory od razu do kolejki, timery anulowane."""
+    digest.async_add(["+48111", "+48222"], "Rutyna", now=0)
+    digest.async_flush_all()
+    assert outbox.async_enqueue.call_count == 2
+    assert all(cancel.called for _, _, cancel in timers)
+    assert digest.buffered == 0
+
+
+@pytest.mark.asyncio
+async def test_buffers_persist_and_resume_window_after_restart(digest, timers, store):
+    """Bufory w Store; po restarcie okno liczone dalej od pierwszej wiadomości."""
+    digest.async_add(["+48111"], "Pralka skończyła", now=1000)
+    saved = store.async_delay_save.call_args.args[0]()
+    assert saved == {"+48111": {"lines": digest._buffers["+48111"], "started": 1000}}
+
+    store.async_load.return_value = saved
+    restored = SMSGateDigest(MagicMock(), "entry-1", MagicMock(), lambda text: [text], 600)
+    with patch("custom_components.sms_gate.digest.time.time", return_value=1400):
+        await restored.async_load()
+    assert restored.buffered == 1
+    assert timers[-1][0] == 200
@@ -0,0 +1,74 @@
+"""Testy metryk żądań i eksportu Prometheus."""
+
+import aiohttp
+import pytest
+
+from custom_components.sms_gate.metrics import (
+    OP_HEALTH,
+    OP_SEND,
+    SMSGateMetrics,
+    render_prometheus,
+)
+
+
+class _Context:
+    """Minimalny kontekst żądania aiohttp."""
+
+    def __init__(self, status=None, exc=None):
+        self.status = status
+        self._exc = exc
+
+    async def __aenter__(self):
+        if self._exc:
+            raise self._exc
+        return self
+
+    async def __aexit__(self, *args):
+        return None
+
+
+@pytest.mark.asyncio
+async def test_tracker_records_latency_status_and_errors():
+    """Tracker zlicza czas, status, timeouty i błędy połączenia."""
+    metrics = SMSGateMetrics()
+    async with metrics.tracker(OP_SEND).bind(_Context(202)):
+        pass
+    for exc in (TimeoutError(), aiohttp.ClientError("down")):
+        with pytest.raises(type(exc)):
+            async with metrics.tracker(OP_SEND).bind(_Context(exc=exc)):
+                pass
+    stats = metrics.operations[OP_SEND]
+    assert stats.count == 3
+    assert sum(stats.buckets) == 3
+    assert stats.statuses == {202: 1}
+    assert (stats.timeouts, stats.errors) == (1, 1)
+    assert metrics.failures == 2
+
+
+def test_quantile_uses_bucket_bounds():
+    """Kwantyl to górna granica przedziału histogramu."""
+    metrics = SMSGateMetrics()
+    stats = metrics.operations[OP_HEALTH]
+    assert stats.quantile(0.5) is None
+    for elapsed in (0.01, 0.02, 0.2, 3.0):
+        stats.observe(elapsed)
+    assert stats.quantile(0.5) == 0.05
+    assert stats.quantile(0.95) == 5.0
+
+
+def test_render_prometheus():
+    """Eksport zawiera histogram (kumulatywny), liczniki i wartości dodatkowe."""
+    metrics = SMSGateMetrics()
+    stats = metrics.operations[OP_SEND]
+    stats.observe(0.07)
+    stats.observe(100.0)
+    stats.statuses[202] = 2
+    metrics.fallback(OP_SEND)
+    text = render_prometheus([("e1", metrics, {"queue_depth": 3})])
+    assert "# TYPE sms_gate_request_duration_seconds histogram" in text
+    assert 'sms_gate_request_duration_seconds_bucket{gateway="e1",operation="send",le="0.1"} 1' in text
+    assert 'sms_gate_request_duration_seconds_bucket{gateway="e1",operation="send",le="+Inf"} 2' in text
+    assert 'sms_gate_requests_total{gateway="e1",operation="send",status="202"} 2' in text
+    assert 'sms_gate_path_fallbacks_total{gateway="e1",operation="send"} 1' in text
+    assert 'sms_gate_queue_depth{gateway="e1"} 3' in text
+    assert text.endswith("\n")
@@ -80,3 +80,65 @@ async def test_resolve_template_key_uses_template_string():
             hass, entry, "Fire!", [], "alarm", {}
         )
     assert text == rendered
+
+
+@pytest.mark.asyncio
+async def test_resolve_template_uses_cache():
+    """Z cache szablon jest tworzony raz i ponownie używany przy kolejnych wysyłkach."""
+    from custom_components.sms_gate.template_cache import SMSGateTemplateCache
+
+    entry = MagicMock()
+    entry.options = {"recipients": {}, "templates": {"alarm": "Alarm: {{ message }}"}}
+    hass = MagicMock()
+    tpl_instance = MagicMock()
+    tpl_instance.async_render = MagicMock(return_value="Alarm: Fire!")
+    with patch(
+        "custom_components.sms_gate.template_cache.Template", return_value=tpl_instance
+    ) as tpl_cls:
+        cache = SMSGateTemplateCache(hass)
+        for _ in range(3):
+            _, text = await resolve_recipients_and_message(
+                hass, entry, "Fire!", [], "alarm", {}, cache
+            )
+        assert text == "Alarm: Fire!"
+        assert tpl_cls.call_count == 1
+        assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+        # Zmiana treści szablonu w opcjach – nowy obiekt, stara wersja usunięta
+        entry.options["templates"]["alarm"] = "ALARM {{ message }}"
+        await resolve_recipients_and_message(hass, entry, "Fire!", [], "alarm", {}, cache)
+        assert tpl_cls.call_count == 2
+        assert cache.stats()["size"] == 1
+
+        cache.invalidate()
+        assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_notify_enqueues_via_shared_path_and_raises_when_rejected():
+    """Notify: kolejka wpisu po polityce segmentów; odrzucona treść – HomeAssistantError."""
+    from homeassistant.exceptions import HomeAssistantError
+
+    from custom_components.sms_gate.const import SEGMENT_POLICY_REJECT
+    from custom_components.sms_gate.notify import SMSGateNotifyEntity
+    from custom_components.sms_gate.recipients import RecipientIndex
+    from custom_components.sms_gate.segments import SegmentPolicy
+
+    entry = MagicMock()
+    entry.options = {"recipients": {}, "templates": {}}
+    data = {
+        "digest": MagicMock(accepts=MagicMock(return_value=False)),
+        "outbox": MagicMock(),
+        "recipient_index": RecipientIndex({}),
+        "segment_policy": SegmentPolicy(max_segments=1, policy=SEGMENT_POLICY_REJECT),
+        "template_cache": None,
+    }
+    entity = SMSGateNotifyEntity(entry, data)
+    entity.hass = MagicMock()
+
+    await entity.async_send_message("Alarm", data={"recipients": "+48111", "priority": 5})
+    data["outbox"].async_enqueue.assert_called_once_with(
+        ["+48111"], "Alarm", priority=5, sim_number=None
+    )
+    with pytest.raises(HomeAssistantError):
+        await entity.async_send_message("a" * 200, data={"recipients": "+48111"})
@@ -0,0 +1,238 @@
+"""Testy kolejki wychodzących SMS (outbox)."""
+
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from custom_components.sms_gate.breaker import CircuitBreaker
+from custom_components.sms_gate.const import OUTBOX_MAX_ATTEMPTS
+from custom_components.sms_gate.dedup import MessageDeduplicator
+from custom_components.sms_gate.outbox import SMSGateOutbox
+from custom_components.sms_gate.sim import SimScheduler
+
+
+@pytest.fixture
+def store():
+    with patch("custom_components.sms_gate.outbox.Store") as store_cls:
+        store = store_cls.return_value
+        store.async_load = AsyncMock(return_value=None)
+        store.async_save = AsyncMock()
+        yield store
+
+
+@pytest.fixture
+def api():
+    api = MagicMock()
+    api.breaker = CircuitBreaker()
+    api.async_send_sms = AsyncMock(return_value=(True, "msg-1"))
+    return api
+
+
+@pytest.fixture
+def outbox(store, api):
+    return SMSGateOutbox(MagicMock(), "entry-1", api)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_returns_immediately_and_persists(outbox, store, api):
+    """async_enqueue dodaje do kolejki i planuje zapis bez wysyłki."""
+    listener = MagicMock()
+    outbox.async_add_listener(listener)
+    item_id = outbox.async_enqueue(["+48111"], "Hi", priority=100)
+    assert item_id
+    assert outbox.depth == 1
+    assert outbox.oldest_age() is not None
+    assert store.async_delay_save.called
+    listener.assert_called_once()
+    api.async_send_sms.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_success_removes_item(outbox, api):
+    """Udana wysyłka usuwa wiadomość z kolejki."""
+    outbox.async_enqueue(["+48111"], "Hi")
+    item, _ = outbox._take_next(time.time())
+    await outbox._semaphore.acquire()
+    await outbox._async_dispatch(item)
+    assert outbox.depth == 0
+    assert api.async_send_sms.call_args[0] == (["+48111"], "Hi")
+    assert 0 < api.async_send_sms.call_args[1]["ttl"] <= 3600
+
+
+@pytest.mark.asyncio
+async def test_dispatch_failure_requeues_then_drops(outbox, api):
+    """Błąd wysyłki: ponowna próba później, po OUTBOX_MAX_ATTEMPTS porzucenie."""
+    api.async_send_sms.return_value = (False, "timeout")
+    outbox.async_enqueue(["+48111"], "Hi")
+    item, _ = outbox._take_next(time.time())
+    for attempt in range(1, OUTBOX_MAX_ATTEMPTS):
+        await outbox._semaphore.acquire()
+        await outbox._async_dispatch(item)
+        assert outbox.depth == 1
+        assert item["attempts"] == attempt
+        assert item["not_before"] > 0
+    await outbox._semaphore.acquire()
+    await outbox._async_dispatch(item)
+    assert outbox.depth == 0
+
+
+@pytest.mark.asyncio
+async def test_breaker_open_holds_queue_without_attempts(outbox, api):
+    """Otwarty wyłącznik: wiadomość czeka w kolejce, próba nie jest liczona."""
+    api.async_send_sms.return_value = (False, "circuit open")
+    outbox.async_enqueue(["+48111"], "Hi")
+    item, _ = outbox._take_next(time.time())
+    await outbox._semaphore.acquire()
+    await outbox._async_dispatch(item)
+    assert outbox.depth == 1
+    assert item["attempts"] == 0
+
+    api.breaker.record_failure()
+    api.breaker.record_failure()
+    api.breaker.record_failure()
+    item["not_before"] = 0.0
+    taken, wait = outbox._take_next(time.time())
+    assert taken is None
+    assert 0 < wait <= 30
+
+
+@pytest.mark.asyncio
+async def test_load_restores_queue(outbox, store):
+    """Kolejka zapisana przed restartem jest wczytywana."""
+    store.async_load.return_value = [
+        {"id": "a", "phone_numbers": ["+48111"], "text": "x", "priority": 100,
+         "ttl": 3600, "sim_number": None, "created": 0.0, "attempts": 0, "not_before": 0.0},
+        {"broken": True},
+    ]
+    await outbox.async_load()
+    assert outbox.depth == 1
+
+
+@pytest.mark.asyncio
+async def test_take_next_orders_by_priority(outbox):
+    """Wyższy priorytet wychodzi pierwszy, przy równym – starsza wiadomość."""
+    outbox.async_enqueue(["+48111"], "routine", priority=0)
+    outbox.async_enqueue(["+48222"], "alarm", priority=100)
+    outbox.async_enqueue(["+48333"], "routine 2", priority=0)
+    order = []
+    for _ in range(3):
+        item, _ = outbox._take_next(time.time())
+        outbox._in_flight.add(item["id"])
+        order.append(item["text"])
+    assert order == ["alarm", "routine", "routine 2"]
+
+
+@pytest.mark.asyncio
+async def test_take_next_drops_expired(outbox):
+    """Wiadomość czekająca dłużej niż ttl jest porzucana przed wysyłką."""
+    outbox.async_enqueue(["+48111"], "stale", ttl=60)
+    outbox._items[0]["created"] -= 120
+    item, wait = outbox._take_next(time.time())
+    assert item is None and wait is None
+    assert outbox.depth == 0
+
+
+@pytest.mark.asyncio
+async def test_take_next_respects_rate_limits(store, api):
+    """Limit bramki wstrzymuje kolejkę; limit per odbiorca przepuszcza innych."""
+    outbox = SMSGateOutbox(MagicMock(), "e", api, rate_limit=2, recipient_rate_limit=1)
+    outbox.async_enqueue(["+48111"], "a1")
+    outbox.async_enqueue(["+48111"], "a2")
+    outbox.async_enqueue(["+48222"], "b1")
+    outbox.async_enqueue(["+48333"], "c1")
+    first, _ = outbox._take_next(time.time())
+    outbox._in_flight.add(first["id"])
+    second, _ = outbox._take_next(time.time())
+    outbox._in_flight.add(second["id"])
+    assert (first["text"], second["text"]) == ("a1", "b1")
+    item, wait = outbox._take_next(time.time())
+    assert item is None
+    assert wait > 0
+
+
+@pytest.mark.asyncio
+async def test_dispatch_failure_hands_over_to_failover(store, api):
+    """Przy błędzie wysyłki callback failover przejmuje wiadomość."""
+    api.async_send_sms.return_value = (False, "down")
+    failover = MagicMock(return_value=True)
+    outbox = SMSGateOutbox(MagicMock(), "e", api, failover=failover)
+    outbox.async_enqueue(["+48111"], "Hi")
+    item, _ = outbox._take_next(time.time())
+    await outbox._semaphore.acquire()
+    await outbox._async_dispatch(item)
+    failover.assert_called_once_with(item)
+    assert outbox.depth == 0
+
+
+@pytest.mark.asyncio
+async def test_duplicates_in_window_collapse_into_queued_original(store, api):
+    """Powtórzenia w oknie: jeden SMS w kolejce z dopiskiem (xN), licznik stłumionych."""
+    outbox = SMSGateOutbox(MagicMock(), "entry-1", api, dedup=MessageDeduplicator(60))
+    first = outbox.async_enqueue(["+48111", "+48222"], "Alarm")
+    assert outbox.async_enqueue(["+48222", "+48111"], "Alarm") == first
+    assert outbox.async_enqueue(["+48111", "+48222"], "Alarm") == first
+    assert outbox.async_enqueue(["+48111"], "Alarm") != first
+    assert outbox.depth == 2
+    assert outbox.suppressed == 2
+    assert outbox._items[0]["text"] == "Alarm (x3)"
+
+    # Oryginał w trakcie wysyłki – bez zmiany treści
+    item, _ = outbox._take_next(time.time())
+    outbox._in_flight.add(item["id"])
+    outbox.async_enqueue(["+48111", "+48222"], "Alarm")
+    assert item["text"] == "Alarm (x3)"
+    assert outbox.suppressed == 3
+
+
+@pytest.mark.asyncio
+async def test_duplicate_suffix_respects_segment_limit(store, api):
+    """Dopisek (xN) pomijany, gdy treść dopasowana do limitu segmentów by go przekroczyła."""
+    outbox = SMSGateOutbox(
+        MagicMock(), "entry-1", api, dedup=MessageDeduplicator(60), max_segments=1
+    )
+    text = "a" * 160
+    first = outbox.async_enqueue(["+48111"], text)
+    assert outbox.async_enqueue(["+48111"], text) == first
+    assert outbox._items[0]["text"] == text
+    assert outbox.suppressed == 1
+
+    outbox.async_enqueue(["+48222"], "Alarm")
+    outbox.async_enqueue(["+48222"], "Alarm")
+    assert outbox._items[1]["text"] == "Alarm (x2)"
+
+
+@pytest.mark.asyncio
+async def test_duplicate_after_window_is_sent(store, api):
+    """Po upływie okna ta sama treść jest nową wiadomością."""
+    outbox = SMSGateOutbox(MagicMock(), "entry-1", api, dedup=MessageDeduplicator(60))
+    first = outbox.async_enqueue(["+48111"], "Alarm")
+    with patch("custom_components.sms_gate.outbox.time.time", return_value=time.time() + 61):
+        assert outbox.async_enqueue(["+48111"], "Alarm") != first
+    assert outbox.suppressed == 0
+
+
+@pytest.mark.asyncio
+async def test_sim_scheduler_spreads_queue_across_sims(store, api):
+    """Karty po kolei; karta z wyczerpanym limitem nie blokuje wysyłki z innej karty."""
+    sims = SimScheduler(2, rate_limit=1, prefixes={"2": "+4860"})
+    outbox = SMSGateOutbox(MagicMock(), "e", api, sims=sims)
+    outbox.async_enqueue(["+48111"], "a")
+    outbox.async_enqueue(["+48600"], "b")
+    outbox.async_enqueue(["+48222"], "c")
+    first, _ = outbox._take_next(time.time())
+    outbox._in_flight.add(first["id"])
+    await outbox._semaphore.acquire()
+    await outbox._async_dispatch(first)
+    assert api.async_send_sms.call_args.kwargs["sim_number"] == 1
+
+    # "+48600" – karta 2 z prefiksu; "c" czeka na limit obu kart
+    second, _ = outbox._take_next(time.time())
+    assert second["text"] == "b"
+    outbox._in_flight.add(second["id"])
+    item, wait = outbox._take_next(time.time())
+    assert item is None and wait > 0
+    await outbox._semaphore.acquire()
+    await outbox._async_dispatch(second)
+    assert api.async_send_sms.call_args.kwargs["sim_number"] == 2
+    assert sims.sent == {1: 1, 2: 1}
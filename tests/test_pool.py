@@ -0,0 +1,62 @@
+"""Testy puli bramek (wybór bramki i failover)."""
+
+from unittest.mock import MagicMock
+
+from custom_components.sms_gate.const import DOMAIN
+from custom_components.sms_gate.pool import async_failover, async_select_gateway
+
+
+def _gateway(available=True, depth=0, latency=None, pool=True):
+    coordinator = MagicMock()
+    coordinator.data = {"available": available, "messages": []}
+    api = MagicMock()
+    api.send_latency = latency
+    outbox = MagicMock()
+    outbox.depth = depth
+    return {"coordinator": coordinator, "api": api, "outbox": outbox, "pool": pool}
+
+
+def _hass(**gateways):
+    hass = MagicMock()
+    hass.data = {DOMAIN: gateways}
+    return hass
+
+
+def test_select_prefers_available_short_queue_then_latency():
+    """Wybierana dostępna bramka z najkrótszą kolejką, przy remisie – najszybsza."""
+    hass = _hass(
+        a=_gateway(depth=3, latency=0.1),
+        b=_gateway(depth=1, latency=0.9),
+        c=_gateway(depth=1, latency=0.2),
+        d=_gateway(available=False, depth=0),
+        e=_gateway(depth=0, pool=False),
+    )
+    assert async_select_gateway(hass) == "c"
+
+
+def test_select_without_pool_members_returns_none():
+    """Bez bramek w puli – None (fallback na pierwszy wpis w serwisie)."""
+    hass = _hass(a=_gateway(pool=False))
+    assert async_select_gateway(hass) is None
+
+
+def test_failover_moves_item_to_other_healthy_gateway():
+    """Nieudana wiadomość trafia do innej dostępnej bramki; drugi raz nie wraca."""
+    hass = _hass(a=_gateway(), b=_gateway(), c=_gateway(available=False))
+    item = {"id": "x", "attempts": 1}
+    assert async_failover(hass, "a", item) is True
+    hass.data[DOMAIN]["b"]["outbox"].async_adopt.assert_called_once_with(item)
+    hass.data[DOMAIN]["a"]["coordinator"].async_move_waiters.assert_called_once_with(
+        "x", hass.data[DOMAIN]["b"]["coordinator"]
+    )
+    assert item["tried"] == ["a"]
+    # b też zawodzi – a już próbowana, c niedostępna
+    assert async_failover(hass, "b", item) is False
+
+
+def test_failover_from_unloading_gateway_keeps_item():
+    """Bramka już usunięta z hass.data (unload) – bez przejęcia, wiadomość zostaje u nadawcy."""
+    hass = _hass(b=_gateway())
+    item = {"id": "x", "attempts": 1}
+    assert async_failover(hass, "a", item) is False
+    hass.data[DOMAIN]["b"]["outbox"].async_adopt.assert_not_called()
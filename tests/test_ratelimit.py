@@ -0,0 +1,36 @@
+"""Testy kubełków tokenów (limit tempa wysyłki)."""
+
+from unittest.mock import patch
+
+from custom_components.sms_gate.ratelimit import RecipientBuckets, TokenBucket
+
+
+def test_token_bucket_refills_over_time():
+    """Po wyczerpaniu tokenów wait_time > 0, po upływie czasu token wraca."""
+    with patch("custom_components.sms_gate.ratelimit.time.monotonic", return_value=0.0):
+        bucket = TokenBucket(60)
+        bucket.consume(60)
+        assert bucket.wait_time() == 1.0
+    with patch("custom_components.sms_gate.ratelimit.time.monotonic", return_value=1.0):
+        assert bucket.wait_time() == 0.0
+
+
+def test_token_bucket_zero_means_unlimited():
+    """Limit 0 – bez ograniczeń."""
+    bucket = TokenBucket(0)
+    bucket.consume(1000)
+    assert bucket.wait_time(1000) == 0.0
+
+
+def test_token_bucket_large_message_not_starved():
+    """Wiadomość do większej liczby odbiorców niż pojemność przechodzi przy pełnym kubełku."""
+    bucket = TokenBucket(5)
+    assert bucket.wait_time(50) == 0.0
+
+
+def test_recipient_buckets_are_independent():
+    """Limit per odbiorca nie blokuje innych numerów."""
+    buckets = RecipientBuckets(1)
+    buckets.consume(["+48111"])
+    assert buckets.wait_time(["+48111"]) > 0
+    assert buckets.wait_time(["+48222"]) == 0.0
@@ -0,0 +1,37 @@
+"""Testy indeksu odbiorców (normalizacja, aliasy, grupy, deduplikacja)."""
+
+from custom_components.sms_gate.recipients import RecipientIndex, normalize_number
+
+
+def test_normalize_number():
+    """Spacje, myślniki i nawiasy usuwane; prefiks 00 zamieniany na +."""
+    assert normalize_number("+48 123-456-789") == "+48123456789"
+    assert normalize_number("0048 (12) 345 67 89") == "+48123456789"
+    assert normalize_number("+48111") == "+48111"
+
+
+def test_groups_and_aliases_expand_and_dedupe():
+    """Grupy rozwijane do numerów; numer z kilku grup występuje raz."""
+    index = RecipientIndex(
+        {
+            "mom": "+48 111 111 111",
+            "dad": "+48222222222",
+            "mama": "mom",
+            "family": "mom, dad, +48333333333",
+            "all": "family; mama, 0048 111 111 111",
+        }
+    )
+    assert index.resolve(["mama"]) == ["+48111111111"]
+    assert index.resolve(["all"]) == ["+48111111111", "+48222222222", "+48333333333"]
+    assert index.resolve(["family", "dad", "+48 333 333 333"]) == [
+        "+48111111111",
+        "+48222222222",
+        "+48333333333",
+    ]
+
+
+def test_cyclic_group_does_not_loop():
+    """Cykl w definicji grup nie zawiesza budowy indeksu."""
+    index = RecipientIndex({"a": "b, +48111", "b": "a, +48222"})
+    assert set(index.resolve(["a"])) <= {"+48111", "+48222"}
+    assert "+48111" in index.resolve(["a"])
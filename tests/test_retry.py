@@ -0,0 +1,30 @@
+"""Testy polityki ponowień i budżetu."""
+
+from custom_components.sms_gate.retry import RetryBudget, RetryPolicy
+
+
+def test_delay_is_bounded_exponential():
+    """Opóźnienie losowe z przedziału 0..min(max, base * 2^(n-1))."""
+    policy = RetryPolicy(retries=5, base_delay=1.0, max_delay=4.0)
+    for attempt, bound in ((1, 1.0), (2, 2.0), (3, 4.0), (5, 4.0)):
+        assert all(0 <= policy.delay(attempt) <= bound for _ in range(50))
+
+
+def test_should_retry_respects_limit():
+    """Ponowienie tylko do limitu prób."""
+    policy = RetryPolicy(retries=2)
+    assert policy.should_retry(1)
+    assert policy.should_retry(2)
+    assert not policy.should_retry(3)
+    assert not RetryPolicy(retries=0).should_retry(1)
+
+
+def test_budget_exhausts_and_refills_on_success():
+    """Budżet: ponowienia zużywają tokeny, sukcesy je uzupełniają."""
+    budget = RetryBudget(ratio=0.5, capacity=2)
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.on_success()
+    budget.on_success()
+    assert budget.try_spend()
@@ -0,0 +1,83 @@
+"""Testy tablicy routingu serwisów SMS Gate."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from custom_components.sms_gate.const import DATA_ROUTER
+from custom_components.sms_gate.routing import async_register_entry, async_unregister_entry
+
+
+@pytest.fixture
+def registries():
+    entities = {
+        "notify.sms_gate": SimpleNamespace(entity_id="notify.sms_gate", config_entry_id="e1")
+    }
+    devices = {"dev1": SimpleNamespace(id="dev1", config_entries={"other", "e1"})}
+    with (
+        patch("custom_components.sms_gate.routing.er") as er,
+        patch("custom_components.sms_gate.routing.dr") as dr,
+    ):
+        er.async_entries_for_config_entry.side_effect = lambda _, entry_id: [
+            e for e in entities.values() if e.config_entry_id == entry_id
+        ]
+        dr.async_entries_for_config_entry.side_effect = lambda _, entry_id: [
+            d for d in devices.values() if entry_id in d.config_entries
+        ]
+        er.async_get.return_value.async_get.side_effect = entities.get
+        dr.async_get.return_value.async_get.side_effect = devices.get
+        yield entities, devices
+
+
+@pytest.fixture
+def hass():
+    hass = MagicMock()
+    hass.data = {}
+    return hass
+
+
+def test_register_indexes_entities_and_devices(hass, registries):
+    """Setup wpisu indeksuje jego encje i urządzenia; ostatni unload usuwa tablicę."""
+    router = async_register_entry(hass, "e1")
+    assert hass.data[DATA_ROUTER] is router
+    assert router.entry_for_entity("notify.sms_gate") == "e1"
+    assert router.entry_for_device("dev1") == "e1"
+    assert router.entry_for_entity("notify.other") is None
+
+    async_unregister_entry(hass, "e1")
+    assert DATA_ROUTER not in hass.data
+    assert router.entry_for_entity("notify.sms_gate") is None
+
+
+def test_registry_events_update_index(hass, registries):
+    """Zdarzenia rejestrów: nowa encja, zmiana entity_id, usunięcie urządzenia."""
+    entities, _ = registries
+    router = async_register_entry(hass, "e1")
+
+    entities["notify.sms_gate_2"] = SimpleNamespace(
+        entity_id="notify.sms_gate_2", config_entry_id="e1"
+    )
+    router._async_entity_registry_updated(
+        SimpleNamespace(data={"action": "create", "entity_id": "notify.sms_gate_2"})
+    )
+    assert router.entry_for_entity("notify.sms_gate_2") == "e1"
+
+    entities["notify.bramka"] = entities.pop("notify.sms_gate")
+    router._async_entity_registry_updated(
+        SimpleNamespace(
+            data={
+                "action": "update",
+                "entity_id": "notify.bramka",
+                "old_entity_id": "notify.sms_gate",
+                "changes": {},
+            }
+        )
+    )
+    assert router.entry_for_entity("notify.sms_gate") is None
+    assert router.entry_for_entity("notify.bramka") == "e1"
+
+    router._async_device_registry_updated(
+        SimpleNamespace(data={"action": "remove", "device_id": "dev1"})
+    )
+    assert router.entry_for_device("dev1") is None
@@ -0,0 +1,94 @@
+"""Testy kodowania i segmentów SMS."""
+
+from custom_components.sms_gate.const import (
+    CONF_MAX_SEGMENTS,
+    CONF_SEGMENT_POLICY,
+    CONF_TRANSLITERATE,
+    SEGMENT_POLICY_REJECT,
+    SEGMENT_POLICY_SPLIT,
+    SEGMENT_POLICY_TRUNCATE,
+)
+from custom_components.sms_gate.segments import (
+    ENCODING_GSM7,
+    ENCODING_UCS2,
+    SegmentPolicy,
+    segment_info,
+    transliterate,
+)
+
+
+def test_gsm7_single_and_multipart():
+    """GSM-7: 160 znaków w jednym SMS, potem 153 na segment."""
+    info = segment_info("a" * 160)
+    assert (info.encoding, info.segments) == (ENCODING_GSM7, 1)
+    assert segment_info("a" * 161).segments == 2
+    assert segment_info("a" * 306).segments == 2
+    assert segment_info("a" * 307).segments == 3
+
+
+def test_extended_characters_count_double():
+    """Znaki z tablicy rozszerzeń (€) zajmują dwa septety."""
+    info = segment_info("€" * 80)
+    assert (info.encoding, info.units, info.segments) == (ENCODING_GSM7, 160, 1)
+    assert segment_info("€" * 81).segments == 2
+
+
+def test_polish_diacritics_switch_to_ucs2():
+    """Jeden polski znak przełącza wiadomość na UCS-2 (70 / 67 znaków)."""
+    info = segment_info("ą" + "a" * 69)
+    assert (info.encoding, info.segments) == (ENCODING_UCS2, 1)
+    assert segment_info("ą" + "a" * 70).segments == 2
+
+
+def test_transliterate_polish_to_gsm7():
+    """Transliteracja daje treść w GSM-7."""
+    text = transliterate("Zażółć gęślą jaźń – „alarm”…")
+    assert text == 'Zazolc gesla jazn - "alarm"...'
+    assert segment_info(text).encoding == ENCODING_GSM7
+
+
+def test_transliterate_keeps_unmappable_characters():
+    """Znaki bez odpowiednika (emoji) zostają; litery z akcentem tracą akcent."""
+    assert transliterate("č 🙂") == "c 🙂"
+
+
+def test_policy_without_limit_returns_text():
+    """Bez limitu treść przechodzi bez zmian (poza transliteracją)."""
+    assert SegmentPolicy().prepare("ą" * 500) == ["ą" * 500]
+    assert SegmentPolicy(transliterate=True).prepare("łąka") == ["laka"]
+
+
+def test_policy_truncate():
+    """truncate: obcięcie do limitu segmentów."""
+    policy = SegmentPolicy(max_segments=1, policy=SEGMENT_POLICY_TRUNCATE)
+    (text,) = policy.prepare("a" * 200)
+    assert text == "a" * 160
+
+
+def test_policy_split_on_spaces():
+    """split: kilka SMS, każdy w limicie, podział na spacjach."""
+    policy = SegmentPolicy(max_segments=1, policy=SEGMENT_POLICY_SPLIT)
+    words = " ".join(["słowo"] * 40)
+    parts = policy.prepare(words)
+    assert len(parts) > 1
+    assert all(segment_info(p).segments == 1 for p in parts)
+    assert " ".join(parts) == words
+
+
+def test_policy_reject():
+    """reject: wiadomość ponad limit jest odrzucana."""
+    policy = SegmentPolicy(max_segments=2, policy=SEGMENT_POLICY_REJECT)
+    assert policy.prepare("a" * 306) == ["a" * 306]
+    assert policy.prepare("a" * 307) == []
+
+
+def test_policy_from_options():
+    """Polityka budowana z opcji wpisu."""
+    policy = SegmentPolicy.from_options(
+        {CONF_TRANSLITERATE: True, CONF_MAX_SEGMENTS: 3, CONF_SEGMENT_POLICY: SEGMENT_POLICY_REJECT}
+    )
+    assert (policy.transliterate, policy.max_segments, policy.policy) == (
+        True,
+        3,
+        SEGMENT_POLICY_REJECT,
+    )
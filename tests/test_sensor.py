@@ -1,5 +1,6 @@
 """Testy sensorów SMS Gate."""
 
+from datetime import timedelta
 from unittest.mock import MagicMock
 
 import pytest
@@ -46,6 +47,8 @@ def test_status_sensor_value():
     assert sensor.native_value == "available"
     coordinator.data["available"] = False
     assert sensor.native_value == "unavailable"
+    coordinator.update_interval = timedelta(seconds=20)
+    assert sensor.extra_state_attributes == {"update_interval": 20}
 
 
 def test_messages_sensor_value_and_attributes():
@@ -69,3 +72,25 @@ def test_messages_sensor_value_and_attributes():
     assert len(attrs["messages"]) == 1
     assert attrs["messages"][0]["id"] == "m1"
     assert attrs["messages"][0]["state"] == "Sent"
+
+
+def test_messages_sensor_attributes_cached_and_unrecorded():
+    """Atrybuty budowane ponownie tylko przy zmianie wiadomości; lista poza recorderem."""
+    coordinator = MagicMock(spec=SMSGateDataUpdateCoordinator)
+    entry = MagicMock()
+    entry.entry_id = "entry-1"
+    entry.title = "SMS Gate"
+    from custom_components.sms_gate.sensor import SENSOR_MESSAGES
+    sensor = SMSGateMessagesSensor(entry, coordinator, SENSOR_MESSAGES)
+    sensor.coordinator = coordinator
+    m1 = {"id": "m1", "state": "Sent", "recipients": []}
+    m2 = {"id": "m2", "state": "Sent", "recipients": []}
+    coordinator.data = {"available": True, "messages": [m1, m2]}
+    attrs = sensor.extra_state_attributes
+    assert attrs["states"] == {"Sent": 2}
+    # Nowy snapshot z tymi samymi wiadomościami – bez przebudowy
+    coordinator.data = {"available": True, "messages": [m1, m2]}
+    assert sensor.extra_state_attributes is attrs
+    coordinator.data = {"available": True, "messages": [{**m1, "state": "Delivered"}, m2]}
+    assert sensor.extra_state_attributes["states"] == {"Delivered": 1, "Sent": 1}
+    assert "messages" in SMSGateMessagesSensor._unrecorded_attributes
@@ -0,0 +1,54 @@
+"""Testy harmonogramu kart SIM."""
+
+from custom_components.sms_gate.const import CONF_SIM_COUNT, CONF_SIM_PREFIXES, SIM_MODE_LRU
+from custom_components.sms_gate.sim import SimScheduler
+
+
+def test_from_options_disabled_for_single_sim():
+    """Jedna karta – bez harmonogramu (telefon używa karty domyślnej)."""
+    assert SimScheduler.from_options({}) is None
+    assert SimScheduler.from_options({CONF_SIM_COUNT: 1}) is None
+    sims = SimScheduler.from_options({CONF_SIM_COUNT: 2, CONF_SIM_PREFIXES: {"2": "0048 60"}})
+    assert sims.sims == [1, 2]
+    assert sims.preferred(["+48601"]) == 2
+
+
+def test_round_robin_and_lru():
+    """round_robin – po kolei; lru – najdawniej używana karta."""
+    sims = SimScheduler(3)
+    picked = []
+    for _ in range(4):
+        sim, _ = sims.select(["+48111"], 1)
+        sims.consume(sim, 1)
+        picked.append(sim)
+    assert picked == [1, 2, 3, 1]
+
+    lru = SimScheduler(3, mode=SIM_MODE_LRU)
+    for sim in (2, 1, 3, 2):
+        lru.consume(sim, 1)
+    assert lru.select(["+48111"], 1) == (1, 0.0)
+    assert lru.sent == {1: 1, 2: 2, 3: 1}
+
+
+def test_prefix_policy_longest_match_and_mixed_recipients():
+    """Najdłuższy prefiks wygrywa; odbiorcy w różnych sieciach – zwykły wybór."""
+    sims = SimScheduler(2, prefixes={"1": "+48", "2": "+4860, +4869", "7": "+1"})
+    assert sims.preferred(["+48601", "+48699"]) == 2
+    assert sims.preferred(["+48501"]) == 1
+    assert sims.preferred(["+48601", "+48501"]) is None
+    assert sims.preferred(["+1555"]) is None
+
+
+def test_rate_limit_per_sim():
+    """Limit karty: pomijana w wyborze; wiadomość z prefiksem lub jawną kartą czeka."""
+    sims = SimScheduler(2, rate_limit=1, prefixes={"1": "+4850"})
+    sims.consume(1, 1)
+    assert sims.select(["+48111"], 1) == (2, 0.0)
+    sim, wait = sims.select(["+48501"], 1)
+    assert sim is None and wait > 0
+    sim, wait = sims.select(["+48111"], 1, sim=1)
+    assert sim is None and wait > 0
+
+    sims.consume(2, 1)
+    sim, wait = sims.select(["+48111"], 1)
+    assert sim is None and wait > 0
@@ -0,0 +1,43 @@
+"""Testy współdzielonego transportu HTTP (pula połączeń)."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.sms_gate.const import DATA_TRANSPORT
+from custom_components.sms_gate.transport import (
+    async_acquire_transport,
+    async_release_transport,
+)
+
+
+@pytest.mark.asyncio
+async def test_transport_shared_and_closed_on_last_release():
+    """Kolejne wpisy dostają tę samą sesję; zamknięcie dopiero po ostatnim zwolnieniu."""
+    hass = MagicMock()
+    hass.data = {}
+    first = await async_acquire_transport(hass)
+    second = await async_acquire_transport(hass)
+    assert first is second
+    assert first.users == 2
+
+    await async_release_transport(hass)
+    assert not first.closed
+    assert hass.data[DATA_TRANSPORT] is first
+
+    await async_release_transport(hass)
+    assert first.closed
+    assert DATA_TRANSPORT not in hass.data
+
+
+@pytest.mark.asyncio
+async def test_transport_stats_empty_pool():
+    """Statystyki puli bez ruchu: zero połączeń, reuse_ratio 0."""
+    hass = MagicMock()
+    hass.data = {}
+    transport = await async_acquire_transport(hass)
+    stats = transport.stats()
+    assert stats["open"] == 0
+    assert stats["idle"] == 0
+    assert stats["reuse_ratio"] == 0.0
+    await async_release_transport(hass)